@@ -12,8 +12,12 @@ This module analyzes each post to extract:
 
 import json
 import os
+import random
+import threading
 import time
-from typing import Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
 from openai import OpenAI
 from anthropic import Anthropic
 from google import genai
@@ -26,24 +30,128 @@ from config import (
     AI_MODEL,
     MAX_RETRIES,
     REQUEST_TIMEOUT,
+    ANALYSIS_CONCURRENCY,
     TASK_TYPES,
-    KNOWN_LLMS
+    KNOWN_LLMS,
+    CACHE_DIR,
+    ENABLE_CACHE,
+    ANALYSIS_CHECKPOINT_EVERY
 )
+from utils import get_content_hash, load_from_cache, save_to_cache, Checkpoint
+
+# Analysis responses, keyed by a hash of the provider, model and prompt
+ANALYSIS_CACHE_DIR = CACHE_DIR / 'analysis'
+
+# Fields produced by analyze_post and merged into each post
+ANALYSIS_FIELDS = [
+    'summary', 'task_types', 'homework_coverage', 'problems_attempted',
+    'insights', 'code_quality', 'tags', 'highlight_score'
+]
+
+
+def get_status_code(error: Exception) -> Optional[int]:
+    """
+    Get the HTTP status code from a provider SDK exception, if it has one.
+
+    OpenAI and Anthropic errors expose `status_code`; google-genai errors expose `code`.
+    """
+    for attr in ('status_code', 'code'):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(error, 'response', None)
+    value = getattr(response, 'status_code', None)
+    return value if isinstance(value, int) else None
+
+
+def is_throttling_error(error: Exception) -> bool:
+    """Check whether an error means the provider is rate limiting or overloaded."""
+    status = get_status_code(error)
+    return status is not None and (status == 429 or status >= 500)
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Caps in-flight requests to a provider.
+
+    The cap halves and all requests pause when the provider throttles, then
+    grows back by one after each cap's worth of successful requests.
+    """
+
+    def __init__(self, max_concurrency: int):
+        """
+        Initialize the limiter.
+
+        Args:
+            max_concurrency: Upper bound on requests in flight
+        """
+        self.max_concurrency = max(1, max_concurrency)
+        self.limit = self.max_concurrency
+        self.in_flight = 0
+        self._resume_at = 0.0
+        self._successes = 0
+        self._cond = threading.Condition()
+
+    def __enter__(self):
+        with self._cond:
+            while True:
+                pause = self._resume_at - time.monotonic()
+                if pause > 0:
+                    self._cond.wait(pause)
+                elif self.in_flight >= self.limit:
+                    self._cond.wait()
+                else:
+                    break
+            self.in_flight += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+        return False
+
+    def record_success(self) -> None:
+        """Grow the cap back after sustained success."""
+        with self._cond:
+            self._successes += 1
+            if self.limit < self.max_concurrency and self._successes >= self.limit:
+                self.limit += 1
+                self._successes = 0
+                self._cond.notify_all()
+
+    def record_throttle(self, delay: float) -> None:
+        """
+        Halve the cap and pause new requests.
+
+        Args:
+            delay: Seconds before any new request may start
+        """
+        with self._cond:
+            self.limit = max(1, self.limit // 2)
+            self._successes = 0
+            self._resume_at = max(self._resume_at, time.monotonic() + delay)
 
 
 class AIAnalyzer:
     """Analyzes posts using GPT-4, Claude, or Gemini."""
 
-    def __init__(self, provider: str = None, model: str = None):
+    def __init__(self, provider: str = None, model: str = None, concurrency: int = None):
         """
         Initialize the AI analyzer.
 
         Args:
             provider: 'openai', 'anthropic', or 'google'. Defaults to USE_AI_PROVIDER from config.
             model: Model to use. Defaults to AI_MODEL from config.
+            concurrency: Max requests in flight. Defaults to ANALYSIS_CONCURRENCY for the provider.
         """
         self.provider = provider or USE_AI_PROVIDER
         self.model = model or AI_MODEL
+        self.limiter = AdaptiveConcurrencyLimiter(
+            concurrency or ANALYSIS_CONCURRENCY.get(self.provider, 1)
+        )
+        self.cache_stats = {'hits': 0, 'misses': 0, 'tokens_saved': 0, 'seconds_saved': 0.0}
+        self._stats_lock = threading.Lock()
 
         if self.provider == 'openai':
             if not OPENAI_API_KEY:
@@ -73,32 +181,74 @@ class AIAnalyzer:
         # Build the analysis prompt
         prompt = self._build_analysis_prompt(post)
 
+        # Reuse a previous response to the exact same prompt
+        cache_key = self._get_cache_key(prompt)
+        cached = load_from_cache(cache_key, ANALYSIS_CACHE_DIR) if ENABLE_CACHE else None
+        if cached:
+            with self._stats_lock:
+                self.cache_stats['hits'] += 1
+                self.cache_stats['tokens_saved'] += cached.get('tokens') or 0
+                self.cache_stats['seconds_saved'] += cached.get('latency_s') or 0.0
+            return cached['analysis']
+
+        with self._stats_lock:
+            self.cache_stats['misses'] += 1
+
         # Call AI with retries
         for attempt in range(MAX_RETRIES):
             try:
-                if self.provider == 'openai':
-                    response = self._call_openai(prompt)
-                elif self.provider == 'anthropic':
-                    response = self._call_anthropic(prompt)
-                else:  # google
-                    response = self._call_google(prompt)
+                with self.limiter:
+                    started = time.monotonic()
+                    if self.provider == 'openai':
+                        response, tokens = self._call_openai(prompt)
+                    elif self.provider == 'anthropic':
+                        response, tokens = self._call_anthropic(prompt)
+                    else:  # google
+                        response, tokens = self._call_google(prompt)
+                    latency = time.monotonic() - started
+                self.limiter.record_success()
 
                 # Parse the structured response
                 analysis = self._parse_response(response)
 
+                if ENABLE_CACHE:
+                    save_to_cache(cache_key, {
+                        'provider': self.provider,
+                        'model': self.model,
+                        'prompt_hash': get_content_hash(prompt),
+                        'tokens': tokens,
+                        'latency_s': round(latency, 3),
+                        'analysis': analysis,
+                    }, ANALYSIS_CACHE_DIR)
+
                 return analysis
 
             except Exception as e:
                 if attempt < MAX_RETRIES - 1:
-                    wait_time = (attempt + 1) * 2
                     print(f"  Warning: Analysis failed (attempt {attempt + 1}): {e}")
-                    print(f"  Retrying in {wait_time}s...")
-                    time.sleep(wait_time)
+                    if is_throttling_error(e):
+                        # Exponential backoff with jitter, shared by all workers
+                        wait_time = min(60, 2 ** (attempt + 1)) * random.uniform(0.5, 1.5)
+                        self.limiter.record_throttle(wait_time)
+                        print(f"  Provider throttled, backing off {wait_time:.1f}s "
+                              f"(concurrency now {self.limiter.limit})...")
+                    else:
+                        wait_time = (attempt + 1) * 2
+                        print(f"  Retrying in {wait_time}s...")
+                        time.sleep(wait_time)
                 else:
                     print(f"  Error: Analysis failed after {MAX_RETRIES} attempts: {e}")
                     # Return minimal analysis on failure
                     return self._get_fallback_analysis(post)
 
+    def get_analysis_key(self, post: Dict[str, Any]) -> str:
+        """Key identifying a post's analysis: changes whenever its prompt would."""
+        return self._get_cache_key(self._build_analysis_prompt(post))
+
+    def _get_cache_key(self, prompt: str) -> str:
+        """Cache key for a prompt's analysis: (provider, model, prompt hash)."""
+        return f"analysis_{get_content_hash(f'{self.provider}:{self.model}:{get_content_hash(prompt)}')}"
+
     def _build_analysis_prompt(self, post: Dict[str, Any]) -> str:
         """Build the analysis prompt for GPT-4/Claude."""
 
@@ -190,8 +340,8 @@ Return the JSON response now:"""
 
         return prompt
 
-    def _call_openai(self, prompt: str) -> str:
-        """Call OpenAI API."""
+    def _call_openai(self, prompt: str) -> Tuple[str, Optional[int]]:
+        """Call OpenAI API. Returns (response text, total tokens used)."""
         response = self.client.chat.completions.create(
             model=self.model,
             messages=[
@@ -210,10 +360,11 @@ Return the JSON response now:"""
             response_format={"type": "json_object"}
         )
 
-        return response.choices[0].message.content
+        usage = getattr(response, 'usage', None)
+        return response.choices[0].message.content, getattr(usage, 'total_tokens', None)
 
-    def _call_anthropic(self, prompt: str) -> str:
-        """Call Anthropic Claude API."""
+    def _call_anthropic(self, prompt: str) -> Tuple[str, Optional[int]]:
+        """Call Anthropic Claude API. Returns (response text, total tokens used)."""
         response = self.client.messages.create(
             model=self.model,
             max_tokens=2000,
@@ -227,10 +378,12 @@ Return the JSON response now:"""
             ]
         )
 
-        return response.content[0].text
+        usage = getattr(response, 'usage', None)
+        tokens = (usage.input_tokens + usage.output_tokens) if usage else None
+        return response.content[0].text, tokens
 
-    def _call_google(self, prompt: str) -> str:
-        """Call Google Gemini API."""
+    def _call_google(self, prompt: str) -> Tuple[str, Optional[int]]:
+        """Call Google Gemini API. Returns (response text, total tokens used)."""
         # Add system instruction to the prompt
         full_prompt = """You are an expert analyst of LLM coding interactions in deep learning education. You provide structured, accurate analysis in JSON format.
 
@@ -242,7 +395,8 @@ Return the JSON response now:"""
             contents=full_prompt
         )
 
-        return response.text
+        usage = getattr(response, 'usage_metadata', None)
+        return response.text, getattr(usage, 'total_token_count', None)
 
     def _parse_response(self, response: str) -> Dict[str, Any]:
         """Parse the AI response into structured data."""
@@ -263,12 +417,7 @@ Return the JSON response now:"""
             raise ValueError(f"Failed to parse AI response as JSON: {e}\nResponse: {response[:500]}")
 
         # Validate required fields
-        required_fields = [
-            'summary', 'task_types', 'homework_coverage', 'problems_attempted',
-            'insights', 'code_quality', 'tags', 'highlight_score'
-        ]
-
-        for field in required_fields:
+        for field in ANALYSIS_FIELDS:
             if field not in data:
                 raise ValueError(f"Missing required field in AI response: {field}")
 
@@ -329,44 +478,102 @@ Return the JSON response now:"""
         }
 
 
+def is_fallback_analysis(analysis: Dict[str, Any]) -> bool:
+    """Check whether an analysis came from _get_fallback_analysis rather than the AI."""
+    return analysis.get('tags') == ['unanalyzed']
+
+
 def analyze_posts_batch(posts: list[Dict[str, Any]],
                        provider: str = None,
                        model: str = None,
-                       verbose: bool = True) -> list[Dict[str, Any]]:
+                       verbose: bool = True,
+                       concurrency: int = None,
+                       checkpoint_path: Optional[Path] = None,
+                       checkpoint_every: int = None) -> list[Dict[str, Any]]:
     """
-    Analyze a batch of posts.
+    Analyze a batch of posts concurrently.
+
+    An interrupted batch resumes from the response cache: every completed
+    analysis is saved there, so a rerun only sends the posts that were not
+    finished. When the cache is disabled (ENABLE_CACHE), a checkpoint_path
+    records completed analyses instead; it is deleted once the whole batch
+    has finished.
 
     Args:
         posts: List of post dicts to analyze
         provider: AI provider to use
         model: Model to use
         verbose: Print progress
+        concurrency: Max requests in flight. Defaults to ANALYSIS_CONCURRENCY for the provider.
+        checkpoint_path: File to record progress in when the cache is disabled, or None
+        checkpoint_every: Analyses between checkpoint writes. Defaults to ANALYSIS_CHECKPOINT_EVERY.
 
     Returns:
-        List of posts with analysis fields added
+        List of posts with analysis fields added, in the same order as posts
     """
-    analyzer = AIAnalyzer(provider=provider, model=model)
-
-    analyzed_posts = []
+    analyzer = AIAnalyzer(provider=provider, model=model, concurrency=concurrency)
+
+    analyzed_posts = [None] * len(posts)
+    checkpoint = None
+    keys = [None] * len(posts)
+    pending = list(range(len(posts)))
+
+    # With the cache enabled, analyze_post already skips finished prompts
+    if checkpoint_path is not None and not ENABLE_CACHE:
+        checkpoint = Checkpoint(checkpoint_path, checkpoint_every or ANALYSIS_CHECKPOINT_EVERY)
+        keys = [analyzer.get_analysis_key(post) for post in posts]
+        pending = []
+        for i, key in enumerate(keys):
+            if key in checkpoint:
+                analyzed_posts[i] = {**posts[i], **checkpoint.get(key)}
+            else:
+                pending.append(i)
+        if verbose and len(pending) < len(posts):
+            print(f"  Resuming from checkpoint: {len(posts) - len(pending)} posts already analyzed")
+
+    try:
+        # The limiter gates requests; the pool just needs enough threads to fill it
+        with ThreadPoolExecutor(max_workers=analyzer.limiter.max_concurrency) as executor:
+            futures = {
+                executor.submit(analyzer.analyze_post, posts[i]): i
+                for i in pending
+            }
 
-    for i, post in enumerate(posts, 1):
-        if verbose:
-            print(f"\n[{i}/{len(posts)}] Analyzing: {post.get('title', 'Untitled')[:60]}...")
-
-        analysis = analyzer.analyze_post(post)
-
-        # Merge analysis into post
-        analyzed_post = {**post, **analysis}
-        analyzed_posts.append(analyzed_post)
-
-        if verbose:
-            score = analysis.get('highlight_score', 0)
-            tags_count = len(analysis.get('tags', []))
-            print(f"  Success: Highlight score: {score}/10, Tags: {tags_count}")
-
-        # Rate limiting - small delay between requests
-        if i < len(posts):
-            time.sleep(0.5)
+            try:
+                for done, future in enumerate(as_completed(futures), 1):
+                    i = futures[future]
+                    analysis = future.result()
+
+                    # Merge analysis into post
+                    analyzed_posts[i] = {**posts[i], **analysis}
+
+                    # Failed analyses are left out so a resumed run retries them
+                    if checkpoint is not None and not is_fallback_analysis(analysis):
+                        checkpoint.add(keys[i], analysis)
+
+                    if verbose:
+                        score = analysis.get('highlight_score', 0)
+                        tags_count = len(analysis.get('tags', []))
+                        print(f"\n[{done}/{len(pending)}] Analyzed: {posts[i].get('title', 'Untitled')[:60]}...")
+                        print(f"  Success: Highlight score: {score}/10, Tags: {tags_count}")
+            except BaseException:
+                # Drop queued analyses so an interrupted run stops promptly;
+                # only those already in flight finish before the checkpoint is flushed
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+    finally:
+        if checkpoint is not None:
+            checkpoint.flush()
+
+    if checkpoint is not None:
+        checkpoint.discard()
+
+    if verbose:
+        stats = analyzer.cache_stats
+        print(f"\n  Analysis cache: {stats['hits']} hits, {stats['misses']} misses")
+        if stats['hits']:
+            print(f"  Saved ~{stats['tokens_saved']:,} tokens and "
+                  f"{stats['seconds_saved']:.1f}s of API latency")
 
     return analyzed_posts
 
@@ -0,0 +1,186 @@
+"""
+Approximate nearest-neighbor index for related posts.
+
+An IVF (inverted file) index: vectors are clustered with spherical k-means
+and each query is only compared against the members of its `nprobe`
+closest clusters. Raising `nprobe` trades speed for recall; probing every
+cluster gives the exact answer.
+"""
+
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+# Rows per block when scoring against centroids, to bound memory use
+BLOCK_SIZE = 4096
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize each row so dot products are cosine similarities."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def default_nlist(n: int) -> int:
+    """Pick a cluster count of about sqrt(n), the usual IVF starting point."""
+    return max(1, int(round(np.sqrt(n))))
+
+
+class IVFIndex:
+    """Inverted-file index over L2-normalized vectors."""
+
+    def __init__(self, centroids: np.ndarray, trained_on: int):
+        """
+        Args:
+            centroids: (nlist, d) unit-length cluster centers
+            trained_on: Number of vectors the centroids were fit to
+        """
+        self.centroids = centroids.astype(np.float32)
+        self.trained_on = trained_on
+
+    @property
+    def nlist(self) -> int:
+        return self.centroids.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.centroids.shape[1]
+
+    @classmethod
+    def train(
+        cls,
+        vectors: np.ndarray,
+        nlist: Optional[int] = None,
+        iterations: int = 10,
+        sample_size: int = 50_000,
+        seed: int = 0
+    ) -> 'IVFIndex':
+        """
+        Fit cluster centroids with spherical k-means.
+
+        Args:
+            vectors: (n, d) embeddings
+            nlist: Number of clusters (default: about sqrt(n))
+            iterations: k-means iterations
+            sample_size: Fit on at most this many randomly sampled vectors
+            seed: Random seed for sampling and initialization
+
+        Returns:
+            Trained index
+        """
+        data = normalize_rows(vectors)
+        n = data.shape[0]
+        nlist = min(nlist or default_nlist(n), n)
+        rng = np.random.default_rng(seed)
+
+        if n > sample_size:
+            data = data[rng.choice(n, sample_size, replace=False)]
+
+        centroids = data[rng.choice(data.shape[0], nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = cls._nearest_centroids(data, centroids, 1)[:, 0]
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, data)
+            counts = np.bincount(assignments, minlength=nlist)
+
+            # Re-seed empty clusters with random points
+            empty = counts == 0
+            sums[empty] = data[rng.choice(data.shape[0], int(empty.sum()))]
+            centroids = normalize_rows(sums)
+
+        return cls(centroids, n)
+
+    @staticmethod
+    def _nearest_centroids(data: np.ndarray, centroids: np.ndarray, nprobe: int) -> np.ndarray:
+        """Indices of each row's nprobe most similar centroids (unordered)."""
+        nprobe = min(nprobe, centroids.shape[0])
+        result = np.empty((data.shape[0], nprobe), dtype=np.intp)
+        for start in range(0, data.shape[0], BLOCK_SIZE):
+            scores = data[start:start + BLOCK_SIZE] @ centroids.T
+            if nprobe == centroids.shape[0]:
+                result[start:start + BLOCK_SIZE] = np.arange(nprobe)
+            else:
+                result[start:start + BLOCK_SIZE] = np.argpartition(-scores, nprobe - 1, axis=1)[:, :nprobe]
+        return result
+
+    def neighbors(self, vectors: np.ndarray, k: int, nprobe: int = 8) -> np.ndarray:
+        """
+        Find each vector's approximate k most similar other vectors.
+
+        Every vector is assigned to its nearest centroid, then compared
+        against the members of its nprobe nearest clusters.
+
+        Args:
+            vectors: (n, d) embeddings, the corpus to search and query
+            k: Neighbors to return per vector
+            nprobe: Clusters searched per query
+
+        Returns:
+            (n, min(k, n - 1)) row indices, most similar first. Rows with
+            fewer than k candidates are padded with -1.
+        """
+        data = normalize_rows(vectors)
+        n = data.shape[0]
+        k = min(k, n - 1)
+        if k <= 0:
+            return np.empty((n, 0), dtype=np.intp)
+
+        # Inverted lists: members of each cluster
+        assignments = self._nearest_centroids(data, self.centroids, 1)[:, 0]
+        members_order = np.argsort(assignments, kind='stable')
+        member_bounds = np.searchsorted(assignments[members_order], np.arange(self.nlist + 1))
+
+        # Queries probing each cluster
+        probes = self._nearest_centroids(data, self.centroids, nprobe)
+        probe_clusters = probes.ravel()
+        probe_queries = np.repeat(np.arange(n), probes.shape[1])
+        query_order = np.argsort(probe_clusters, kind='stable')
+        query_bounds = np.searchsorted(probe_clusters[query_order], np.arange(self.nlist + 1))
+
+        best_scores = np.full((n, k), -np.inf, dtype=np.float32)
+        best_ids = np.full((n, k), -1, dtype=np.intp)
+
+        for cluster in range(self.nlist):
+            members = members_order[member_bounds[cluster]:member_bounds[cluster + 1]]
+            queries = probe_queries[query_order[query_bounds[cluster]:query_bounds[cluster + 1]]]
+            if len(members) == 0 or len(queries) == 0:
+                continue
+
+            for start in range(0, len(queries), BLOCK_SIZE):
+                block = queries[start:start + BLOCK_SIZE]
+                scores = data[block] @ data[members].T
+                scores[block[:, None] == members[None, :]] = -np.inf
+
+                # Merge with the running top-k for these queries
+                all_scores = np.hstack([best_scores[block], scores])
+                all_ids = np.hstack([best_ids[block], np.broadcast_to(members, scores.shape)])
+                top = np.argpartition(-all_scores, k - 1, axis=1)[:, :k]
+                best_scores[block] = np.take_along_axis(all_scores, top, axis=1)
+                best_ids[block] = np.take_along_axis(all_ids, top, axis=1)
+
+        order = np.argsort(-best_scores, axis=1, kind='stable')
+        best_ids = np.take_along_axis(best_ids, order, axis=1)
+        best_ids[np.take_along_axis(best_scores, order, axis=1) == -np.inf] = -1
+        return best_ids
+
+    def needs_retraining(self, n: int, dim: int) -> bool:
+        """Whether centroids are stale for a corpus of n vectors of size dim."""
+        return dim != self.dim or not (self.trained_on / 2 <= n <= self.trained_on * 2)
+
+    def save(self, path: Path) -> None:
+        """Persist the centroids."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, centroids=self.centroids, trained_on=self.trained_on)
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional['IVFIndex']:
+        """Load persisted centroids, or None if there are none."""
+        if not path.exists():
+            return None
+        with np.load(path) as data:
+            return cls(data['centroids'], int(data['trained_on']))
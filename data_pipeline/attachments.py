@@ -0,0 +1,332 @@
+"""
+Mirror post attachments into ATTACHMENTS_DIR as a content-addressed store.
+
+Each distinct attachment URL is downloaded once, by a pool of worker
+threads, with utils.download_file into a staging directory in the cache
+(so an interrupted download resumes from its .part file). The finished
+file is stored under its SHA-256, as <sha256[:2]>/<sha256><ext>, so
+identical files are kept once and a stored file never changes; the site
+can serve them with long-lived cache headers.
+
+Images get a down-scaled WebP thumbnail (needs Pillow) and PDFs a preview
+of their first page (needs PyMuPDF), stored next to the file as
+<sha256>.preview.webp (.png for PDFs without Pillow). The byte size, image
+dimensions or PDF page count, and the preview's path and dimensions are
+recorded on each attachment, so the detail page can lazy-load small
+previews without layout shift.
+
+A manifest in the cache maps URLs to hashes and hashes to what was stored:
+reruns skip URLs whose file is still on disk, and only (re)generate
+missing previews.
+"""
+
+import hashlib
+import re
+import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from tqdm import tqdm
+
+import config
+from utils import atomic_write, get_content_hash, load_json, save_cache_json, download_file
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Optional: image thumbnails are skipped without it
+    Image = None
+
+try:
+    import pymupdf
+except ImportError:  # Optional: PDF previews are skipped without it
+    try:
+        import fitz as pymupdf
+    except ImportError:
+        pymupdf = None
+
+# url -> sha256, and sha256 -> stored file details
+MANIFEST_PATH = config.CACHE_DIR / 'attachments_manifest.json'
+
+# Bump when the on-disk layout changes
+MANIFEST_VERSION = 2
+
+# Attachment fields filled in from the store (besides local_path)
+STORED_FIELDS = ['sha256', 'size', 'width', 'height', 'pages',
+                 'preview_path', 'preview_width', 'preview_height']
+
+
+def safe_filename(filename: str) -> str:
+    """Attachment filename reduced to a single path component of safe characters."""
+    name = re.sub(r'[^\w.\-]+', '_', Path(filename).name).strip('._')
+    return name or 'attachment'
+
+
+def file_sha256(path: Path) -> str:
+    """SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _save_webp(image: Any, target: Path) -> Dict[str, int]:
+    """Write a PIL image as WebP and return its dimensions."""
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    with atomic_write(target, 'wb', compress=False) as f:
+        image.save(f, format='WEBP', quality=80, method=4)
+    return {'preview_width': image.width, 'preview_height': image.height}
+
+
+def make_image_thumbnail(source: Path, target: Path, max_size: int) -> Dict[str, int]:
+    """
+    Down-scale an image to fit in max_size x max_size.
+
+    Args:
+        source: Image file
+        target: WebP file to write
+        max_size: Longest edge of the thumbnail in pixels
+
+    Returns:
+        The original's width and height and the thumbnail's preview_width
+        and preview_height
+    """
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        details = {'width': image.width, 'height': image.height}
+        image.thumbnail((max_size, max_size))
+        return {**details, **_save_webp(image, target)}
+
+
+def make_pdf_preview(source: Path, target: Path, max_size: int) -> Dict[str, int]:
+    """
+    Render the first page of a PDF to fit in max_size x max_size.
+
+    Args:
+        source: PDF file
+        target: WebP file to write (PNG if Pillow is not installed)
+        max_size: Longest edge of the preview in pixels
+
+    Returns:
+        The PDF's page count and the preview's preview_width and preview_height
+    """
+    with pymupdf.open(source) as document:
+        page = document[0]
+        scale = max_size / max(page.rect.width, page.rect.height)
+        pixmap = page.get_pixmap(matrix=pymupdf.Matrix(scale, scale), alpha=False)
+        details = {'pages': document.page_count}
+
+    if Image is not None:
+        image = Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+        return {**details, **_save_webp(image, target)}
+    with atomic_write(target, 'wb', compress=False) as f:
+        f.write(pixmap.tobytes('png'))
+    return {**details, 'preview_width': pixmap.width, 'preview_height': pixmap.height}
+
+
+def can_preview(file_type: str) -> bool:
+    """Whether a preview can be generated for an attachment type here."""
+    if file_type == 'image':
+        return Image is not None
+    if file_type == 'pdf':
+        return pymupdf is not None
+    return False
+
+
+class AttachmentMirror:
+    """Downloads attachments into a content-addressed directory and remembers what it has."""
+
+    def __init__(
+        self,
+        directory: Path = config.ATTACHMENTS_DIR,
+        manifest_path: Path = MANIFEST_PATH,
+        preview_size: int = config.ATTACHMENT_PREVIEW_SIZE
+    ):
+        self.directory = Path(directory)
+        self.manifest_path = Path(manifest_path)
+        self.incoming = self.manifest_path.with_name('attachments_incoming')
+        self.preview_size = preview_size
+        self.stats = {'downloaded': 0, 'present': 0, 'deduplicated': 0, 'failed': 0, 'previews': 0}
+
+        manifest = load_json(self.manifest_path)
+        if not manifest or manifest.get('version') != MANIFEST_VERSION:
+            manifest = {'version': MANIFEST_VERSION, 'urls': {}, 'blobs': {}}
+        self.urls: Dict[str, str] = manifest['urls']
+        self.blobs: Dict[str, Dict[str, Any]] = manifest['blobs']
+
+    def public_path(self, path: Path) -> str:
+        """Path of a stored file as the site serves it, e.g. attachments/ab/ab12...pdf."""
+        return path.relative_to(self.directory.parent).as_posix()
+
+    def blob_path(self, sha256: str, suffix: str) -> Path:
+        """Where content with a given hash is stored."""
+        return self.directory / sha256[:2] / f'{sha256}{suffix}'
+
+    def is_present(self, url: str) -> bool:
+        """Whether a URL was mirrored before and its file is still intact."""
+        blob = self.blobs.get(self.urls.get(url, ''))
+        if not blob:
+            return False
+        path = self.directory.parent / blob['local_path']
+        return path.is_file() and path.stat().st_size == blob['size']
+
+    def needs_preview(self, blob: Dict[str, Any]) -> bool:
+        """Whether a stored file is missing a preview that could be generated."""
+        if not config.ATTACHMENT_PREVIEWS or not can_preview(blob['type']):
+            return False
+        if 'preview_path' not in blob:
+            return True
+        return bool(blob['preview_path']) and not (self.directory.parent / blob['preview_path']).is_file()
+
+    def download_path(self, url: str, filename: str) -> Path:
+        """Staging path a URL is downloaded to; stable across runs so partial files resume."""
+        return self.incoming / get_content_hash(url)[:12] / safe_filename(filename)
+
+    def _preview(self, blob: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate a stored file's preview, returning the fields to record."""
+        source = self.directory.parent / blob['local_path']
+        suffix = '.webp' if Image is not None else '.png'
+        target = source.with_name(f"{blob['sha256']}.preview{suffix}")
+        make_preview = make_image_thumbnail if blob['type'] == 'image' else make_pdf_preview
+        try:
+            details = make_preview(source, target, self.preview_size)
+        except Exception as e:
+            print(f"Error generating preview for {blob['local_path']}: {e}")
+            # An empty path marks the attempt so unreadable files aren't retried every run
+            return {'preview_path': ''}
+        return {**details, 'preview_path': self.public_path(target)}
+
+    def _fetch(self, url: str, filename: str, file_type: str) -> Optional[Dict[str, Any]]:
+        """Download a URL into the store and build its blob entry (runs in a worker)."""
+        staged = self.download_path(url, filename)
+        if not download_file(url, staged):
+            return None
+
+        sha256 = file_sha256(staged)
+        target = self.blob_path(sha256, Path(safe_filename(filename)).suffix.lower())
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(str(staged), str(target))
+        shutil.rmtree(staged.parent, ignore_errors=True)
+
+        blob = {
+            'sha256': sha256,
+            'type': file_type,
+            'local_path': self.public_path(target),
+            'size': target.stat().st_size,
+        }
+        if self.needs_preview(blob):
+            blob.update(self._preview(blob))
+        return blob
+
+    def _register(self, url: str, blob: Dict[str, Any]) -> None:
+        """Record a finished download, keeping an existing entry for identical content."""
+        existing = self.blobs.get(blob['sha256'])
+        if existing and self.directory.parent.joinpath(existing['local_path']).is_file():
+            if existing['local_path'] != blob['local_path']:
+                # Same bytes under another extension; one copy is enough
+                for stale in (blob['local_path'], blob.get('preview_path')):
+                    if stale and stale not in (existing['local_path'], existing.get('preview_path')):
+                        (self.directory.parent / stale).unlink(missing_ok=True)
+            self.stats['deduplicated'] += 1
+        else:
+            self.blobs[blob['sha256']] = blob
+            self.stats['downloaded'] += 1
+        if blob.get('preview_path'):
+            self.stats['previews'] += 1
+        self.urls[url] = blob['sha256']
+
+    def mirror(self, attachments: List[Dict[str, str]], workers: int = config.ATTACHMENT_WORKERS) -> None:
+        """
+        Make sure every attachment URL has a stored copy and preview.
+
+        Args:
+            attachments: Attachment dicts (ed_url, filename and type are used)
+            workers: Concurrent downloads
+        """
+        pending = {}
+        present = set()
+        for attachment in attachments:
+            url = attachment.get('ed_url')
+            if not url or url in pending or url in present:
+                continue
+            if self.is_present(url):
+                present.add(url)
+            else:
+                pending[url] = attachment
+        self.stats['present'] = len(present)
+
+        # Stored files whose preview is missing, e.g. because Pillow was installed since
+        stale = {self.urls[url] for url in present if self.needs_preview(self.blobs[self.urls[url]])}
+
+        if not pending and not stale:
+            return
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+                futures = {
+                    executor.submit(self._fetch, url, att.get('filename', ''), att.get('type', 'other')): url
+                    for url, att in pending.items()
+                }
+                previews = {executor.submit(self._preview, self.blobs[sha256]): sha256 for sha256 in stale}
+
+                for future in tqdm(as_completed(futures), total=len(futures), desc="Downloading attachments"):
+                    blob = future.result()
+                    if blob is None:
+                        self.stats['failed'] += 1
+                    else:
+                        self._register(futures[future], blob)
+
+                for future in as_completed(previews):
+                    details = future.result()
+                    self.blobs[previews[future]].update(details)
+                    if details.get('preview_path'):
+                        self.stats['previews'] += 1
+        finally:
+            # Keep what finished even if the run is interrupted
+            self.save()
+
+    def describe(self, url: str) -> Dict[str, Any]:
+        """Fields to record on an attachment with this URL ({'local_path': ''} if not stored)."""
+        blob = self.blobs.get(self.urls.get(url, ''))
+        if not blob:
+            return {'local_path': ''}
+        return {'local_path': blob['local_path'],
+                **{field: blob[field] for field in STORED_FIELDS if field in blob}}
+
+    def save(self) -> None:
+        save_cache_json(self.manifest_path, {
+            'version': MANIFEST_VERSION,
+            'urls': self.urls,
+            'blobs': self.blobs,
+        })
+
+
+def mirror_attachments(
+    posts: List[Dict[str, Any]],
+    directory: Path = config.ATTACHMENTS_DIR,
+    workers: int = config.ATTACHMENT_WORKERS,
+    manifest_path: Path = MANIFEST_PATH
+) -> Dict[str, int]:
+    """
+    Store the posts' attachments and record where they and their previews are.
+
+    Args:
+        posts: Posts whose 'attachments' lists are updated in place
+        directory: Directory to mirror into (served by the site as its name)
+        workers: Concurrent downloads
+        manifest_path: Where to remember mirrored URLs between runs
+
+    Returns:
+        Counts of downloaded, already present, deduplicated and failed URLs,
+        and of previews generated
+    """
+    mirror = AttachmentMirror(directory, manifest_path)
+    attachments = [att for post in posts for att in post.get('attachments', [])]
+    mirror.mirror(attachments, workers=workers)
+
+    for attachment in attachments:
+        for field in STORED_FIELDS:
+            attachment.pop(field, None)
+        attachment.update(mirror.describe(attachment.get('ed_url', '')))
+    return mirror.stats
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark the IVF nearest-neighbor index against exact top-k.
+
+Generates a clustered synthetic corpus (a stand-in for several courses of
+post embeddings), computes exact top-k neighbors with top_k_similar, then
+reports training time, search time and recall@k of the IVF index at several
+nprobe settings.
+
+Usage:
+    python bench_ann.py [--posts N] [--dim D] [--noise S] [--k K] [--nlist L] [--nprobe 1 2 4 8]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from ann_index import IVFIndex
+from generate_insights import top_k_similar
+
+
+def make_corpus(posts: int, dim: int, topics: int, noise: float, seed: int = 0) -> np.ndarray:
+    """Embeddings scattered around random topic directions."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(topics, dim))
+    labels = rng.integers(topics, size=posts)
+    return (centers[labels] + rng.normal(scale=noise, size=(posts, dim))).astype(np.float32)
+
+
+def recall_at_k(approximate: np.ndarray, exact: np.ndarray) -> float:
+    """Fraction of exact neighbors that the approximate search found."""
+    hits = sum(len(set(a) & set(e)) for a, e in zip(approximate.tolist(), exact.tolist()))
+    return hits / exact.size
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts', type=int, default=20000, help='Corpus size')
+    parser.add_argument('--dim', type=int, default=256, help='Embedding dimension')
+    parser.add_argument('--topics', type=int, default=200, help='Clusters in the synthetic corpus')
+    parser.add_argument('--noise', type=float, default=2.0,
+                        help='Spread of posts around their topic (higher is harder)')
+    parser.add_argument('--k', type=int, default=5, help='Neighbors per post')
+    parser.add_argument('--nlist', type=int, default=0, help='IVF clusters (0 = about sqrt(posts))')
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 2, 4, 8, 16],
+                        help='Clusters probed per query')
+    args = parser.parse_args()
+
+    embeddings = make_corpus(args.posts, args.dim, args.topics, args.noise)
+
+    print("=" * 60)
+    print("ANN Index Benchmark")
+    print("=" * 60)
+    print(f"Posts: {args.posts}, dim: {args.dim}, k: {args.k}")
+
+    start = time.perf_counter()
+    exact = top_k_similar(embeddings, args.k)
+    exact_time = time.perf_counter() - start
+    print(f"\nExact top-k:   {exact_time:.2f}s")
+
+    start = time.perf_counter()
+    index = IVFIndex.train(embeddings, nlist=args.nlist or None)
+    print(f"IVF training:  {time.perf_counter() - start:.2f}s ({index.nlist} clusters)")
+
+    print(f"\n{'nprobe':>6}  {'search':>8}  {'speedup':>8}  {'recall@' + str(args.k):>9}")
+    for nprobe in args.nprobe:
+        start = time.perf_counter()
+        approximate = index.neighbors(embeddings, args.k, nprobe=nprobe)
+        elapsed = time.perf_counter() - start
+        print(f"{nprobe:>6}  {elapsed:>7.2f}s  {exact_time / elapsed:>7.1f}x  "
+              f"{recall_at_k(approximate, exact):>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
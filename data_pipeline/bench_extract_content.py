@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark single-pass HTML extraction against the per-field extractors.
+
+Runs enrich_post's old path (three BeautifulSoup parses plus a regex pass)
+and extract_html_content over the same documents, checks that both produce
+the same results, and reports the per-post cost of each.
+
+With --workers N it also times enrich_posts over a process pool of
+1..N workers to show how extraction scales with core count.
+
+Usage:
+    python bench_extract_content.py [--repeat N] [--input PATH] [--workers N]
+"""
+
+import argparse
+import copy
+import json
+import time
+from pathlib import Path
+
+import config
+from extract_content import (
+    html_to_markdown,
+    extract_code_snippets,
+    extract_links,
+    extract_author_links,
+    extract_html_content,
+    enrich_posts,
+)
+
+
+def extract_separately(html_content: str) -> dict:
+    """The original extraction path: one parse per field."""
+    return {
+        'markdown': html_to_markdown(html_content),
+        'code_snippets': extract_code_snippets(html_content) if html_content else [],
+        'links': extract_links(html_content) if html_content else [],
+        'author_links': extract_author_links(html_content),
+    }
+
+
+def time_extractor(extractor, documents, repeat: int) -> float:
+    """Return the best total time of `repeat` runs over all documents."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for html_content in documents:
+            extractor(html_content)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per extractor (best is reported)')
+    parser.add_argument('--input', type=Path, default=config.OUTPUT_DIR / 'posts.json',
+                        help='Posts JSON with content_raw_html fields')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='Also time enrich_posts with 1..N worker processes')
+    args = parser.parse_args()
+
+    with open(args.input, 'r', encoding='utf-8') as f:
+        posts = json.load(f)
+    documents = [p.get('content_raw_html', '') for p in posts]
+    total_kb = sum(len(d) for d in documents) / 1024
+
+    print("=" * 60)
+    print("Content Extraction Benchmark")
+    print("=" * 60)
+    print(f"Documents: {len(documents)} ({total_kb:.0f} KB of HTML)")
+
+    # Both paths must agree before their timings mean anything
+    for html_content in documents:
+        old = extract_separately(html_content)
+        new = extract_html_content(html_content)
+        old['links'] = sorted(old['links'])
+        new['links'] = sorted(new['links'])
+        assert old == new, "Single-pass extraction differs from the per-field extractors"
+    print("✓ Outputs identical for all documents")
+
+    separate = time_extractor(extract_separately, documents, args.repeat)
+    single = time_extractor(extract_html_content, documents, args.repeat)
+
+    print(f"\nPer-field extractors: {separate:.3f}s ({separate / len(documents) * 1000:.2f} ms/post)")
+    print(f"Single-pass:          {single:.3f}s ({single / len(documents) * 1000:.2f} ms/post)")
+    print(f"Speedup:              {separate / single:.2f}x")
+
+    if args.workers:
+        print("\nenrich_posts scaling:")
+        baseline = None
+        for workers in range(1, args.workers + 1):
+            batch = copy.deepcopy(posts)
+            start = time.perf_counter()
+            list(enrich_posts(batch, workers=workers))
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"  {workers} worker(s): {elapsed:.3f}s ({baseline / elapsed:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
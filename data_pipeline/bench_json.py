@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark JSON load and save times for the pipeline's serialization layer.
+
+Times the stdlib json module against orjson (when installed) on a real
+output file, both pretty-printed (published data) and compact (caches).
+
+Usage:
+    python bench_json.py [--file ../public/data/posts.json] [--repeat 5]
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import utils
+from config import OUTPUT_DIR
+
+
+def best_of(repeat: int, fn) -> float:
+    """Fastest of several runs, in seconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--file', type=Path, default=OUTPUT_DIR / 'posts.json', help='JSON file to benchmark on')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement (best is reported)')
+    args = parser.parse_args()
+
+    raw = args.file.read_bytes()
+    data = json.loads(raw)
+    backends = ['json'] + (['orjson'] if utils.orjson is not None else [])
+
+    print("=" * 60)
+    print("JSON Backend Benchmark")
+    print("=" * 60)
+    print(f"File: {args.file} ({len(raw) / 1e6:.2f} MB)")
+    if utils.orjson is None:
+        print("orjson is not installed; only the stdlib backend is measured")
+
+    out_path = args.file.with_name('.bench_json.tmp')
+    installed = utils.orjson
+    results = {}
+    try:
+        for backend in backends:
+            utils.orjson = installed if backend == 'orjson' else None
+            results[backend] = {
+                'load': best_of(args.repeat, lambda: utils.loads_json(raw)),
+                'save (pretty)': best_of(args.repeat, lambda: utils.save_json(out_path, data)),
+                'save (compact)': best_of(args.repeat, lambda: utils.save_json(out_path, data, indent=None)),
+            }
+        compact_size = len(utils.dumps_json(data))
+    finally:
+        utils.orjson = installed
+        out_path.unlink(missing_ok=True)
+
+    print(f"Compact size: {compact_size / 1e6:.2f} MB ({compact_size / len(raw):.0%} of pretty)")
+    print(f"\n{'operation':<16}" + ''.join(f"{b:>10}" for b in backends) + ('   speedup' if len(backends) > 1 else ''))
+    for operation in results['json']:
+        row = f"{operation:<16}" + ''.join(f"{results[b][operation] * 1000:>8.1f}ms" for b in backends)
+        if len(backends) > 1:
+            row += f"{results['json'][operation] / results['orjson'][operation]:>9.1f}x"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,24 +8,261 @@ This script orchestrates the entire data pipeline:
 3. AI analysis of each post
 4. Generate cross-post insights
 5. Compute post similarities
-6. Write final JSON outputs
+6. Mirror attachments into ATTACHMENTS_DIR
+7. Write final JSON outputs (posts, search index, insights)
+
+Steps 2, 3 and 5 cache their outputs per post under cache/stages, keyed by a
+hash of each post's inputs, so reruns only reprocess posts that changed.
+Step 4 keeps its aggregates in cache/insights_state.json and applies only
+the posts that were added, changed or removed.
 """
 
+import argparse
 import json
 import sys
 from pathlib import Path
-from typing import List, Dict, Any
-
-from config import OUTPUT_DIR, CACHE_DIR
-from utils import save_cache, load_cache, write_json
+from typing import List, Dict, Any, Callable, Optional
+
+from config import (
+    OUTPUT_DIR, CACHE_DIR, USE_AI_PROVIDER, AI_MODEL, TASK_TYPES,
+    OPENAI_API_KEY, EMBEDDING_BACKEND, EMBEDDING_MODEL, PRECOMPRESS_OUTPUTS,
+    MIRROR_ATTACHMENTS,
+)
+from utils import (
+    save_cache, save_cache_records, write_json, write_json_array,
+    get_stage_cache_key, load_from_cache, save_to_cache, write_precompressed, load_json,
+)
 from fetch_posts import fetch_all_participation_posts, structure_post_data
-from extract_content import enrich_post
-from ai_analysis import analyze_posts_batch
-from generate_insights import generate_insights_from_posts, compute_similarities_for_posts
+from extract_content import enrich_posts
+from ai_analysis import analyze_posts_batch, is_fallback_analysis, ANALYSIS_FIELDS
+from generate_insights import compute_similarities_for_posts
+from insights_state import InsightsState
+from search_index import build_search_index
+from attachments import mirror_attachments
+
+# Per-item stage outputs, keyed by a hash of each item's inputs
+STAGE_CACHE_DIR = CACHE_DIR / 'stages'
+
+# Insight aggregates and per-post contributions, updated by deltas each run
+INSIGHTS_STATE_PATH = CACHE_DIR / 'insights_state.json'
+
+# Analyses completed so far in an unfinished analysis stage
+ANALYSIS_CHECKPOINT_PATH = CACHE_DIR / 'analysis_checkpoint.json'
+
+# Bump a stage's version when its code changes in a way that affects output
+STAGE_VERSIONS = {
+    'enrich': '1',
+    'analyze': '1',
+    'similarities': '3',
+}
+
+
+def run_cached_stage(
+    stage: str,
+    items: List[Any],
+    process_batch: Callable[[List[Any]], List[Any]],
+    inputs_fn: Callable[[Any], Any] = lambda item: item,
+    should_cache: Callable[[Any], bool] = lambda output: True
+) -> List[Any]:
+    """
+    Run a stage over items, reprocessing only items whose inputs changed.
+
+    Args:
+        stage: Stage name (a key of STAGE_VERSIONS)
+        items: Stage inputs, one per post
+        process_batch: Processes a list of cache-miss items, returning outputs in order
+        inputs_fn: Extracts the parts of an item that determine its output
+        should_cache: Decides whether an output is worth caching
+
+    Returns:
+        Stage outputs in the same order as items
+    """
+    # Compute keys up front, since process_batch may mutate items
+    keys = [get_stage_cache_key(stage, STAGE_VERSIONS[stage], inputs_fn(item)) for item in items]
+    outputs = [load_from_cache(key, STAGE_CACHE_DIR) for key in keys]
+
+    misses = [i for i, output in enumerate(outputs) if output is None]
+    print(f"  INFO: Reusing {len(items) - len(misses)} cached results, processing {len(misses)}")
+
+    if misses:
+        fresh = process_batch([items[i] for i in misses])
+        for i, output in zip(misses, fresh):
+            outputs[i] = output
+            if should_cache(output):
+                save_to_cache(keys[i], output, STAGE_CACHE_DIR)
+
+    return outputs
+
+
+def analysis_inputs(post: Dict[str, Any]) -> Dict[str, Any]:
+    """Select the post fields and settings that determine its AI analysis."""
+    return {
+        'provider': USE_AI_PROVIDER,
+        'model': AI_MODEL,
+        'task_types': TASK_TYPES,
+        'title': post.get('title'),
+        'content_markdown': post.get('content_markdown'),
+        'code_snippets': post.get('code_snippets'),
+        'attachments': post.get('attachments'),
+        'external_links': post.get('external_links'),
+    }
+
+
+def analyze_new_posts(posts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Analyze posts with AI and keep only the analysis fields."""
+    print("  Starting AI analysis (this may take a while)...")
+    print("  Using Gemini - FREE for typical datasets!")
+    print(f"  Analyzing {len(posts)} posts...")
+    print()
+
+    analyzed = analyze_posts_batch(posts, verbose=True, checkpoint_path=ANALYSIS_CHECKPOINT_PATH)
+    return [{field: post[field] for field in ANALYSIS_FIELDS} for post in analyzed]
+
+
+# Fields the directory page needs to list, filter, sort and search posts
+LISTING_FIELDS = [
+    'post_id', 'ed_thread_id', 'title', 'author', 'date', 'llm_info', 'summary',
+    'task_types', 'homework_coverage', 'tags', 'highlight_score', 'related_posts',
+]
+LISTING_INSIGHT_FIELDS = ['strengths', 'weaknesses', 'one_shot_success_rate']
+LISTING_CODE_QUALITY_FIELDS = ['correctness_rating', 'code_style_rating', 'pythonic_rating']
+
+
+def build_published_record(post: Dict[str, Any]) -> Dict[str, Any]:
+    """Build a post's published record: everything except the raw Ed payload."""
+    record = {key: value for key, value in post.items() if key != 'raw_ed_data'}
+    record['code_snippet_count'] = len(post.get('code_snippets', []))
+    return record
+
+
+def build_detail_record(post: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build the record for a post's detail shard.
+
+    The raw HTML is only kept for posts whose markdown conversion came out empty.
+    """
+    record = build_published_record(post)
+    if record.get('content_markdown'):
+        record.pop('content_raw_html', None)
+    return record
+
+
+def build_listing_entry(post: Dict[str, Any]) -> Dict[str, Any]:
+    """Build a post's compact entry in the directory listing index."""
+    entry = {field: post.get(field) for field in LISTING_FIELDS}
+    insights = post.get('insights') or {}
+    code_quality = post.get('code_quality') or {}
+    entry['insights'] = {field: insights.get(field) for field in LISTING_INSIGHT_FIELDS}
+    entry['code_quality'] = {field: code_quality.get(field) for field in LISTING_CODE_QUALITY_FIELDS}
+    entry['code_snippet_count'] = len(post.get('code_snippets', []))
+    return entry
+
+
+def write_post_outputs(posts: List[Dict[str, Any]], output_dir: Path) -> Dict[str, Path]:
+    """
+    Write the published post artifacts.
+
+    - posts_index.json: compact listing loaded by the directory page
+    - posts/<post_id>.json: one detail shard per post, loaded on demand
+    - posts.json: all published records in one file, for scripts and bulk use
+
+    Args:
+        posts: Analyzed posts with related_posts filled in
+        output_dir: Published data directory
+
+    Returns:
+        Dict mapping artifact name to its path
+    """
+    shard_dir = output_dir / 'posts'
+    shard_dir.mkdir(parents=True, exist_ok=True)
+
+    # Records are built and written one post at a time, so peak memory does
+    # not grow with a second copy of the corpus. Files fetched by the
+    # browser are written compact.
+    for post in posts:
+        write_json(str(shard_dir / f"{post['post_id']}.json"), build_detail_record(post), indent=None)
+
+    # Drop shards of posts that no longer exist
+    current = {f"{post['post_id']}.json" for post in posts}
+    for stale in shard_dir.glob('*.json'):
+        if stale.name not in current:
+            stale.unlink()
+
+    index_path = output_dir / 'posts_index.json'
+    write_json_array(index_path, (build_listing_entry(post) for post in posts), indent=None)
+
+    posts_path = output_dir / 'posts.json'
+    write_json_array(posts_path, (build_published_record(post) for post in posts))
+
+    return {'index': index_path, 'shards': shard_dir, 'posts': posts_path}
+
+
+def republish_posts(
+    update: Callable[[Dict[str, Any]], bool],
+    output_dir: Path = OUTPUT_DIR
+) -> Optional[Dict[str, Path]]:
+    """
+    Apply an in-place edit to the published posts and rewrite their artifacts.
+
+    Starts from the published posts.json, which already has related posts
+    and mirrored attachments, and writes it back through write_post_outputs
+    so the index, detail shards and posts.json stay consistent; the search
+    index is rebuilt too, since it covers author names.
+
+    Args:
+        update: Edits a published post in place, returning True if it changed
+        output_dir: Published data directory
+
+    Returns:
+        Paths of the rewritten artifacts, or None if nothing is published yet
+        or no post changed
+    """
+    posts = load_json(output_dir / 'posts.json')
+    if not posts:
+        return None
+
+    changed = sum(bool(update(post)) for post in posts)
+    if not changed:
+        return None
+
+    outputs = write_post_outputs(posts, output_dir)
+    outputs['search_index'] = output_dir / 'search_index.json'
+    write_json(str(outputs['search_index']), build_search_index(posts), indent=None)
+    if PRECOMPRESS_OUTPUTS:
+        for output in (outputs['index'], outputs['posts'], outputs['search_index']):
+            write_precompressed(output)
+    return outputs
+
+
+def similarity_inputs(posts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Select the embedding backend and post fields that feed the similarity embeddings."""
+    backend = EMBEDDING_BACKEND
+    if backend == 'auto':
+        backend = 'openai' if OPENAI_API_KEY else 'local'
+    return {
+        'backend': backend,
+        'model': EMBEDDING_MODEL if backend == 'openai' else None,
+        'posts': [
+            {
+                'post_id': post['post_id'],
+                'title': post.get('title'),
+                'summary': post.get('summary'),
+                'tags': post.get('tags'),
+                'task_types': post.get('task_types'),
+            }
+            for post in posts
+        ],
+    }
 
 
 def main():
     """Run the complete data pipeline."""
+    parser = argparse.ArgumentParser(description='Build the Special Participation B dataset')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Sync threads changed on Ed since the last run instead of using cached raw threads')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Worker processes for content extraction')
+    args = parser.parse_args()
 
     print("\n" + "=" * 70)
     print("Special Participation B - Data Pipeline")
@@ -35,17 +272,9 @@ def main():
     print("\nSTEP 1: Fetching posts from Ed API...")
     print("-" * 70)
 
-    raw_posts_cache = CACHE_DIR / 'raw_posts.json'
-
-    if raw_posts_cache.exists():
-        print("  INFO: Using cached raw posts")
-        raw_posts = load_cache('raw_posts.json')
-    else:
-        print("  Fetching from Ed API...")
-        raw_threads = fetch_all_participation_posts()
-        raw_posts = [structure_post_data(post) for post in raw_threads]
-        save_cache('raw_posts.json', raw_posts)
-        print(f"  SUCCESS: Fetched {len(raw_posts)} posts")
+    raw_threads = fetch_all_participation_posts(incremental=args.incremental)
+    raw_posts = [structure_post_data(post) for post in raw_threads]
+    save_cache_records('raw_posts.jsonl', raw_posts)
 
     if not raw_posts:
         print("  WARNING: No posts found. Make sure:")
@@ -59,38 +288,31 @@ def main():
     print("\nSTEP 2: Extracting and enriching content...")
     print("-" * 70)
 
-    structured_posts_cache = CACHE_DIR / 'structured_posts.json'
-
-    if structured_posts_cache.exists():
-        print("  INFO: Using cached structured posts")
-        structured_posts = load_cache('structured_posts.json')
-    else:
-        structured_posts = []
-        for i, post in enumerate(raw_posts, 1):
-            print(f"  [{i}/{len(raw_posts)}] Processing: {post.get('title', 'Untitled')[:50]}...")
-            enriched = enrich_post(post)
-            structured_posts.append(enriched)
-
-        save_cache('structured_posts.json', structured_posts)
-        print(f"  SUCCESS: Processed {len(structured_posts)} posts")
+    structured_posts = run_cached_stage(
+        'enrich',
+        raw_posts,
+        lambda posts: list(enrich_posts(posts, workers=args.workers))
+    )
+    save_cache_records('structured_posts.jsonl', structured_posts)
+    print(f"  SUCCESS: Processed {len(structured_posts)} posts")
 
     # Step 3: AI analysis of each post
     print("\nSTEP 3: AI-powered analysis...")
     print("-" * 70)
 
-    analyzed_posts_cache = CACHE_DIR / 'analyzed_posts.json'
-
-    if analyzed_posts_cache.exists():
-        print("  INFO: Using cached analyzed posts")
-        analyzed_posts = load_cache('analyzed_posts.json')
-    else:
-        print("  Starting AI analysis (this may take a while)...")
-        print("  Using Gemini - FREE for typical datasets!")
-        print(f"  Analyzing all {len(structured_posts)} posts...")
-        print()
-
-        analyzed_posts = analyze_posts_batch(structured_posts, verbose=True)
-        save_cache('analyzed_posts.json', analyzed_posts)
+    # Failed analyses fall back to heuristics; don't cache those so they get retried
+    analyses = run_cached_stage(
+        'analyze',
+        structured_posts,
+        analyze_new_posts,
+        inputs_fn=analysis_inputs,
+        should_cache=lambda analysis: not is_fallback_analysis(analysis)
+    )
+    analyzed_posts = [
+        {**post, **analysis}
+        for post, analysis in zip(structured_posts, analyses)
+    ]
+    save_cache_records('analyzed_posts.jsonl', analyzed_posts)
 
     print(f"\n  SUCCESS: Analyzed {len(analyzed_posts)} posts")
 
@@ -98,7 +320,13 @@ def main():
     print("\nSTEP 4: Generating cross-post insights...")
     print("-" * 70)
 
-    insights = generate_insights_from_posts(analyzed_posts)
+    # Apply only the posts added, changed or removed since the last run
+    insights_state = InsightsState.load(INSIGHTS_STATE_PATH)
+    delta = insights_state.sync(analyzed_posts)
+    insights_state.save(INSIGHTS_STATE_PATH)
+    insights = insights_state.to_insights()
+    print(f"  Applied insight deltas: {delta['added']} added, {delta['updated']} updated, "
+          f"{delta['removed']} removed ({delta['unchanged']} unchanged)")
 
     print(f"\n  Insights summary:")
     print(f"    - LLM profiles: {len(insights['llm_profiles'])}")
@@ -109,32 +337,54 @@ def main():
     print("\nSTEP 5: Computing post similarities...")
     print("-" * 70)
 
-    similarities_cache = CACHE_DIR / 'similarities.json'
+    # Similarities depend on the whole corpus, so the stage caches a single item
+    def compute_similarities(batch: List[Dict[str, Any]]) -> List[Dict[str, List[str]]]:
+        print(f"  Computing similarities ({batch[0]['backend']} embeddings)...")
+        return [compute_similarities_for_posts(analyzed_posts) for _ in batch]
 
-    if similarities_cache.exists():
-        print("  INFO: Using cached similarities")
-        similarities = load_cache('similarities.json')
-    else:
-        print("  Computing similarities (uses embeddings API, costs ~$0.01)...")
-        print("  Proceeding...")
-        similarities = compute_similarities_for_posts(analyzed_posts)
-        save_cache('similarities.json', similarities)
+    similarities = run_cached_stage(
+        'similarities',
+        [similarity_inputs(analyzed_posts)],
+        compute_similarities,
+        should_cache=bool
+    )[0]
+    save_cache('similarities.json', similarities)
 
     # Add related posts to each post
     for post in analyzed_posts:
         post['related_posts'] = similarities.get(post['post_id'], [])
 
-    # Step 6: Write final outputs
-    print("\nSTEP 6: Writing final outputs...")
+    # Step 6: Mirror attachments (after analysis, so local paths don't change its cache keys)
+    print("\nSTEP 6: Mirroring attachments...")
+    print("-" * 70)
+
+    if MIRROR_ATTACHMENTS:
+        mirrored = mirror_attachments(analyzed_posts)
+        print(f"  SUCCESS: {mirrored['downloaded']} downloaded, {mirrored['present']} already present, "
+              f"{mirrored['deduplicated']} deduplicated, {mirrored['failed']} failed, "
+              f"{mirrored['previews']} previews generated")
+    else:
+        print("  Skipped (MIRROR_ATTACHMENTS is off)")
+
+    # Step 7: Write final outputs
+    print("\nSTEP 7: Writing final outputs...")
     print("-" * 70)
 
     # Ensure output directory exists
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
-    # Write posts.json
-    posts_output = OUTPUT_DIR / 'posts.json'
-    write_json(str(posts_output), analyzed_posts)
-    print(f"  SUCCESS: Wrote {posts_output} ({len(analyzed_posts)} posts)")
+    # Write the listing index, per-post detail shards and posts.json
+    post_outputs = write_post_outputs(analyzed_posts, OUTPUT_DIR)
+    posts_output = post_outputs['posts']
+    print(f"  SUCCESS: Wrote {post_outputs['index']} ({len(analyzed_posts)} posts)")
+    print(f"  SUCCESS: Wrote {len(analyzed_posts)} detail shards to {post_outputs['shards']}")
+    print(f"  SUCCESS: Wrote {posts_output}")
+
+    # Write search_index.json (prebuilt so the browser doesn't index on load)
+    search_index_output = OUTPUT_DIR / 'search_index.json'
+    search_index = build_search_index(analyzed_posts)
+    write_json(str(search_index_output), search_index, indent=None)
+    print(f"  SUCCESS: Wrote {search_index_output} ({len(search_index['terms'])} terms)")
 
     # Write insights.json
     insights_output = OUTPUT_DIR / 'insights.json'
@@ -146,6 +396,14 @@ def main():
     write_json(str(llm_profiles_output), insights['llm_profiles'])
     print(f"  SUCCESS: Wrote {llm_profiles_output}")
 
+    # Precompressed siblings of the top-level files, for static hosting
+    if PRECOMPRESS_OUTPUTS:
+        for output in [post_outputs['index'], posts_output, search_index_output,
+                       insights_output, llm_profiles_output]:
+            siblings = write_precompressed(output)
+            sizes = ', '.join(f"{path.suffix} {path.stat().st_size / 1024:.0f} KB" for path in siblings)
+            print(f"  SUCCESS: Precompressed {output.name} ({output.stat().st_size / 1024:.0f} KB -> {sizes})")
+
     # Generate statistics
     print("\n" + "=" * 70)
     print("PIPELINE COMPLETE - Statistics")
@@ -186,6 +444,8 @@ def main():
     print("SUCCESS: All done! Data ready for frontend.")
     print("=" * 70)
     print(f"\nOutput files:")
+    print(f"  - {post_outputs['index']}")
+    print(f"  - {post_outputs['shards']}/")
     print(f"  - {posts_output}")
     print(f"  - {insights_output}")
     print(f"  - {llm_profiles_output}")
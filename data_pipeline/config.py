@@ -27,11 +27,42 @@ ATTACHMENTS_DIR = PROJECT_ROOT / os.getenv('ATTACHMENTS_DIR', 'public/attachment
 # Cache Configuration
 ENABLE_CACHE = os.getenv('ENABLE_CACHE', 'true').lower() == 'true'
 
+# Internal caches are stored compressed: 'zstd' (needs the zstandard package),
+# 'gzip', 'none', or 'auto' (zstd when installed, else gzip). Files written
+# with any codec are read back transparently.
+CACHE_COMPRESSION = os.getenv('CACHE_COMPRESSION', 'auto').lower()
+
+# Write .gz/.br siblings of published JSON for static hosts to serve directly
+PRECOMPRESS_OUTPUTS = os.getenv('PRECOMPRESS_OUTPUTS', 'true').lower() == 'true'
+
 # Ensure directories exist
 CACHE_DIR.mkdir(parents=True, exist_ok=True)
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 ATTACHMENTS_DIR.mkdir(parents=True, exist_ok=True)
 
+# Ed Fetch Configuration
+ED_FETCH_WORKERS = int(os.getenv('ED_FETCH_WORKERS', '4'))  # Concurrent thread-detail requests
+ED_REQUESTS_PER_SECOND = float(os.getenv('ED_REQUESTS_PER_SECOND', '3'))  # Shared token-bucket rate
+ED_RATE_LIMIT_BURST = int(os.getenv('ED_RATE_LIMIT_BURST', '3'))  # Max requests allowed back-to-back
+
+# HTTP transport: idempotent requests are retried HTTP_RETRIES times on
+# connection errors, 429 and 5xx, backing off from HTTP_BACKOFF seconds with
+# jitter. With HTTP_CACHE on, responses carrying ETag/Last-Modified are kept
+# and revalidated, so unchanged threads and files come back as 304s.
+HTTP_RETRIES = int(os.getenv('HTTP_RETRIES', '3'))
+HTTP_BACKOFF = float(os.getenv('HTTP_BACKOFF', '0.5'))
+HTTP_CACHE = os.getenv('HTTP_CACHE', 'true').lower() == 'true'
+
+# Attachment mirroring: download post attachments into ATTACHMENTS_DIR with
+# ATTACHMENT_WORKERS concurrent downloads (already mirrored files are skipped).
+# With ATTACHMENT_PREVIEWS, images get thumbnails (needs Pillow) and PDFs a
+# first-page preview (needs PyMuPDF), at most ATTACHMENT_PREVIEW_SIZE pixels
+# on the longest edge.
+MIRROR_ATTACHMENTS = os.getenv('MIRROR_ATTACHMENTS', 'true').lower() == 'true'
+ATTACHMENT_WORKERS = int(os.getenv('ATTACHMENT_WORKERS', '4'))
+ATTACHMENT_PREVIEWS = os.getenv('ATTACHMENT_PREVIEWS', 'true').lower() == 'true'
+ATTACHMENT_PREVIEW_SIZE = int(os.getenv('ATTACHMENT_PREVIEW_SIZE', '320'))
+
 # Search Configuration
 PARTICIPATION_B_KEYWORDS = [
     'participation b',
@@ -39,10 +70,48 @@ PARTICIPATION_B_KEYWORDS = [
     'extra credit b',
 ]
 
+# How participation B threads are found. 'auto' filters on the server: a
+# category listing when PARTICIPATION_B_CATEGORY is set, else Ed's thread
+# search for each keyword. 'category', 'search' or 'crawl' force a method;
+# server-side methods fall back to crawling every thread if unsupported.
+ED_DISCOVERY = os.getenv('ED_DISCOVERY', 'auto').lower()
+PARTICIPATION_B_CATEGORY = os.getenv('PARTICIPATION_B_CATEGORY', '')
+
+# Optional ISO date the assignment opened; date-ordered listings stop at
+# threads created before it
+PARTICIPATION_B_SINCE = os.getenv('PARTICIPATION_B_SINCE', '')
+
 # AI Analysis Configuration
 MAX_RETRIES = 3
 REQUEST_TIMEOUT = 60
-BATCH_SIZE = 10  # Process posts in batches to avoid rate limits
+
+# Analysis requests kept in flight per provider. The limit halves on 429/5xx
+# responses and grows back towards this cap as requests succeed.
+ANALYSIS_CONCURRENCY = {
+    'openai': int(os.getenv('OPENAI_CONCURRENCY', '8')),
+    'anthropic': int(os.getenv('ANTHROPIC_CONCURRENCY', '4')),
+    'google': int(os.getenv('GOOGLE_CONCURRENCY', '4')),
+}
+
+# With ENABLE_CACHE off, completed analyses are checkpointed to disk every
+# ANALYSIS_CHECKPOINT_EVERY posts, so an interrupted run resumes without
+# repeating finished requests. (With the cache on, the cache already does this.)
+ANALYSIS_CHECKPOINT_EVERY = int(os.getenv('ANALYSIS_CHECKPOINT_EVERY', '10'))
+
+# Post similarity embeddings. EMBEDDING_BACKEND is 'openai', 'local' (offline
+# TF-IDF + SVD) or 'auto' (OpenAI when OPENAI_API_KEY is set, else local).
+# OpenAI inputs are sent in batches of EMBEDDING_BATCH_SIZE posts per request.
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'auto').lower()
+EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'text-embedding-3-small')
+EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', '100'))
+
+# Related posts use an approximate nearest-neighbor (IVF) index once the corpus
+# reaches ANN_MIN_POSTS. Each post is compared against the posts in its
+# ANN_NPROBE closest of ANN_NLIST clusters (0 = about sqrt(posts)); raising
+# ANN_NPROBE improves recall at the cost of speed.
+ANN_MIN_POSTS = int(os.getenv('ANN_MIN_POSTS', '5000'))
+ANN_NLIST = int(os.getenv('ANN_NLIST', '0'))
+ANN_NPROBE = int(os.getenv('ANN_NPROBE', '8'))
 
 # Task Type Taxonomy
 TASK_TYPES = [
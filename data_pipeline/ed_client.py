@@ -1,70 +1,377 @@
 """Ed API client wrapper for fetching course data."""
-import time
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Dict, Any, Optional, Tuple
+import requests
 from edapi import EdAPI
 from tqdm import tqdm
 import config
+from http_transport import HttpCache, configure_session
+from utils import RateLimiter, download_file, parse_timestamp
+
+ED_API_BASE = "https://us.edstem.org/api"
+
+# Listing page size for filtered listings (Ed clips limits above 100)
+FILTERED_PAGE_SIZE = 100
+
+
+class FilteredListingUnavailable(Exception):
+    """A server-side thread filter is unsupported, was ignored, or failed."""
 
 
 class EdClient:
     """Wrapper for Ed API with rate limiting and error handling."""
+
+    http_cache: Optional[HttpCache] = None
     
-    def __init__(self):
-        """Initialize Ed API client."""
+    def __init__(self, max_workers: Optional[int] = None):
+        """
+        Initialize Ed API client.
+
+        Args:
+            max_workers: Concurrent detail requests. Defaults to ED_FETCH_WORKERS from config.
+        """
         if not config.ED_API_TOKEN:
             raise ValueError("ED_API_TOKEN not set in environment")
 
         self.api = EdAPI()
         self.api.login()  # Logs in using ED_API_TOKEN from .env
         self.course_id = config.COURSE_ID
+        self.max_workers = max(1, max_workers or config.ED_FETCH_WORKERS)
+        self.pages_fetched = 0  # Listing pages requested, for reporting
+        self.discovery_method = None  # How the last participation B listing was found
+
+        # All requests share one token bucket, whichever thread issues them
+        self.rate_limiter = RateLimiter(
+            config.ED_REQUESTS_PER_SECOND,
+            burst=config.ED_RATE_LIMIT_BURST
+        )
+
+        # Pool sized so worker threads don't discard connections, with retries
+        configure_session(self.api.session, pool_size=self.max_workers)
+
+        # Thread details are revalidated rather than re-downloaded
+        if config.ENABLE_CACHE and config.HTTP_CACHE:
+            self.http_cache = HttpCache(config.CACHE_DIR / 'http')
         
-    def fetch_all_threads(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    def fetch_all_threads(
+        self,
+        limit: Optional[int] = None,
+        created_since: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
         """
         Fetch all threads from the course.
         
         Args:
             limit: Optional limit on number of threads to fetch
+            created_since: Optional ISO timestamp. The listing is newest first,
+                so the crawl stops at the first page created entirely before it.
             
         Returns:
             List of thread dictionaries
         """
+        threads = [t for page in self.iter_thread_pages(limit, created_since) for t in page]
+        print(f"Total threads fetched: {len(threads)}")
+        return threads
+
+    def iter_thread_pages(
+        self,
+        limit: Optional[int] = None,
+        created_since: Optional[str] = None
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Crawl the course listing, yielding each page as soon as it arrives.
+
+        Args:
+            limit: Optional limit on number of threads to fetch
+            created_since: Optional ISO timestamp to stop the newest-first crawl at
+
+        Yields:
+            Lists of thread dictionaries, one per listing page
+        """
         print(f"Fetching threads from course {self.course_id}...")
-        threads = []
+        cutoff = parse_timestamp(created_since)
+        fetched = 0
         offset = 0
         batch_size = 30
         
         while True:
             try:
+                self.rate_limiter.acquire()
                 batch = self.api.list_threads(
                     course_id=self.course_id,
                     limit=batch_size,
                     offset=offset
                 )
+                self.pages_fetched += 1
+            except Exception as e:
+                print(f"Error fetching threads at offset {offset}: {e}")
+                break
+
+            if not batch:
+                break
 
-                if not batch:
-                    break
+            if cutoff is not None:
+                recent = [t for t in batch if not _created_before(t, cutoff)]
+            else:
+                recent = batch
+            if limit:
+                recent = recent[:limit - fetched]
+            fetched += len(recent)
+            print(f"  Fetched {fetched} threads so far...")
+            yield recent
 
-                threads.extend(batch)
-                print(f"  Fetched {len(threads)} threads so far...")
+            # Check if we've fetched all threads (or reached ones too old to matter)
+            if (limit and fetched >= limit) or len(batch) < batch_size or not recent:
+                break
 
-                if limit and len(threads) >= limit:
-                    threads = threads[:limit]
-                    break
+            offset += batch_size
+    
+    def fetch_threads_updated_since(self, since: str) -> List[Dict[str, Any]]:
+        """
+        Fetch threads with activity after a timestamp, most recent first.
 
-                # Check if we've fetched all threads
-                if len(batch) < batch_size:
-                    break
-                    
-                offset += batch_size
-                time.sleep(0.5)  # Rate limiting
-                
-            except Exception as e:
-                print(f"Error fetching threads at offset {offset}: {e}")
+        Pages through the listing sorted by activity and stops at the first
+        page whose threads were all last updated at or before `since`.
+
+        Args:
+            since: ISO timestamp of the previous sync
+
+        Returns:
+            List of thread dictionaries updated after `since`
+        """
+        cutoff = parse_timestamp(since)
+        if cutoff is None:
+            raise ValueError(f"Invalid sync timestamp: {since!r}")
+
+        print(f"Fetching threads updated since {since}...")
+        threads = []
+        offset = 0
+        batch_size = 30
+
+        while True:
+            self.rate_limiter.acquire()
+            batch = self.api.list_threads(
+                course_id=self.course_id,
+                limit=batch_size,
+                offset=offset,
+                sort='active'
+            )
+            self.pages_fetched += 1
+
+            if not batch:
                 break
-        
-        print(f"Total threads fetched: {len(threads)}")
+
+            updated = [
+                t for t in batch
+                if (parse_timestamp(t.get('updated_at')) or cutoff) > cutoff
+            ]
+            threads.extend(updated)
+
+            # Listing is ordered by activity, so a fully stale page ends the scan
+            if not updated or len(batch) < batch_size:
+                break
+
+            offset += batch_size
+
+        print(f"Threads updated since last sync: {len(threads)}")
         return threads
-    
+
+    def search_threads(self, query: str) -> List[Dict[str, Any]]:
+        """
+        Find threads matching a text query with Ed's thread search.
+
+        Args:
+            query: Search text
+
+        Returns:
+            Matching threads, in the order Ed ranks them
+
+        Raises:
+            FilteredListingUnavailable: If the server has no search endpoint
+        """
+        return [t for page in self._iter_search_pages(query) for t in page]
+
+    def fetch_threads_in_category(
+        self,
+        category: str,
+        created_since: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        List the threads of one category, newest first.
+
+        Args:
+            category: Category name, e.g. 'Special Participation B'
+            created_since: Optional ISO timestamp to stop the listing at
+
+        Returns:
+            Threads in the category
+
+        Raises:
+            FilteredListingUnavailable: If the server ignored the category filter
+        """
+        return [t for page in self._iter_category_pages(category, created_since) for t in page]
+
+    def _iter_search_pages(self, query: str) -> Iterator[List[Dict[str, Any]]]:
+        return self._iter_filtered(
+            f"{ED_API_BASE}/courses/{self.course_id}/threads/search",
+            {'query': query},
+        )
+
+    def _iter_category_pages(
+        self,
+        category: str,
+        created_since: Optional[str] = None
+    ) -> Iterator[List[Dict[str, Any]]]:
+        cutoff = parse_timestamp(created_since)
+
+        def in_category(thread: Dict[str, Any]) -> bool:
+            if thread.get('category') != category:
+                # A server that drops the parameter returns the whole course
+                raise FilteredListingUnavailable(
+                    f"category filter ignored (got a thread in {thread.get('category')!r})"
+                )
+            return True
+
+        return self._iter_filtered(
+            f"{ED_API_BASE}/courses/{self.course_id}/threads",
+            {'category': category, 'sort': 'new'},
+            keep=in_category,
+            stop=(lambda t: _created_before(t, cutoff)) if cutoff else None,
+        )
+
+    def _iter_filtered(
+        self,
+        url: str,
+        params: Dict[str, Any],
+        keep: Optional[Callable[[Dict[str, Any]], bool]] = None,
+        stop: Optional[Callable[[Dict[str, Any]], bool]] = None
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Page through a filtered thread listing.
+
+        Args:
+            url: Listing endpoint
+            params: Filter parameters sent with every page
+            keep: Optional check applied to each listed thread
+            stop: Optional predicate; a page where every thread matches it
+                ends the listing (for listings ordered by date)
+
+        Yields:
+            Listed threads, one list per page
+
+        Raises:
+            FilteredListingUnavailable: If the endpoint is missing, fails
+                (after the session's retries), or returns something other
+                than a thread listing
+        """
+        offset = 0
+
+        while True:
+            self.rate_limiter.acquire()
+            try:
+                response = self.api.session.get(
+                    url,
+                    params={**params, 'limit': FILTERED_PAGE_SIZE, 'offset': offset},
+                    timeout=config.REQUEST_TIMEOUT
+                )
+            except requests.RequestException as e:
+                raise FilteredListingUnavailable(f"{type(e).__name__} from {url}: {e}") from e
+            self.pages_fetched += 1
+
+            if not response.ok:
+                raise FilteredListingUnavailable(f"HTTP {response.status_code} from {url}")
+
+            try:
+                batch = response.json()['threads']
+            except (ValueError, KeyError, TypeError):
+                raise FilteredListingUnavailable(f"unexpected response from {url}")
+
+            kept = [t for t in batch if (keep is None or keep(t)) and not (stop and stop(t))]
+            yield kept
+
+            if len(batch) < FILTERED_PAGE_SIZE or (stop and not kept):
+                break
+            offset += FILTERED_PAGE_SIZE
+
+    def discover_participation_threads(
+        self,
+        limit: Optional[int] = None
+    ) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        Find the participation B threads, filtering on the server where possible.
+
+        Args:
+            limit: Optional limit on threads listed (for testing); forces a full crawl
+
+        Returns:
+            Tuple of (participation B threads, discovery method used)
+        """
+        threads = [t for page in self.iter_participation_threads(limit) for t in page]
+        print(f"Found {len(threads)} participation B threads")
+        return threads, self.discovery_method
+
+    def iter_participation_threads(
+        self,
+        limit: Optional[int] = None
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Yield participation B threads page by page as the listing arrives.
+
+        With ED_DISCOVERY 'auto', a category listing is used when
+        PARTICIPATION_B_CATEGORY is set and keyword search otherwise, so the
+        pages fetched scale with the number of matches rather than the size
+        of the course. If the filtered listing is unsupported or fails, this
+        falls back to crawling every thread. Matches are always re-checked against
+        PARTICIPATION_B_KEYWORDS locally, and no thread is yielded twice.
+        The method used is left in `discovery_method`.
+
+        Args:
+            limit: Optional limit on threads listed (for testing); forces a full crawl
+
+        Yields:
+            Lists of participation B threads, one per listing page
+        """
+        mode = config.ED_DISCOVERY
+        if mode == 'auto':
+            mode = 'category' if config.PARTICIPATION_B_CATEGORY else 'search'
+
+        since = config.PARTICIPATION_B_SINCE or None
+        cutoff = parse_timestamp(since)
+        seen = set()
+
+        def new_matches(page: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+            matches = [
+                t for t in page
+                if t.get('id') not in seen and is_participation_b(t)
+                and not (cutoff and _created_before(t, cutoff))
+            ]
+            seen.update(t.get('id') for t in matches)
+            return matches
+
+        if mode in ('category', 'search') and not limit:
+            self.discovery_method = mode
+            try:
+                if mode == 'category':
+                    print(f"Listing threads in category {config.PARTICIPATION_B_CATEGORY!r}...")
+                    pages = self._iter_category_pages(config.PARTICIPATION_B_CATEGORY, since)
+                else:
+                    print("Searching threads for participation B keywords...")
+                    pages = (
+                        page
+                        for keyword in config.PARTICIPATION_B_KEYWORDS
+                        for page in self._iter_search_pages(keyword)
+                    )
+                for page in pages:
+                    yield new_matches(page)
+                return
+            except FilteredListingUnavailable as e:
+                print(f"  Server-side {mode} unavailable ({e}); crawling all threads")
+
+        self.discovery_method = 'crawl'
+        for page in self.iter_thread_pages(limit=limit, created_since=since):
+            yield new_matches(page)
+
     def filter_participation_b_threads(
         self, 
         threads: List[Dict[str, Any]]
@@ -78,16 +385,7 @@ class EdClient:
         Returns:
             Filtered list of participation B threads
         """
-        filtered = []
-        
-        for thread in threads:
-            title = thread.get('title', '').lower()
-            
-            # Check if title contains any of the participation B keywords
-            for keyword in config.PARTICIPATION_B_KEYWORDS:
-                if keyword.lower() in title:
-                    filtered.append(thread)
-                    break
+        filtered = [thread for thread in threads if is_participation_b(thread)]
         
         print(f"Filtered to {len(filtered)} participation B threads")
         return filtered
@@ -103,23 +401,75 @@ class EdClient:
             Full thread response dictionary (includes 'thread' and 'users' keys) or None if error
         """
         try:
-            # Make raw API call to get full response including users array
-            thread_url = f"https://us.edstem.org/api/courses/{self.course_id}/threads/{thread_number}"
-            response = self.api.session.get(thread_url)
-
-            if response.ok:
-                # Return the full response, not just the 'thread' part
-                full_response = response.json()
-                time.sleep(0.3)  # Rate limiting
-                return full_response
-            else:
-                print(f"Error fetching thread {thread_number}: {response.status_code}")
-                return None
-
+            return self._get_thread_details(thread_number)
         except Exception as e:
             print(f"Error fetching thread {thread_number}: {e}")
             return None
-    
+
+    def fetch_threads_details(
+        self,
+        thread_numbers: Iterable[int],
+        max_workers: Optional[int] = None
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Fetch details for many threads concurrently.
+
+        Requests run on a bounded thread pool sharing this client's session
+        and rate limiter. Each number is submitted as soon as it is drawn from
+        thread_numbers, so passing a generator over a listing that is still
+        being paged lets detail requests overlap listing requests.
+
+        Args:
+            thread_numbers: Thread numbers to fetch, consumed lazily
+            max_workers: Pool size. Defaults to the client's max_workers.
+
+        Returns:
+            Tuple of (details in the same order as thread_numbers, failures).
+            Each failure is a dict with 'thread_number' and 'error' keys.
+        """
+        workers = max(1, max_workers or self.max_workers)
+        numbers: List[int] = []
+        futures = {}
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for number in thread_numbers:
+                futures[executor.submit(self._get_thread_details, number)] = len(numbers)
+                numbers.append(number)
+
+            results: List[Optional[Dict[str, Any]]] = [None] * len(numbers)
+            errors: Dict[int, str] = {}
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Fetching details"):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    errors[i] = str(e)
+
+        details = [result for result in results if result is not None]
+        failures = [
+            {'thread_number': numbers[i], 'error': errors[i]}
+            for i in sorted(errors)
+        ]
+
+        return details, failures
+
+    def _get_thread_details(self, thread_number: int) -> Dict[str, Any]:
+        """Fetch the full thread response, raising on any error."""
+        # Make raw API call to get full response including users array
+        thread_url = f"{ED_API_BASE}/courses/{self.course_id}/threads/{thread_number}"
+
+        self.rate_limiter.acquire()
+        if self.http_cache is not None:
+            response = self.http_cache.get(self.api.session, thread_url, timeout=config.REQUEST_TIMEOUT)
+        else:
+            response = self.api.session.get(thread_url, timeout=config.REQUEST_TIMEOUT)
+
+        if not response.ok:
+            raise RuntimeError(f"HTTP {response.status_code}")
+
+        # Return the full response, not just the 'thread' part
+        return response.json()
+
     def download_attachment(
         self, 
         attachment_url: str, 
@@ -127,23 +477,31 @@ class EdClient:
     ) -> bool:
         """
         Download an attachment from Ed.
-        
+
+        Attachment URLs point at Ed's public file host, so this is a plain
+        download (resumable, see utils.download_file); attachments.py
+        mirrors all of a dataset's attachments concurrently.
+
         Args:
             attachment_url: URL of the attachment
             save_path: Local path to save the file
-            
+
         Returns:
             True if successful, False otherwise
         """
-        try:
-            # This would need to be implemented with the actual Ed API
-            # For now, we'll just note that attachments need manual download
-            # or a different API method
-            print(f"Note: Attachment download not yet implemented: {attachment_url}")
-            return False
-        except Exception as e:
-            print(f"Error downloading attachment: {e}")
-            return False
+        return download_file(attachment_url, Path(save_path), http_cache=self.http_cache)
+
+
+def is_participation_b(thread: Dict[str, Any]) -> bool:
+    """Whether a thread's title contains one of the participation B keywords."""
+    title = thread.get('title', '').lower()
+    return any(keyword.lower() in title for keyword in config.PARTICIPATION_B_KEYWORDS)
+
+
+def _created_before(thread: Dict[str, Any], cutoff) -> bool:
+    """Whether a listed thread was created before cutoff (unknown dates count as recent)."""
+    created = parse_timestamp(thread.get('created_at'))
+    return created is not None and created < cutoff
 
 
 def test_connection():
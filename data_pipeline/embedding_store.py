@@ -0,0 +1,134 @@
+"""
+On-disk store of post embeddings, keyed by a hash of the embedded text.
+
+Vectors live in a single .npy matrix that is memory-mapped on load, with a
+JSON sidecar listing the text hash of each row. Only texts that are not in
+the store yet need to be sent to the embeddings API.
+"""
+
+import re
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils import get_content_hash, save_json, load_json
+
+
+class EmbeddingStore:
+    """Embeddings for one model, persisted as a matrix plus a row index."""
+
+    def __init__(self, directory: Path, model: str):
+        """
+        Open (or start) the store for a model.
+
+        Args:
+            directory: Directory holding the store files
+            model: Embedding model name; each model gets its own files
+        """
+        slug = re.sub(r'[^A-Za-z0-9._-]+', '_', model)
+        self.model = model
+        self.matrix_path = directory / f'embeddings_{slug}.npy'
+        self.index_path = directory / f'embeddings_{slug}.json'
+
+        self.matrix: Optional[np.ndarray] = None
+        self.rows: Dict[str, int] = {}
+
+        index = load_json(self.index_path)
+        if index and index.get('model') == model and self.matrix_path.exists():
+            matrix = np.load(self.matrix_path, mmap_mode='r')
+            if matrix.shape[0] == len(index['hashes']):
+                self.matrix = matrix
+                self.rows = {h: i for i, h in enumerate(index['hashes'])}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        """Key a text by its content hash."""
+        return get_content_hash(text)
+
+    def lookup(self, hashes: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Fetch stored vectors.
+
+        Args:
+            hashes: Text hashes to look up
+
+        Returns:
+            Dict mapping each stored hash to its vector (missing hashes omitted)
+        """
+        return {h: self.matrix[self.rows[h]] for h in hashes if h in self.rows}
+
+    def save(self, vectors: Dict[str, np.ndarray], keep: Optional[List[str]] = None) -> None:
+        """
+        Add vectors and rewrite the store.
+
+        Args:
+            vectors: New vectors keyed by text hash
+            keep: If given, drop stored rows whose hash is not in this list
+        """
+        stored = self.lookup(list(self.rows) if keep is None else keep)
+        merged = {**stored, **vectors}
+        if not merged:
+            return
+
+        hashes = list(merged)
+        matrix = np.asarray([merged[h] for h in hashes], dtype=np.float32)
+
+        # Write to temp files first so an interrupted run never leaves a
+        # matrix that disagrees with its sidecar
+        self.matrix_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_matrix = self.matrix_path.with_name(self.matrix_path.name + '.tmp')
+        tmp_index = self.index_path.with_name(self.index_path.name + '.tmp')
+        with open(tmp_matrix, 'wb') as f:
+            np.save(f, matrix)
+        save_json(tmp_index, {'model': self.model, 'dim': matrix.shape[1], 'hashes': hashes}, indent=None)
+
+        self.matrix = None  # Release the memory map before replacing the file
+        tmp_matrix.replace(self.matrix_path)
+        tmp_index.replace(self.index_path)
+
+        self.matrix = np.load(self.matrix_path, mmap_mode='r')
+        self.rows = {h: i for i, h in enumerate(hashes)}
+
+    def embed(
+        self,
+        texts: List[str],
+        embed_batch: Callable[[List[str]], List[Optional[List[float]]]]
+    ) -> Tuple[np.ndarray, List[int]]:
+        """
+        Embed texts, calling the API only for texts not already stored.
+
+        Rows for texts that are no longer requested are pruned from the store.
+
+        Args:
+            texts: Texts to embed
+            embed_batch: Embeds a list of texts, returning None for failures
+
+        Returns:
+            (matrix of embeddings, indices into texts that each row belongs to)
+        """
+        hashes = [self.text_hash(text) for text in texts]
+        stored = self.lookup(hashes)
+
+        # Embed each distinct missing text once
+        missing = list(dict.fromkeys(h for h in hashes if h not in stored))
+        if missing:
+            text_by_hash = dict(zip(hashes, texts))
+            print(f"  Embedding {len(missing)} new or changed posts ({len(stored)} reused)")
+            results = embed_batch([text_by_hash[h] for h in missing])
+            new = {h: vector for h, vector in zip(missing, results) if vector is not None}
+        else:
+            print(f"  Reusing {len(stored)} stored embeddings")
+            new = {}
+
+        if new or len(self.rows) != len(stored):
+            self.save(new, keep=hashes)
+
+        vectors = {**stored, **new}
+        present = [i for i, h in enumerate(hashes) if h in vectors]
+        if not present:
+            return np.empty((0, 0), dtype=np.float32), []
+        return np.asarray([vectors[hashes[i]] for i in present], dtype=np.float32), present
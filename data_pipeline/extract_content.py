@@ -1,25 +1,15 @@
 """Extract and parse content from Ed posts."""
+import argparse
 import re
-import json
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any, Optional
-from bs4 import BeautifulSoup
+from typing import List, Dict, Any, Iterator, Optional
+from bs4 import BeautifulSoup, NavigableString, Tag
 from tqdm import tqdm
 import requests
 
 import config
-
-
-def load_json(filepath: Path) -> Any:
-    """Load data from JSON file."""
-    with open(filepath, 'r', encoding='utf-8') as f:
-        return json.load(f)
-
-
-def save_json(filepath: Path, data: Any) -> None:
-    """Save data as JSON."""
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+from utils import save_cache_json, load_json, find_json
 
 
 def html_to_markdown(html_content: str) -> str:
@@ -114,6 +104,105 @@ def extract_links(html_content: str) -> List[str]:
     return list(set(links))  # Remove duplicates
 
 
+def _clean_text(text: str) -> str:
+    """Collapse whitespace the same way html_to_markdown does."""
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return '\n'.join(chunk for chunk in chunks if chunk)
+
+
+def _detect_language(block: Tag) -> str:
+    """Detect a code block's language from its 'language-*' class."""
+    language = 'python'  # Default for CS182
+    for cls in block.get('class', []):
+        if 'language-' in cls:
+            return cls.replace('language-', '')
+    return language
+
+
+def extract_html_content(html_content: str) -> Dict[str, Any]:
+    """
+    Extract markdown, code snippets, links and author links in one pass.
+
+    Parses the document once and walks the tree once, producing the same
+    results as html_to_markdown, extract_code_snippets, extract_links and
+    extract_author_links.
+
+    Args:
+        html_content: HTML string
+
+    Returns:
+        Dict with 'markdown', 'code_snippets', 'links' and 'author_links'
+    """
+    result = {
+        'markdown': '',
+        'code_snippets': [],
+        'links': [],
+        'author_links': {'linkedin': None, 'website': None, 'github': None},
+    }
+    if not html_content:
+        return result
+
+    soup = BeautifulSoup(html_content, 'lxml')
+    text_types = soup.interesting_string_types
+    author_patterns = {
+        'linkedin': re.compile(r'linkedin\.com/[\w\-/]+', re.IGNORECASE),
+        'github': re.compile(r'github\.com/[\w\-/]+', re.IGNORECASE),
+    }
+
+    texts = []
+    links = {}  # Ordered set of external URLs
+    skip_until = None  # Last descendant of the script/style element being skipped
+
+    def match_author_links(value: str) -> None:
+        for name, pattern in author_patterns.items():
+            if result['author_links'][name] is None:
+                match = pattern.search(value)
+                if match:
+                    result['author_links'][name] = f"https://{match.group()}"
+
+    for element in soup.descendants:
+        if isinstance(element, NavigableString):
+            match_author_links(element)
+            if skip_until is None and type(element) in text_types:
+                texts.append(element)
+            if element is skip_until:
+                skip_until = None
+            continue
+
+        for value in element.attrs.values():
+            match_author_links(value if isinstance(value, str) else ' '.join(value))
+
+        if skip_until is None and element.name in ('script', 'style'):
+            # Markdown skips script/style text; mark where their subtree ends
+            last = element
+            while isinstance(last, Tag) and last.contents:
+                last = last.contents[-1]
+            if last is not element:
+                skip_until = last
+
+        if element.name in ('code', 'pre'):
+            code_text = element.get_text().strip()
+            # Skip very short snippets (likely inline code)
+            if len(code_text) >= 20:
+                result['code_snippets'].append({
+                    'language': _detect_language(element),
+                    'code': code_text,
+                    'context': None,
+                })
+        elif element.name == 'a':
+            href = element.get('href')
+            if href is not None and href.startswith('http'):
+                links[href] = None
+
+        if element is skip_until:
+            skip_until = None
+
+    result['markdown'] = _clean_text(''.join(texts))
+    result['links'] = list(links)
+    return result
+
+
 def extract_llm_from_title(title: str) -> Dict[str, Any]:
     """
     Try to extract LLM information from post title.
@@ -250,7 +339,7 @@ def extract_attachments(raw_post: Dict[str, Any]) -> List[Dict[str, str]]:
         attachments.append({
             'type': file_type,
             'filename': filename,
-            'local_path': '',  # Will download later
+            'local_path': '',  # Filled in by attachments.mirror_attachments
             'ed_url': att.get('url', ''),
         })
     
@@ -299,14 +388,11 @@ def enrich_post(post: Dict[str, Any]) -> Dict[str, Any]:
     html_content = post.get('content_raw_html', '')
     raw_ed_data = post.get('raw_ed_data', {})
     
-    # Convert HTML to markdown
-    post['content_markdown'] = html_to_markdown(html_content)
-    
-    # Extract code snippets
-    post['code_snippets'] = extract_code_snippets(html_content)
-    
-    # Extract links
-    post['external_links'] = extract_links(html_content)
+    # Parse the HTML once for markdown, code snippets, links and author links
+    extracted = extract_html_content(html_content)
+    post['content_markdown'] = extracted['markdown']
+    post['code_snippets'] = extracted['code_snippets']
+    post['external_links'] = extracted['links']
     
     # Extract LLM info from title
     llm_info = extract_llm_from_title(post['title'])
@@ -322,14 +408,47 @@ def enrich_post(post: Dict[str, Any]) -> Dict[str, Any]:
     post['attachments'] = extract_attachments(raw_ed_data)
     
     # Extract author contact info
-    author_links = extract_author_links(html_content)
-    post['author'].update(author_links)
+    post['author'].update(extracted['author_links'])
     
     return post
 
 
+def enrich_posts(
+    posts: List[Dict[str, Any]],
+    workers: int = 1,
+    chunksize: Optional[int] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Enrich posts, optionally fanning out over a process pool.
+
+    HTML parsing is CPU-bound, so with workers > 1 posts are sent to worker
+    processes in chunks. Results are yielded in input order as they complete.
+
+    Args:
+        posts: Structured post dictionaries
+        workers: Number of worker processes (1 runs in this process)
+        chunksize: Posts per task sent to a worker. Defaults to ~4 chunks per worker.
+
+    Yields:
+        Enriched post dictionaries, in the same order as posts
+    """
+    if workers <= 1 or len(posts) <= 1:
+        for post in posts:
+            yield enrich_post(post)
+        return
+
+    chunksize = chunksize or max(1, len(posts) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(enrich_post, posts, chunksize=chunksize)
+
+
 def main():
     """Main function to extract content from structured posts."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Worker processes for HTML extraction')
+    args = parser.parse_args()
+
     print("=" * 60)
     print("CS182 Special Participation B - Content Extraction")
     print("=" * 60)
@@ -337,7 +456,7 @@ def main():
     # Load structured posts
     input_file = config.CACHE_DIR / 'structured_posts.json'
     
-    if not input_file.exists():
+    if not find_json(input_file):
         print(f"\n✗ Error: {input_file} not found")
         print("Run fetch_posts.py first to fetch data from Ed")
         return
@@ -347,15 +466,15 @@ def main():
     
     # Enrich posts
     print(f"\n=== Extracting Content from {len(posts)} Posts ===")
-    enriched_posts = []
-    
-    for post in tqdm(posts, desc="Extracting"):
-        enriched = enrich_post(post)
-        enriched_posts.append(enriched)
+    enriched_posts = list(tqdm(
+        enrich_posts(posts, workers=args.workers),
+        total=len(posts),
+        desc="Extracting"
+    ))
     
     # Save enriched posts
     output_file = config.CACHE_DIR / 'enriched_posts.json'
-    save_json(output_file, enriched_posts)
+    save_cache_json(output_file, enriched_posts)
     
     print(f"\n✓ Saved {len(enriched_posts)} enriched posts to {output_file}")
     
@@ -1,31 +1,78 @@
 """Fetch and structure posts from Ed API."""
-import json
-from pathlib import Path
+import argparse
 from typing import List, Dict, Any, Optional
-from datetime import datetime
+from datetime import datetime, timedelta
 from tqdm import tqdm
 
 import config
 from ed_client import EdClient
+from utils import parse_timestamp, save_cache_json, load_json, find_json
 
 
-def save_json(filepath: Path, data: Any) -> None:
-    """Save data as JSON with pretty formatting."""
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+def thread_watermark(thread: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build the sync watermark for a listed thread.
+
+    Args:
+        thread: Thread dictionary from the Ed listing
+
+    Returns:
+        Dict with the fields that change when a thread is edited or replied to
+    """
+    return {
+        'number': thread.get('number'),
+        'updated_at': thread.get('updated_at'),
+        'reply_count': thread.get('reply_count'),
+    }
+
+
+def next_sync_cutoff(
+    previous: Optional[str],
+    listed_threads: List[Dict[str, Any]],
+    failed_threads: List[Dict[str, Any]]
+) -> Optional[str]:
+    """
+    Pick the timestamp the next incremental sync should scan back to.
+
+    Normally this is the newest `updated_at` seen in the listing. If any
+    details failed, the cutoff stays just before the oldest failed thread so
+    that it is listed, and retried, on the next run.
+    """
+    if failed_threads:
+        failed_times = [parse_timestamp(t.get('updated_at')) for t in failed_threads]
+        failed_times = [t for t in failed_times if t is not None]
+        if failed_times:
+            return (min(failed_times) - timedelta(microseconds=1)).isoformat()
+        return previous
 
+    listed = [
+        (parse_timestamp(t.get('updated_at')), t.get('updated_at'))
+        for t in listed_threads
+    ]
+    listed = [item for item in listed if item[0] is not None]
+    if not listed:
+        return previous
+    return max(listed)[1]
 
-def load_json(filepath: Path) -> Any:
-    """Load data from JSON file."""
-    if not filepath.exists():
-        return None
-    with open(filepath, 'r', encoding='utf-8') as f:
-        return json.load(f)
+
+def _thread_id(raw_post: Dict[str, Any]) -> str:
+    """Get the thread id from a raw detail response (nested or flat)."""
+    return str(raw_post.get('thread', raw_post).get('id', ''))
+
+
+def _report_failures(failures: List[Dict[str, Any]], total: int) -> None:
+    """Print threads whose details could not be fetched."""
+    if failures:
+        print(f"\n⚠ Failed to fetch {len(failures)} of {total} threads:")
+        for failure in failures:
+            print(f"  • #{failure['thread_number']}: {failure['error']}")
 
 
 def fetch_all_participation_posts(
     use_cache: bool = True,
-    limit: Optional[int] = None
+    limit: Optional[int] = None,
+    workers: Optional[int] = None,
+    incremental: bool = False
 ) -> List[Dict[str, Any]]:
     """
     Fetch all Special Participation B posts from Ed.
@@ -33,14 +80,18 @@ def fetch_all_participation_posts(
     Args:
         use_cache: Whether to use cached data if available
         limit: Optional limit on number of posts to fetch (for testing)
+        workers: Concurrent detail requests. Defaults to ED_FETCH_WORKERS from config.
+        incremental: Refresh the cache by re-fetching only threads changed since
+            the last sync. Falls back to a full fetch when there is no sync state.
         
     Returns:
         List of structured post dictionaries
     """
     cache_file = config.CACHE_DIR / 'raw_threads.json'
+    state_file = config.CACHE_DIR / 'sync_state.json'
     
     # Check cache first
-    if use_cache and cache_file.exists():
+    if use_cache and not incremental and find_json(cache_file):
         print("Loading threads from cache...")
         cached = load_json(cache_file)
         if cached:
@@ -48,36 +99,123 @@ def fetch_all_participation_posts(
             return cached
     
     # Initialize Ed client
-    client = EdClient()
-    
-    # Fetch all threads
-    print("\n=== Fetching Threads ===")
-    all_threads = client.fetch_all_threads(limit=limit)
-    
-    # Filter for participation B
-    participation_threads = client.filter_participation_b_threads(all_threads)
-    
-    # Fetch detailed content for each thread
-    print("\n=== Fetching Thread Details ===")
-    detailed_posts = []
+    client = EdClient(max_workers=workers)
+
+    if incremental:
+        cached = load_json(cache_file)
+        state = load_json(state_file)
+        if cached is not None and state and state.get('last_synced_at'):
+            return sync_participation_posts(client, cached, state)
+        print("No previous sync state found, running a full fetch")
     
-    for thread in tqdm(participation_threads, desc="Fetching details"):
-        thread_number = thread.get('number')
-        if not thread_number:
-            continue
-
-        details = client.fetch_thread_details(thread_number)
-        if details:
-            detailed_posts.append(details)
+    # Find participation B threads (filtered server-side where Ed supports it)
+    # and fetch their details as each listing page arrives
+    print("\n=== Fetching Threads and Details ===")
+    participation_threads = []
+
+    def listed_thread_numbers():
+        for page in client.iter_participation_threads(limit=limit):
+            for thread in page:
+                if thread.get('number'):
+                    participation_threads.append(thread)
+                    yield thread['number']
+
+    detailed_posts, failures = client.fetch_threads_details(listed_thread_numbers())
+    print(f"Discovered {len(participation_threads)} threads via {client.discovery_method} "
+          f"in {client.pages_fetched} listing pages")
+    _report_failures(failures, len(participation_threads))
+    if client.http_cache is not None:
+        print(f"HTTP cache: {client.http_cache.summary()}")
     
     # Cache the results
     if config.ENABLE_CACHE:
-        save_json(cache_file, detailed_posts)
+        save_cache_json(cache_file, detailed_posts)
         print(f"\n✓ Cached {len(detailed_posts)} posts to {cache_file}")
+
+        failed_numbers = {f['thread_number'] for f in failures}
+        state = {
+            'last_synced_at': next_sync_cutoff(
+                None,
+                participation_threads,
+                [t for t in participation_threads if t['number'] in failed_numbers]
+            ),
+            'threads': {
+                str(t['id']): thread_watermark(t)
+                for t in participation_threads
+                if t['number'] not in failed_numbers
+            },
+        }
+        save_cache_json(state_file, state)
     
     return detailed_posts
 
 
+def sync_participation_posts(
+    client: EdClient,
+    cached: List[Dict[str, Any]],
+    state: Dict[str, Any]
+) -> List[Dict[str, Any]]:
+    """
+    Incrementally refresh cached thread details.
+
+    Lists threads by recent activity back to the previous sync, then
+    re-fetches details only for participation B threads whose watermark
+    (updated_at, reply count) changed.
+
+    Args:
+        client: Initialized Ed client
+        cached: Thread details from the previous sync
+        state: Sync state with 'last_synced_at' and per-thread 'threads' watermarks
+
+    Returns:
+        Merged list of thread details, newly created threads first
+    """
+    cache_file = config.CACHE_DIR / 'raw_threads.json'
+    state_file = config.CACHE_DIR / 'sync_state.json'
+    watermarks = state.get('threads', {})
+
+    print("\n=== Incremental Sync ===")
+    updated_threads = client.fetch_threads_updated_since(state['last_synced_at'])
+    participation_threads = client.filter_participation_b_threads(updated_threads)
+
+    changed = [
+        t for t in participation_threads
+        if t.get('number') and watermarks.get(str(t['id'])) != thread_watermark(t)
+    ]
+    print(f"Changed participation B threads: {len(changed)}")
+
+    details, failures = client.fetch_threads_details([t['number'] for t in changed])
+    _report_failures(failures, len(changed))
+    if client.http_cache is not None:
+        print(f"HTTP cache: {client.http_cache.summary()}")
+
+    # Replace changed threads in place and put brand new ones first
+    fresh = {_thread_id(d): d for d in details}
+    merged = [fresh.pop(_thread_id(post), post) for post in cached]
+    merged = list(fresh.values()) + merged
+
+    failed_numbers = {f['thread_number'] for f in failures}
+    for thread in changed:
+        if thread['number'] not in failed_numbers:
+            watermarks[str(thread['id'])] = thread_watermark(thread)
+
+    state = {
+        'last_synced_at': next_sync_cutoff(
+            state['last_synced_at'],
+            updated_threads,
+            [t for t in changed if t['number'] in failed_numbers]
+        ),
+        'threads': watermarks,
+    }
+
+    if config.ENABLE_CACHE:
+        save_cache_json(cache_file, merged)
+        save_cache_json(state_file, state)
+        print(f"\n✓ Synced {len(details)} changed posts ({len(merged)} total) to {cache_file}")
+
+    return merged
+
+
 def structure_post_data(raw_post: Dict[str, Any]) -> Dict[str, Any]:
     """
     Convert raw Ed thread data to our structured format.
@@ -159,12 +297,23 @@ def structure_post_data(raw_post: Dict[str, Any]) -> Dict[str, Any]:
 
 def main():
     """Main function to fetch and structure posts."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--incremental', action='store_true',
+                        help='Re-fetch only threads changed since the last sync')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Concurrent thread-detail requests')
+    args = parser.parse_args()
+
     print("=" * 60)
     print("CS182 Special Participation B - Data Fetching")
     print("=" * 60)
-    
+
     # Fetch posts
-    raw_posts = fetch_all_participation_posts(use_cache=True)
+    raw_posts = fetch_all_participation_posts(
+        use_cache=True,
+        workers=args.workers,
+        incremental=args.incremental
+    )
     
     if not raw_posts:
         print("\n⚠ No posts found. Check your Ed API credentials.")
@@ -180,7 +329,7 @@ def main():
     
     # Save structured posts
     output_file = config.CACHE_DIR / 'structured_posts.json'
-    save_json(output_file, structured_posts)
+    save_cache_json(output_file, structured_posts)
     
     print(f"\n✓ Saved {len(structured_posts)} structured posts to {output_file}")
     print("\n=== Summary ===")
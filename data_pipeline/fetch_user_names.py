@@ -3,10 +3,9 @@
 Fetch user names from Ed API and update posts.
 """
 
-import json
-from pathlib import Path
 from ed_client import EdClient
-from utils import load_cache, save_cache, write_json
+from build_dataset import republish_posts
+from utils import save_cache_records, iter_cache_records, find_json, load_json
 from config import OUTPUT_DIR, CACHE_DIR
 
 
@@ -17,17 +16,14 @@ def fetch_and_update_names():
     print("Fetching User Names from Ed API")
     print("=" * 60)
 
-    # Load posts to get user IDs
+    # Load the published posts to get user IDs
     posts_file = OUTPUT_DIR / 'posts.json'
-    if not posts_file.exists():
+    posts = load_json(posts_file)
+    if not posts:
         print(f"\n✗ Error: {posts_file} not found")
         return
 
-    print(f"\nLoading posts from {posts_file}...")
-    with open(posts_file, 'r') as f:
-        posts = json.load(f)
-
-    print(f"✓ Loaded {len(posts)} posts")
+    print(f"\n✓ Loaded {len(posts)} posts from {posts_file}")
 
     # Extract unique user IDs
     user_ids = set()
@@ -61,35 +57,35 @@ def fetch_and_update_names():
         print(f"  ✗ Error fetching users: {e}")
         user_names = {}
 
-    # Update posts with fetched names
+    # Update the published index, detail shards and posts.json with fetched names
     print(f"\nUpdating {len(posts)} posts with user names...")
-    updated_count = 0
 
-    for post in posts:
-        user_id = post.get('author', {}).get('ed_user_id')
-        if user_id and user_id in user_names:
-            old_name = post['author']['name']
-            new_name = user_names[user_id]
-            if old_name != new_name:
-                post['author']['name'] = new_name
-                updated_count += 1
+    renamed = []
 
+    def rename_author(post):
+        user_id = post.get('author', {}).get('ed_user_id')
+        if not user_id or user_id not in user_names or post['author']['name'] == user_names[user_id]:
+            return False
+        post['author']['name'] = user_names[user_id]
+        renamed.append(post['post_id'])
+        return True
+
+    outputs = republish_posts(rename_author)
+    updated_count = len(renamed)
     print(f"✓ Updated {updated_count} author names")
-
-    # Save updated posts
-    write_json(str(posts_file), posts)
-    print(f"\n✓ Saved updated posts to {posts_file}")
+    if outputs:
+        print(f"\n✓ Saved updated posts to {outputs['index']}, {outputs['shards']}/ and {outputs['posts']}")
 
     # Also update cached files
-    for cache_file in ['analyzed_posts.json', 'structured_posts.json']:
+    for cache_file in ['analyzed_posts.jsonl', 'structured_posts.jsonl']:
         cache_path = CACHE_DIR / cache_file
-        if cache_path.exists():
-            cached_posts = load_cache(cache_file)
+        if find_json(cache_path):
+            cached_posts = list(iter_cache_records(cache_file))
             for post in cached_posts:
                 user_id = post.get('author', {}).get('ed_user_id')
                 if user_id and user_id in user_names:
                     post['author']['name'] = user_names[user_id]
-            save_cache(cache_file, cached_posts)
+            save_cache_records(cache_file, cached_posts)
             print(f"✓ Updated {cache_path}")
 
     print("\n" + "=" * 60)
@@ -10,12 +10,462 @@ This module performs corpus-level analysis:
 """
 
 import json
-from collections import defaultdict, Counter
-from typing import Dict, Any, List
-import statistics
+import math
+import zlib
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+import re
+from pathlib import Path
+import numpy as np
 from openai import OpenAI
 
-from config import OPENAI_API_KEY
+from config import (
+    OPENAI_API_KEY, EMBEDDING_BACKEND, EMBEDDING_MODEL, EMBEDDING_BATCH_SIZE, CACHE_DIR,
+    ANN_MIN_POSTS, ANN_NLIST, ANN_NPROBE,
+)
+from ann_index import IVFIndex, normalize_rows
+from embedding_store import EmbeddingStore
+from search_index import tokenize
+
+# Persistent embeddings, reused across runs for posts whose text is unchanged
+EMBEDDINGS_DIR = CACHE_DIR / 'embeddings'
+
+# Per-post columns of the insights frame
+# LLM profile task classification by mean one-shot success rate
+STRONG_TASK_RATE = 70
+WEAK_TASK_RATE = 40
+
+# Nuggets quote the most recent NUGGET_POSTS posts with at least this highlight score
+NUGGET_MIN_HIGHLIGHT = 7
+NUGGET_POSTS = 10
+
+# Related posts listed for each post
+SIMILAR_POSTS_COUNT = 5
+
+
+def top_k_similar(embeddings: np.ndarray, k: int, block_size: int = 2048) -> np.ndarray:
+    """
+    Find each row's k most cosine-similar other rows, exactly.
+
+    Args:
+        embeddings: (n, d) matrix with one embedding per row
+        k: Neighbors to return per row
+        block_size: Rows scored at a time, bounding memory to block_size x n
+
+    Returns:
+        (n, min(k, n - 1)) matrix of row indices, most similar first
+    """
+    n = embeddings.shape[0]
+    k = min(k, n - 1)
+    if k <= 0:
+        return np.empty((n, 0), dtype=np.intp)
+
+    normalized = normalize_rows(embeddings)
+    result = np.empty((n, k), dtype=np.intp)
+
+    for start in range(0, n, block_size):
+        scores = normalized[start:start + block_size] @ normalized.T
+        rows = np.arange(scores.shape[0])
+        scores[rows, rows + start] = -np.inf
+
+        # Unordered top-k per row, then sort just those k
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        result[start:start + block_size] = np.take_along_axis(top, order, axis=1)
+
+    return result
+
+
+def approximate_top_k_similar(
+    embeddings: np.ndarray,
+    k: int,
+    index_path: Optional[Path] = None
+) -> np.ndarray:
+    """
+    Find each row's k most similar other rows with an IVF index.
+
+    Centroids are loaded from index_path when they still fit the corpus,
+    and retrained and saved there otherwise.
+
+    Args:
+        embeddings: (n, d) matrix with one embedding per row
+        k: Neighbors to return per row
+        index_path: Where to persist the index (None to always train)
+
+    Returns:
+        (n, min(k, n - 1)) row indices, most similar first, -1 padded
+    """
+    n, dim = embeddings.shape
+    index = IVFIndex.load(index_path) if index_path else None
+
+    if index is None or index.needs_retraining(n, dim) or (ANN_NLIST and index.nlist != ANN_NLIST):
+        print(f"  Training ANN index over {n} posts...")
+        index = IVFIndex.train(embeddings, nlist=ANN_NLIST or None)
+        if index_path:
+            index.save(index_path)
+
+    return index.neighbors(embeddings, k, nprobe=ANN_NPROBE)
+
+
+class EmbeddingBackend(ABC):
+    """Turns posts into vectors for similarity search."""
+
+    name = 'base'
+
+    # Whether vectors are stable across runs, so an ANN index over them can be reused
+    persistent = False
+
+    @abstractmethod
+    def embed_posts(self, posts: List[Dict[str, Any]]) -> Tuple[np.ndarray, List[int]]:
+        """
+        Embed posts.
+
+        Args:
+            posts: Analyzed posts
+
+        Returns:
+            (matrix with one row per embedded post, indices into posts for each row)
+        """
+
+
+class OpenAIEmbeddingBackend(EmbeddingBackend):
+    """OpenAI embeddings API, with vectors persisted in an EmbeddingStore."""
+
+    persistent = True
+
+    def __init__(self, client: OpenAI, model: str = EMBEDDING_MODEL):
+        self.client = client
+        self.model = model
+        self.name = model
+
+    @staticmethod
+    def post_text(post: Dict[str, Any]) -> str:
+        """Create the text representation sent for embedding."""
+        text = f"{post['title']} {post.get('summary', '')} "
+        text += " ".join(post.get('task_types', []))
+        return text[:8000]
+
+    def embed_texts(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Embed texts in batches of EMBEDDING_BATCH_SIZE per request.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            One embedding per text, or None where its batch failed
+        """
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        for start in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+            batch = texts[start:start + EMBEDDING_BATCH_SIZE]
+            try:
+                response = self.client.embeddings.create(
+                    model=self.model,
+                    input=batch
+                )
+            except Exception as e:
+                print(f"  Warning: Failed to generate embeddings for {len(batch)} posts: {e}")
+                continue
+
+            for item in response.data:
+                embeddings[start + item.index] = item.embedding
+        return embeddings
+
+    def embed_posts(self, posts: List[Dict[str, Any]]) -> Tuple[np.ndarray, List[int]]:
+        # Only posts whose text is new or changed get embedded
+        store = EmbeddingStore(EMBEDDINGS_DIR, self.model)
+        return store.embed([self.post_text(post) for post in posts], self.embed_texts)
+
+
+class LocalEmbeddingBackend(EmbeddingBackend):
+    """
+    Offline embeddings: hashed TF-IDF features reduced with truncated SVD.
+
+    Vectors depend on the whole corpus, so nothing is persisted. The term
+    matrix is kept sparse and only the top `dimensions` singular directions
+    are computed: exactly from the Gram matrix for up to BATCH_ROWS posts,
+    and with a randomized range finder above that, whose cost grows
+    linearly with the number of posts.
+    """
+
+    name = 'local TF-IDF'
+
+    # Randomized SVD: directions sampled per kept dimension, and refinement
+    # passes. TF-IDF spectra decay slowly, so both are needed to match the
+    # exact nearest neighbors
+    OVERSAMPLING = 2
+    POWER_ITERATIONS = 4
+
+    # Posts densified at once when multiplying by the term matrix
+    BATCH_ROWS = 1024
+
+    def __init__(self, n_features: int = 2 ** 12, dimensions: int = 64):
+        """
+        Args:
+            n_features: Hash buckets for the sparse term features
+            dimensions: Size of the reduced embedding
+        """
+        self.n_features = n_features
+        self.dimensions = dimensions
+
+    @staticmethod
+    def post_text(post: Dict[str, Any]) -> str:
+        """Combine the fields that describe what a post is about."""
+        parts = [post.get('title') or '', post.get('summary') or '']
+        parts.extend(post.get('tags') or [])
+        parts.extend(post.get('task_types') or [])
+        return ' '.join(parts)
+
+    def term_matrix(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Count hashed unigrams and bigrams per text.
+
+        Returns:
+            Sparse (rows, columns, counts) arrays, ordered by row
+        """
+        rows, columns, counts = [], [], []
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            terms = tokens + [f'{a} {b}' for a, b in zip(tokens, tokens[1:])]
+            buckets = Counter(zlib.crc32(term.encode('utf-8')) % self.n_features for term in terms)
+            rows.extend([row] * len(buckets))
+            columns.extend(buckets.keys())
+            counts.extend(buckets.values())
+        return (np.array(rows, dtype=np.int64), np.array(columns, dtype=np.int64),
+                np.array(counts, dtype=np.float64))
+
+    def embed_posts(self, posts: List[Dict[str, Any]]) -> Tuple[np.ndarray, List[int]]:
+        if not posts:
+            return np.empty((0, 0), dtype=np.float32), []
+
+        n = len(posts)
+        rows, columns, counts = self.term_matrix([self.post_text(post) for post in posts])
+
+        # Sublinear TF, smoothed IDF, then L2-normalized rows
+        doc_freq = np.bincount(columns, minlength=self.n_features)
+        idf = np.log((1 + n) / (1 + doc_freq)) + 1
+        values = np.log1p(counts) * idf[columns]
+        norms = np.sqrt(np.bincount(rows, weights=values ** 2, minlength=n))
+        values /= np.maximum(norms[rows], 1e-12)
+
+        # X @ m and X.T @ m for the sparse TF-IDF matrix X, one dense block
+        # of rows at a time so memory stays bounded by BATCH_ROWS
+        bounds = np.searchsorted(rows, np.arange(0, n + self.BATCH_ROWS, self.BATCH_ROWS))
+
+        def blocks() -> Iterator[Tuple[slice, np.ndarray]]:
+            for i, start in enumerate(range(0, n, self.BATCH_ROWS)):
+                stop = min(start + self.BATCH_ROWS, n)
+                lo, hi = bounds[i], bounds[i + 1]
+                block = np.zeros((stop - start, self.n_features))
+                block[rows[lo:hi] - start, columns[lo:hi]] = values[lo:hi]
+                yield slice(start, stop), block
+
+        def times(m: np.ndarray) -> np.ndarray:
+            product = np.empty((n, m.shape[1]))
+            for span, block in blocks():
+                product[span] = block @ m
+            return product
+
+        def transpose_times(m: np.ndarray) -> np.ndarray:
+            product = np.zeros((self.n_features, m.shape[1]))
+            for span, block in blocks():
+                product += block.T @ m[span]
+            return product
+
+        # Keep the top singular directions (latent semantic analysis)
+        k = min(self.dimensions, n, self.n_features)
+        if n <= self.BATCH_ROWS:
+            # Exact: U * S from the eigendecomposition of the n x n Gram matrix
+            _, block = next(blocks())
+            eigenvalues, vectors = np.linalg.eigh(block @ block.T)
+            top = np.argsort(eigenvalues)[::-1][:k]
+            return vectors[:, top] * np.sqrt(np.maximum(eigenvalues[top], 0)), list(range(n))
+
+        # Randomized: find an orthonormal basis Q for X's dominant column
+        # space, then take the SVD of the small matrix Q.T @ X
+        width = min(k * self.OVERSAMPLING, n, self.n_features)
+        rng = np.random.default_rng(0)  # Fixed, so reruns give the same neighbors
+        q, _ = np.linalg.qr(times(rng.standard_normal((self.n_features, width))))
+        for _ in range(self.POWER_ITERATIONS):
+            z, _ = np.linalg.qr(transpose_times(q))
+            q, _ = np.linalg.qr(times(z))
+        u, singular_values, _ = np.linalg.svd(transpose_times(q).T, full_matrices=False)
+        return (q @ u[:, :k]) * singular_values[:k], list(range(n))
+
+
+def get_embedding_backend(openai_client: Optional[OpenAI] = None) -> Optional[EmbeddingBackend]:
+    """
+    Pick the embedding backend configured by EMBEDDING_BACKEND.
+
+    'auto' uses OpenAI when a client is available and the local backend
+    otherwise.
+
+    Args:
+        openai_client: OpenAI client, if an API key is configured
+
+    Returns:
+        Embedding backend, or None if 'openai' is requested without a client
+    """
+    if EMBEDDING_BACKEND == 'local':
+        return LocalEmbeddingBackend()
+    if EMBEDDING_BACKEND == 'openai':
+        return OpenAIEmbeddingBackend(openai_client) if openai_client else None
+    if EMBEDDING_BACKEND != 'auto':
+        raise ValueError(f"Unknown EMBEDDING_BACKEND: {EMBEDDING_BACKEND}")
+    return OpenAIEmbeddingBackend(openai_client) if openai_client else LocalEmbeddingBackend()
+
+
+def round_rate(value: float) -> Optional[float]:
+    """Round a mean success rate for output; None when missing (NaN) or zero."""
+    if value is None or math.isnan(value) or not value:
+        return None
+    return round(float(value), 1)
+
+
+def top_k(counter: Counter, k: int) -> List[str]:
+    """Most common items, ties broken alphabetically so order never depends on post order."""
+    return [item for item, _ in sorted(counter.items(), key=lambda kv: (-kv[1], kv[0]))[:k]]
+
+
+def split_task_strengths(task_rates: Dict[str, float]) -> Tuple[List[str], List[str]]:
+    """
+    Classify an LLM's tasks by mean success rate.
+
+    Args:
+        task_rates: Task type -> mean one-shot success rate
+
+    Returns:
+        (up to 5 tasks at or above STRONG_TASK_RATE, up to 5 at or below
+        WEAK_TASK_RATE), each in task name order
+    """
+    strengths = [task for task in sorted(task_rates) if task_rates[task] >= STRONG_TASK_RATE]
+    weaknesses = [task for task in sorted(task_rates) if task_rates[task] <= WEAK_TASK_RATE]
+    return strengths[:5], weaknesses[:5]
+
+
+def nugget_source(post: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Extract the quotable parts of a high-quality post.
+
+    Args:
+        post: Analyzed post
+
+    Returns:
+        Nugget source dict, or None if the post is not high quality
+    """
+    if post.get('highlight_score', 0) < NUGGET_MIN_HIGHLIGHT:
+        return None
+    insights = post.get('insights', {})
+    return {
+        'post_id': post['post_id'],
+        'date': post.get('date') or '',
+        'llm': post.get('llm_info', {}).get('primary_llm', 'Unknown'),
+        'strengths': insights.get('strengths', [])[:2],
+        'weaknesses': insights.get('weaknesses', [])[:2],
+        'strategies': insights.get('effective_strategies', [])[:2],
+    }
+
+
+def metric_value(value: Any) -> Optional[float]:
+    """Numeric value of a metric, or None when missing or not a number."""
+    if isinstance(value, bool) or value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def post_contribution(post: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Reduce a post to the values it contributes to the insight statistics.
+
+    insights_state.InsightsState aggregates these, and keeps them per post
+    so a changed post's old contribution can be subtracted.
+
+    Args:
+        post: Analyzed post
+
+    Returns:
+        JSON-serializable contribution
+    """
+    insights = post.get('insights', {})
+    return {
+        'llm': post.get('llm_info', {}).get('primary_llm', 'Unknown'),
+        'highlight': metric_value(post.get('highlight_score', 0)),
+        'correctness': metric_value(post.get('code_quality', {}).get('correctness_rating')),
+        'success': metric_value(insights.get('one_shot_success_rate')),
+        'tasks': list(post.get('task_types', [])),
+        'strengths': list(insights.get('strengths', [])),
+        'weaknesses': list(insights.get('weaknesses', [])),
+        'failures': list(insights.get('common_mistakes', [])),
+        'nugget': nugget_source(post),
+    }
+
+
+def build_nuggets(
+    sources: List[Dict[str, Any]],
+    llm_weaknesses: Dict[str, Counter]
+) -> List[Dict[str, Any]]:
+    """
+    Build insight nuggets from high-quality posts and common weaknesses.
+
+    Args:
+        sources: nugget_source() of every high-quality post
+        llm_weaknesses: LLM -> Counter of reported weaknesses
+
+    Returns:
+        Up to 50 nuggets
+    """
+    nuggets = []
+
+    # Strategy 1: Quote the most recent high-quality posts
+    recent = sorted(sources, key=lambda source: source['post_id'])
+    recent.sort(key=lambda source: source['date'], reverse=True)
+    for source in recent[:NUGGET_POSTS]:
+        for strength in source['strengths']:
+            if len(strength) > 20:
+                nuggets.append({
+                    'text': f"{source['llm']}: {strength}",
+                    'category': 'strength',
+                    'source_posts': [source['post_id']],
+                    'confidence': 'high'
+                })
+
+        for weakness in source['weaknesses']:
+            if len(weakness) > 20:
+                nuggets.append({
+                    'text': f"{source['llm']} struggles with: {weakness}",
+                    'category': 'weakness',
+                    'source_posts': [source['post_id']],
+                    'confidence': 'high'
+                })
+
+        for strategy in source['strategies']:
+            if len(strategy) > 20:
+                nuggets.append({
+                    'text': f"Effective strategy: {strategy}",
+                    'category': 'strategy',
+                    'source_posts': [source['post_id']],
+                    'confidence': 'medium'
+                })
+
+    # Strategy 2: Aggregate common patterns
+    for llm_name in sorted(llm_weaknesses):
+        weaknesses = llm_weaknesses[llm_name]
+        for weakness in top_k(weaknesses, 3):
+            count = weaknesses[weakness]
+            if count >= 2:
+                nuggets.append({
+                    'text': f"{llm_name} commonly struggles with: {weakness}",
+                    'category': 'common-weakness',
+                    'source_posts': [],
+                    'confidence': 'high' if count >= 3 else 'medium'
+                })
+
+    return nuggets[:50]
 
 
 class InsightsGenerator:
@@ -41,282 +491,49 @@ class InsightsGenerator:
         Returns:
             Dict with insights data
         """
-        print("\nGenerating cross-post insights...")
+        # Imported here: insights_state builds on the helpers in this module
+        from insights_state import InsightsState
 
-        llm_profiles = self.generate_llm_profiles()
-        task_difficulty = self.analyze_task_difficulty()
-        nuggets = self.extract_insight_nuggets()
-        comparative = self.generate_comparative_analysis()
+        print("\nGenerating cross-post insights...")
 
-        insights = {
-            'llm_profiles': llm_profiles,
-            'task_difficulty': task_difficulty,
-            'nuggets': nuggets,
-            'comparative_analysis': comparative
-        }
+        state = InsightsState()
+        state.sync(self.posts)
+        insights = state.to_insights()
 
-        print(f"  Success: Generated {len(llm_profiles)} LLM profiles")
-        print(f"  Success: Analyzed {len(task_difficulty)} task types")
-        print(f"  Success: Extracted {len(nuggets)} insight nuggets")
+        print(f"  Success: Generated {len(insights['llm_profiles'])} LLM profiles")
+        print(f"  Success: Analyzed {len(insights['task_difficulty'])} task types")
+        print(f"  Success: Extracted {len(insights['nuggets'])} insight nuggets")
 
         return insights
 
-    def generate_llm_profiles(self) -> List[Dict[str, Any]]:
-        """Generate performance profile for each LLM."""
-        # Group posts by LLM
-        llm_posts = defaultdict(list)
-        for post in self.posts:
-            llm_name = post.get('llm_info', {}).get('primary_llm', 'Unknown')
-            llm_posts[llm_name].append(post)
-
-        profiles = []
-
-        for llm_name, posts in llm_posts.items():
-            if not posts:
-                continue
-
-            # Calculate average success rate
-            success_rates = [
-                p.get('insights', {}).get('one_shot_success_rate', 50)
-                for p in posts
-                if p.get('insights', {}).get('one_shot_success_rate') is not None
-            ]
-            avg_success = statistics.mean(success_rates) if success_rates else None
-
-            # Aggregate strengths and weaknesses
-            all_strengths = []
-            all_weaknesses = []
-            all_failures = []
-
-            for post in posts:
-                insights = post.get('insights', {})
-                all_strengths.extend(insights.get('strengths', []))
-                all_weaknesses.extend(insights.get('weaknesses', []))
-                all_failures.extend(insights.get('common_mistakes', []))
-
-            # Find task-specific performance
-            task_performance = defaultdict(list)
-            for post in posts:
-                task_types = post.get('task_types', [])
-                success_rate = post.get('insights', {}).get('one_shot_success_rate')
-                if success_rate is not None:
-                    for task in task_types:
-                        task_performance[task].append(success_rate)
-
-            # Identify strengths (high success rate tasks)
-            task_strengths = []
-            task_weaknesses = []
-            for task, rates in task_performance.items():
-                avg_rate = statistics.mean(rates)
-                if avg_rate >= 70:
-                    task_strengths.append(task)
-                elif avg_rate <= 40:
-                    task_weaknesses.append(task)
-
-            # Extract unique capabilities from strengths
-            strength_counter = Counter(all_strengths)
-            unique_capabilities = [s for s, count in strength_counter.most_common(5)]
-
-            # Extract common failure modes
-            failure_counter = Counter(all_failures + all_weaknesses)
-            common_failures = [f for f, count in failure_counter.most_common(5)]
-
-            profile = {
-                'llm_name': llm_name,
-                'submission_count': len(posts),
-                'average_success_rate': round(avg_success, 1) if avg_success else None,
-                'task_strengths': task_strengths[:5],
-                'task_weaknesses': task_weaknesses[:5],
-                'common_failure_modes': common_failures,
-                'unique_capabilities': unique_capabilities
-            }
-
-            profiles.append(profile)
-
-        # Sort by submission count
-        profiles.sort(key=lambda p: p['submission_count'], reverse=True)
-
-        return profiles
-
-    def analyze_task_difficulty(self) -> Dict[str, float]:
-        """Analyze difficulty of each task type based on success rates."""
-        task_success_rates = defaultdict(list)
-
-        for post in self.posts:
-            task_types = post.get('task_types', [])
-            success_rate = post.get('insights', {}).get('one_shot_success_rate')
-
-            if success_rate is not None:
-                for task in task_types:
-                    task_success_rates[task].append(success_rate)
-
-        # Convert to difficulty scores (inverse of success rate)
-        task_difficulty = {}
-        for task, rates in task_success_rates.items():
-            avg_success = statistics.mean(rates)
-            difficulty = 100 - avg_success
-            task_difficulty[task] = round(difficulty, 1)
-
-        return task_difficulty
-
-    def extract_insight_nuggets(self) -> List[Dict[str, Any]]:
-        """Extract quotable, actionable insights from posts."""
-        nuggets = []
-
-        # Strategy 1: Extract from high-quality posts
-        high_quality_posts = [
-            p for p in self.posts
-            if p.get('highlight_score', 0) >= 7
-        ]
-
-        for post in high_quality_posts[:10]:
-            insights = post.get('insights', {})
-
-            # Extract from strengths
-            for strength in insights.get('strengths', [])[:2]:
-                if len(strength) > 20:
-                    nuggets.append({
-                        'text': f"{post['llm_info']['primary_llm']}: {strength}",
-                        'category': 'strength',
-                        'source_posts': [post['post_id']],
-                        'confidence': 'high'
-                    })
-
-            # Extract from weaknesses
-            for weakness in insights.get('weaknesses', [])[:2]:
-                if len(weakness) > 20:
-                    nuggets.append({
-                        'text': f"{post['llm_info']['primary_llm']} struggles with: {weakness}",
-                        'category': 'weakness',
-                        'source_posts': [post['post_id']],
-                        'confidence': 'high'
-                    })
-
-            # Extract from effective strategies
-            for strategy in insights.get('effective_strategies', [])[:2]:
-                if len(strategy) > 20:
-                    nuggets.append({
-                        'text': f"Effective strategy: {strategy}",
-                        'category': 'strategy',
-                        'source_posts': [post['post_id']],
-                        'confidence': 'medium'
-                    })
-
-        # Strategy 2: Aggregate common patterns
-        llm_weakness_map = defaultdict(list)
-        for post in self.posts:
-            llm_name = post.get('llm_info', {}).get('primary_llm', 'Unknown')
-            weaknesses = post.get('insights', {}).get('weaknesses', [])
-            llm_weakness_map[llm_name].extend(weaknesses)
-
-        for llm_name, weaknesses in llm_weakness_map.items():
-            weakness_counter = Counter(weaknesses)
-            for weakness, count in weakness_counter.most_common(3):
-                if count >= 2:
-                    nuggets.append({
-                        'text': f"{llm_name} commonly struggles with: {weakness}",
-                        'category': 'common-weakness',
-                        'source_posts': [],
-                        'confidence': 'high' if count >= 3 else 'medium'
-                    })
-
-        return nuggets[:50]
-
-    def generate_comparative_analysis(self) -> Dict[str, Any]:
-        """Generate comparative analysis between LLMs."""
-        llm_comparison = {}
-
-        # Group posts by LLM
-        llm_posts = defaultdict(list)
-        for post in self.posts:
-            llm_name = post.get('llm_info', {}).get('primary_llm', 'Unknown')
-            llm_posts[llm_name].append(post)
-
-        # Calculate aggregate metrics for each LLM
-        for llm_name, posts in llm_posts.items():
-            if not posts:
-                continue
-
-            avg_highlight = statistics.mean([p.get('highlight_score', 0) for p in posts])
-
-            # Filter out None values for correctness ratings
-            correctness_ratings = [
-                p.get('code_quality', {}).get('correctness_rating')
-                for p in posts
-                if p.get('code_quality', {}).get('correctness_rating') is not None
-            ]
-            avg_correctness = statistics.mean(correctness_ratings) if correctness_ratings else 5
-
-            success_rates = [
-                p.get('insights', {}).get('one_shot_success_rate')
-                for p in posts
-                if p.get('insights', {}).get('one_shot_success_rate') is not None
-            ]
-            avg_success = statistics.mean(success_rates) if success_rates else None
-
-            llm_comparison[llm_name] = {
-                'post_count': len(posts),
-                'avg_highlight_score': round(avg_highlight, 2),
-                'avg_code_correctness': round(avg_correctness, 2),
-                'avg_success_rate': round(avg_success, 1) if avg_success else None
-            }
-
-        return {
-            'by_llm': llm_comparison,
-            'total_llms': len(llm_comparison),
-            'total_posts': len(self.posts)
-        }
-
     def compute_post_similarities(self) -> Dict[str, List[str]]:
         """Compute similar posts for each post using embeddings."""
-        if not self.openai_client:
+        backend = get_embedding_backend(self.openai_client)
+        if backend is None:
             print("  Warning: Skipping similarity detection (no OpenAI key)")
             return {}
 
-        print("\nComputing post similarities using embeddings...")
-
-        # Generate embeddings for all posts
-        embeddings = []
-        post_ids = []
+        print(f"\nComputing post similarities using {backend.name} embeddings...")
 
-        for post in self.posts[:50]:
-            # Create text representation for embedding
-            text = f"{post['title']} {post.get('summary', '')} "
-            text += " ".join(post.get('task_types', []))
-
-            try:
-                response = self.openai_client.embeddings.create(
-                    model="text-embedding-3-small",
-                    input=text[:8000]
-                )
-                embeddings.append(response.data[0].embedding)
-                post_ids.append(post['post_id'])
-            except Exception as e:
-                print(f"  Warning: Failed to generate embedding: {e}")
-                continue
-
-        # Compute cosine similarity
-        import numpy as np
-
-        similarities = {}
-
-        for i, post_id in enumerate(post_ids):
-            # Compute similarity with all other posts
-            emb_i = np.array(embeddings[i])
-            sims = []
-
-            for j, other_id in enumerate(post_ids):
-                if i == j:
-                    continue
-
-                emb_j = np.array(embeddings[j])
-                # Cosine similarity
-                sim = np.dot(emb_i, emb_j) / (np.linalg.norm(emb_i) * np.linalg.norm(emb_j))
-                sims.append((other_id, sim))
+        embeddings, present = backend.embed_posts(self.posts)
+        if not present:
+            return {}
 
-            # Sort by similarity and take top 5
-            sims.sort(key=lambda x: x[1], reverse=True)
-            similarities[post_id] = [s[0] for s in sims[:5]]
+        post_ids = [self.posts[i]['post_id'] for i in present]
+        if len(post_ids) >= ANN_MIN_POSTS:
+            # Exhaustive comparison is quadratic; search an IVF index instead
+            index_path = None
+            if backend.persistent:
+                slug = re.sub(r'[^A-Za-z0-9._-]+', '_', backend.name)
+                index_path = EMBEDDINGS_DIR / f'ann_{slug}.npz'
+            neighbors = approximate_top_k_similar(embeddings, SIMILAR_POSTS_COUNT, index_path)
+        else:
+            neighbors = top_k_similar(embeddings, SIMILAR_POSTS_COUNT)
+
+        similarities = {
+            post_id: [post_ids[j] for j in neighbors[i] if j >= 0]
+            for i, post_id in enumerate(post_ids)
+        }
 
         print(f"  Success: Computed similarities for {len(similarities)} posts")
 
@@ -0,0 +1,223 @@
+"""
+Shared HTTP transport for Ed API requests and file downloads.
+
+Sessions get a connection pool sized for the worker threads that share
+them and automatic retries with jittered exponential backoff on
+connection errors, 429 and 5xx responses. HttpCache adds conditional
+requests: responses that carry an ETag or Last-Modified header are stored
+locally and revalidated with If-None-Match / If-Modified-Since, so an
+unchanged resource comes back as a bodyless 304.
+"""
+
+import json
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import config
+from utils import (
+    atomic_write, cache_file, find_json, get_content_hash, load_json, loads_json,
+    open_binary, remove_json, save_json,
+)
+
+# Responses retried automatically (429 honours Retry-After)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def build_retry(retries: int, backoff: float) -> Retry:
+    """
+    Retry policy for idempotent requests.
+
+    Args:
+        retries: Attempts after the first one
+        backoff: Base delay in seconds, doubled on each retry
+
+    Returns:
+        urllib3 Retry. The last failing response is returned rather than
+        raised, so callers keep their own status handling.
+    """
+    options = dict(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({'GET', 'HEAD'}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    try:
+        # Jitter keeps concurrent workers from retrying in lockstep (urllib3 2.x)
+        return Retry(backoff_jitter=backoff, **options)
+    except TypeError:
+        return Retry(**options)
+
+
+def configure_session(
+    session: requests.Session,
+    pool_size: int,
+    retries: Optional[int] = None,
+    backoff: Optional[float] = None
+) -> requests.Session:
+    """
+    Mount a pooled, retrying adapter on a session.
+
+    Args:
+        session: Session to configure (e.g. the authenticated edapi session)
+        pool_size: Connections kept alive per host; match the worker count
+        retries: Retry attempts. Defaults to HTTP_RETRIES.
+        backoff: Base backoff in seconds. Defaults to HTTP_BACKOFF.
+
+    Returns:
+        The same session
+    """
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=build_retry(
+            config.HTTP_RETRIES if retries is None else retries,
+            config.HTTP_BACKOFF if backoff is None else backoff
+        )
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+_shared_session: Optional[requests.Session] = None
+_shared_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Process-wide session for unauthenticated requests such as file downloads."""
+    global _shared_session
+    with _shared_lock:
+        if _shared_session is None:
+            _shared_session = configure_session(requests.Session(), pool_size=config.ED_FETCH_WORKERS)
+        return _shared_session
+
+
+class CachedResponse:
+    """A stored response body served after a 304 revalidation."""
+
+    status_code = 200
+    ok = True
+    from_cache = True
+
+    def __init__(self, content: bytes, headers: Dict[str, str]):
+        self.content = content
+        self.headers = headers
+
+    def json(self) -> Any:
+        return loads_json(self.content)
+
+
+class HttpCache:
+    """
+    On-disk store of HTTP validators (and optionally bodies), keyed by URL.
+
+    Each entry is a small JSON file with the URL's ETag and Last-Modified
+    values; cached bodies sit next to it in a .body file, compressed like
+    the other caches (see CACHE_COMPRESSION).
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.stats = {'fetched': 0, 'not_modified': 0, 'bytes_saved': 0}
+        self._lock = threading.Lock()
+
+    def _paths(self, url: str):
+        key = get_content_hash(url)
+        return self.directory / f'{key}.json', self.directory / f'{key}.body'
+
+    def validators(self, url: str) -> Dict[str, str]:
+        """Conditional request headers for a URL, empty if nothing is stored."""
+        meta_path, _ = self._paths(url)
+        try:
+            entry = load_json(meta_path)
+        except json.JSONDecodeError:
+            entry = None
+        if not entry or entry.get('url') != url:
+            return {}
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, url: str, response: requests.Response, body: Optional[bytes] = None) -> None:
+        """
+        Remember a 200 response's validators (and body, if given).
+
+        Responses without an ETag or Last-Modified header are not stored,
+        since they cannot be revalidated.
+        """
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        meta_path, body_path = self._paths(url)
+        if not etag and not last_modified:
+            meta_path.unlink(missing_ok=True)
+            remove_json(body_path)
+            return
+        if body is not None:
+            target = cache_file(body_path)
+            with atomic_write(target, 'wb') as f:
+                f.write(body)
+            remove_json(body_path, keep=target)
+        save_json(meta_path, {
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'content_type': response.headers.get('Content-Type'),
+            'size': len(body) if body is not None else None,
+        }, indent=None)
+
+    def record(self, not_modified: bool, size: int = 0) -> None:
+        with self._lock:
+            if not_modified:
+                self.stats['not_modified'] += 1
+                self.stats['bytes_saved'] += size
+            else:
+                self.stats['fetched'] += 1
+
+    def get(self, session: requests.Session, url: str, **kwargs) -> Any:
+        """
+        GET a URL, revalidating a stored copy instead of re-downloading it.
+
+        Args:
+            session: Session to send the request with
+            url: URL to fetch (query parameters belong in the URL)
+            **kwargs: Passed to session.get (e.g. timeout)
+
+        Returns:
+            The live response, or a CachedResponse with the stored body when
+            the server answered 304 Not Modified
+        """
+        meta_path, body_path = self._paths(url)
+        stored_body = find_json(body_path)
+        headers = {**kwargs.pop('headers', {})}
+        if stored_body is not None:
+            headers.update(self.validators(url))
+
+        response = session.get(url, headers=headers, **kwargs)
+
+        if response.status_code == 304 and stored_body is not None:
+            with open_binary(stored_body) as f:
+                body = f.read()
+            self.record(True, len(body))
+            entry = load_json(meta_path) or {}
+            return CachedResponse(body, {'Content-Type': entry.get('content_type') or ''})
+
+        if response.ok:
+            self.record(False)
+            self.store(url, response, response.content)
+        return response
+
+    def summary(self) -> str:
+        """One-line description of cache effectiveness."""
+        total = self.stats['fetched'] + self.stats['not_modified']
+        return (f"{self.stats['not_modified']} of {total} requests not modified "
+                f"({self.stats['bytes_saved'] / 1024:.0f} KB not re-downloaded)")
@@ -0,0 +1,243 @@
+"""
+Incrementally maintained insights.
+
+InsightsState keeps mergeable aggregates (per-group counts, sums and
+Counters) together with each post's contribution to them. Applying a new
+corpus only subtracts the contributions of changed or removed posts and adds
+those of new or changed posts, instead of regrouping every post.
+
+This is the only implementation of the insight statistics: a full
+recompute (InsightsGenerator.generate_all_insights) is a fresh state synced
+with every post. Posts are read through generate_insights.post_contribution.
+"""
+
+import json
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List
+
+from generate_insights import (
+    round_rate, top_k, split_task_strengths, build_nuggets, post_contribution,
+)
+from utils import get_content_hash, save_cache_json, load_json
+
+# Bump when the contribution or aggregate layout changes
+INSIGHTS_STATE_VERSION = 1
+
+
+def contribution_hash(contribution: Dict[str, Any]) -> str:
+    """Fingerprint a contribution so unchanged posts can be skipped."""
+    return get_content_hash(json.dumps(contribution, sort_keys=True))
+
+
+def _new_llm_group() -> Dict[str, Any]:
+    return {
+        'count': 0,
+        'highlight': [0.0, 0],
+        'correctness': [0.0, 0],
+        'success': [0.0, 0],
+        'tasks': {},
+        'strengths': Counter(),
+        'weaknesses': Counter(),
+        'failures': Counter(),
+    }
+
+
+def _add_to_mean(totals: Dict[str, List[float]], key: str, value: float, sign: int) -> None:
+    """Add (sign=1) or remove (sign=-1) a value from a [sum, count] entry."""
+    total = totals.setdefault(key, [0.0, 0])
+    total[0] += sign * value
+    total[1] += sign
+    if total[1] == 0:
+        del totals[key]
+
+
+def _mean(total: List[float]) -> float:
+    return total[0] / total[1] if total[1] else float('nan')
+
+
+class InsightsState:
+    """Mergeable insight aggregates plus the per-post contributions behind them."""
+
+    def __init__(self):
+        self.contributions: Dict[str, Dict[str, Any]] = {}
+        self.hashes: Dict[str, str] = {}
+        self.llms: Dict[str, Dict[str, Any]] = {}
+        self.tasks: Dict[str, List[float]] = {}
+
+    def __len__(self) -> int:
+        return len(self.contributions)
+
+    def _apply(self, contribution: Dict[str, Any], sign: int) -> None:
+        """Add (sign=1) or subtract (sign=-1) one post's contribution."""
+        llm = contribution['llm']
+        group = self.llms.get(llm)
+        if group is None:
+            group = self.llms[llm] = _new_llm_group()
+
+        group['count'] += sign
+        for metric in ('highlight', 'correctness', 'success'):
+            if contribution[metric] is not None:
+                group[metric][0] += sign * contribution[metric]
+                group[metric][1] += sign
+
+        if contribution['success'] is not None:
+            for task in contribution['tasks']:
+                _add_to_mean(group['tasks'], task, contribution['success'], sign)
+                _add_to_mean(self.tasks, task, contribution['success'], sign)
+
+        for field in ('strengths', 'weaknesses', 'failures'):
+            counter = group[field]
+            if sign > 0:
+                counter.update(contribution[field])
+            else:
+                counter.subtract(contribution[field])
+                for item in contribution[field]:
+                    if counter[item] <= 0:
+                        del counter[item]
+
+        if group['count'] == 0:
+            del self.llms[llm]
+
+    def add_post(self, post: Dict[str, Any]) -> bool:
+        """
+        Add a post, replacing its previous contribution if it was already counted.
+
+        Args:
+            post: Analyzed post
+
+        Returns:
+            False if the post's contribution was unchanged (nothing to apply)
+        """
+        contribution = post_contribution(post)
+        digest = contribution_hash(contribution)
+        if self.hashes.get(post['post_id']) == digest:
+            return False
+
+        self.remove_post(post['post_id'])
+        self.contributions[post['post_id']] = contribution
+        self.hashes[post['post_id']] = digest
+        self._apply(contribution, 1)
+        return True
+
+    def remove_post(self, post_id: str) -> None:
+        """Subtract a post's contribution, if it was counted."""
+        contribution = self.contributions.pop(post_id, None)
+        if contribution is not None:
+            del self.hashes[post_id]
+            self._apply(contribution, -1)
+
+    def sync(self, posts: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Bring the state in line with a corpus by applying only the deltas.
+
+        Args:
+            posts: The full current list of analyzed posts
+
+        Returns:
+            Counts of added, updated, removed and unchanged posts
+        """
+        delta = {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 0}
+        current = set()
+
+        for post in posts:
+            current.add(post['post_id'])
+            existed = post['post_id'] in self.contributions
+            if not self.add_post(post):
+                delta['unchanged'] += 1
+            else:
+                delta['updated' if existed else 'added'] += 1
+
+        for post_id in [post_id for post_id in self.contributions if post_id not in current]:
+            self.remove_post(post_id)
+            delta['removed'] += 1
+
+        return delta
+
+    def to_insights(self) -> Dict[str, Any]:
+        """
+        Render the aggregates in the insights.json layout.
+
+        Returns:
+            Same structure as InsightsGenerator.generate_all_insights()
+        """
+        profiles = []
+        comparison = {}
+
+        for llm_name in sorted(self.llms):
+            group = self.llms[llm_name]
+            avg_success = _mean(group['success'])
+            task_rates = {task: _mean(total) for task, total in group['tasks'].items()}
+            task_strengths, task_weaknesses = split_task_strengths(task_rates)
+
+            profiles.append({
+                'llm_name': llm_name,
+                'submission_count': group['count'],
+                'average_success_rate': round_rate(avg_success),
+                'task_strengths': task_strengths,
+                'task_weaknesses': task_weaknesses,
+                'common_failure_modes': top_k(group['failures'] + group['weaknesses'], 5),
+                'unique_capabilities': top_k(group['strengths'], 5)
+            })
+
+            correctness = group['correctness']
+            comparison[llm_name] = {
+                'post_count': group['count'],
+                'avg_highlight_score': round(_mean(group['highlight']), 2),
+                'avg_code_correctness': round(_mean(correctness), 2) if correctness[1] else 5.0,
+                'avg_success_rate': round_rate(avg_success)
+            }
+
+        # Sort by submission count (stable, so ties stay in name order)
+        profiles.sort(key=lambda p: p['submission_count'], reverse=True)
+
+        sources = [c['nugget'] for c in self.contributions.values() if c['nugget']]
+        llm_weaknesses = {name: group['weaknesses'] for name, group in self.llms.items()}
+
+        return {
+            'llm_profiles': profiles,
+            'task_difficulty': {
+                task: round(100 - _mean(self.tasks[task]), 1) for task in sorted(self.tasks)
+            },
+            'nuggets': build_nuggets(sources, llm_weaknesses),
+            'comparative_analysis': {
+                'by_llm': comparison,
+                'total_llms': len(comparison),
+                'total_posts': len(self.contributions)
+            },
+            'llm_task_matrix': {
+                llm_name: {
+                    task: round(_mean(self.llms[llm_name]['tasks'][task]), 1)
+                    for task in sorted(self.llms[llm_name]['tasks'])
+                }
+                for llm_name in sorted(self.llms)
+                if self.llms[llm_name]['tasks']
+            },
+        }
+
+    def save(self, path: Path) -> None:
+        """Persist the aggregates and per-post contributions."""
+        save_cache_json(path, {
+            'version': INSIGHTS_STATE_VERSION,
+            'llms': self.llms,
+            'tasks': self.tasks,
+            'contributions': self.contributions,
+            'hashes': self.hashes,
+        })
+
+    @classmethod
+    def load(cls, path: Path) -> 'InsightsState':
+        """Load persisted state, or an empty state if missing or outdated."""
+        state = cls()
+        data = load_json(path)
+        if not data or data.get('version') != INSIGHTS_STATE_VERSION:
+            return state
+
+        state.contributions = data['contributions']
+        state.hashes = data['hashes']
+        state.tasks = data['tasks']
+        state.llms = data['llms']
+        for group in state.llms.values():
+            for field in ('strengths', 'weaknesses', 'failures'):
+                group[field] = Counter(group[field])
+        return state
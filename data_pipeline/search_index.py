@@ -0,0 +1,113 @@
+"""
+Build the serialized search index loaded by the directory page.
+
+The index is an inverted index over the same fields and weights the site
+used to hand to Fuse.js, so the browser can rank posts without tokenizing
+every post on page load. The tokenizer here must stay in sync with
+src/lib/searchIndex.ts.
+"""
+
+import re
+import unicodedata
+from collections import defaultdict
+from typing import List, Dict, Any
+
+# Bump when the index layout or tokenizer changes
+SEARCH_INDEX_VERSION = 1
+
+# Searchable fields and their weights, matching the former Fuse.js keys
+SEARCH_FIELDS = [
+    ('title', 2.5),
+    ('summary', 2.0),
+    ('author.name', 1.5),
+    ('llm_info.primary_llm', 1.5),
+    ('tags', 1.0),
+    ('task_types', 0.8),
+    ('insights.strengths', 0.6),
+    ('insights.weaknesses', 0.6),
+    ('content_markdown', 0.3),
+]
+
+# Matches Fuse's minMatchCharLength
+MIN_TOKEN_LENGTH = 2
+
+# Very common words that would only bloat the content_markdown postings
+STOPWORDS = frozenset("""
+    a an and are as at be but by for from has have in is it its of on or that
+    the this to was were will with
+""".split())
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into normalized search tokens.
+
+    Args:
+        text: Raw field text
+
+    Returns:
+        Lowercased, accent-stripped tokens in order of appearance
+    """
+    normalized = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    return [
+        token for token in TOKEN_PATTERN.findall(normalized.lower())
+        if len(token) >= MIN_TOKEN_LENGTH and token not in STOPWORDS
+    ]
+
+
+def get_field_text(post: Dict[str, Any], path: str) -> str:
+    """
+    Resolve a dotted field path on a post to searchable text.
+
+    Args:
+        post: Post dictionary
+        path: Dotted path such as 'author.name'
+
+    Returns:
+        Field text, with list values joined by spaces
+    """
+    value: Any = post
+    for part in path.split('.'):
+        if not isinstance(value, dict):
+            return ''
+        value = value.get(part)
+
+    if value is None:
+        return ''
+    if isinstance(value, list):
+        return ' '.join(str(item) for item in value if item)
+    return str(value)
+
+
+def build_search_index(posts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Build an inverted index over the searchable post fields.
+
+    Postings are stored per term as a flat list of
+    [doc, field, term_frequency, doc, field, term_frequency, ...] where doc
+    indexes into 'docs' and field indexes into 'fields'.
+
+    Args:
+        posts: Analyzed posts
+
+    Returns:
+        JSON-serializable search index
+    """
+    postings: Dict[str, List[int]] = defaultdict(list)
+
+    for doc, post in enumerate(posts):
+        for field, (path, _) in enumerate(SEARCH_FIELDS):
+            counts: Dict[str, int] = {}
+            for token in tokenize(get_field_text(post, path)):
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                postings[token].extend((doc, field, count))
+
+    return {
+        'version': SEARCH_INDEX_VERSION,
+        'fields': [{'name': path, 'weight': weight} for path, weight in SEARCH_FIELDS],
+        'docs': [post['post_id'] for post in posts],
+        'terms': dict(sorted(postings.items())),
+    }
@@ -0,0 +1,591 @@
+#!/usr/bin/env python3
+"""
+Test the Ed client fetch layer without real Ed API access.
+
+Uses a fake HTTP session in place of the edapi session so that
+concurrency, ordering and failure reporting can be checked offline.
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+import config
+from ed_client import EdClient
+import fetch_posts
+from fetch_posts import sync_participation_posts, thread_watermark
+from utils import RateLimiter
+
+
+class FakeResponse:
+    """Minimal stand-in for requests.Response."""
+
+    def __init__(self, status_code, payload=None):
+        self.status_code = status_code
+        self.ok = 200 <= status_code < 300
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+class FakeSession:
+    """Serves thread details by number, failing for selected numbers."""
+
+    def __init__(self, failing=(), delay=0.0):
+        self.failing = set(failing)
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        with self._lock:
+            self.calls += 1
+        number = int(url.rstrip('/').rsplit('/', 1)[-1])
+        time.sleep(self.delay)
+        if number in self.failing:
+            return FakeResponse(500)
+        return FakeResponse(200, {'thread': {'id': 999 + number, 'number': number}, 'users': []})
+
+
+class FakeAPI:
+    def __init__(self, session, threads=()):
+        self.session = session
+        self.threads = list(threads)
+        self.list_calls = 0
+
+    def list_threads(self, course_id, limit=30, offset=0, sort='new'):
+        self.list_calls += 1
+        return self.threads[offset:offset + limit]
+
+
+def make_client(session, max_workers=4, rate=1000.0, burst=1000, threads=()):
+    """Build an EdClient without logging in to Ed."""
+    client = EdClient.__new__(EdClient)
+    client.api = FakeAPI(session, threads)
+    client.course_id = 1
+    client.max_workers = max_workers
+    client.rate_limiter = RateLimiter(rate, burst=burst)
+    client.pages_fetched = 0
+    return client
+
+
+def test_rate_limiter_paces_requests():
+    """A bucket with burst 1 should space out acquisitions at 1/rate."""
+    limiter = RateLimiter(rate=50, burst=1)
+    start = time.monotonic()
+    for _ in range(6):
+        limiter.acquire()
+    elapsed = time.monotonic() - start
+
+    # First token is free, the remaining five each wait ~20ms
+    assert elapsed >= 0.09, f"Limiter too fast: {elapsed:.3f}s"
+    print(f"✓ 6 acquisitions at 50/s took {elapsed:.3f}s")
+
+
+def test_concurrent_details_keep_order():
+    """Results come back in input order even when fetched concurrently."""
+    session = FakeSession(delay=0.01)
+    client = make_client(session, max_workers=8)
+
+    numbers = list(range(1, 41))
+    details, failures = client.fetch_threads_details(numbers)
+
+    assert failures == []
+    assert [d['thread']['number'] for d in details] == numbers
+    assert session.calls == len(numbers)
+    print(f"✓ Fetched {len(details)} threads in stable order")
+
+
+def test_concurrent_details_report_failures():
+    """Failed threads are reported with their number instead of dropped silently."""
+    session = FakeSession(failing={3, 7})
+    client = make_client(session)
+
+    details, failures = client.fetch_threads_details([1, 3, 5, 7, 9])
+
+    assert [d['thread']['number'] for d in details] == [1, 5, 9]
+    assert [f['thread_number'] for f in failures] == [3, 7]
+    assert all('500' in f['error'] for f in failures)
+    print(f"✓ Reported {len(failures)} failed threads")
+
+
+def make_listing(count):
+    """Threads ordered by activity, newest first, one per day in November."""
+    return [
+        {
+            'id': 1000 + i,  # matches FakeSession ids for number i + 1
+            'number': i + 1,
+            'title': f'Special Participation B: post {i}' if i % 2 == 0 else f'Question {i}',
+            'updated_at': f'2025-11-{28 - i:02d}T12:00:00+00:00' if i < 28 else '2025-10-01T00:00:00+00:00',
+            'reply_count': 0,
+        }
+        for i in range(count)
+    ]
+
+
+def test_updated_since_stops_at_stale_page():
+    """Listing stops after the first page with no thread newer than the cutoff."""
+    listing = make_listing(120)
+    client = make_client(FakeSession(), threads=listing)
+
+    updated = client.fetch_threads_updated_since('2025-11-20T00:00:00+00:00')
+
+    assert [t['number'] for t in updated] == list(range(1, 10))
+    assert client.api.list_calls == 2
+    print(f"✓ Found {len(updated)} updated threads in {client.api.list_calls} of 4 listing pages")
+
+
+def test_incremental_sync_refetches_changed_threads():
+    """Only threads whose watermark changed are re-fetched and merged."""
+    listing = make_listing(10)
+    session = FakeSession()
+    client = make_client(session, threads=listing)
+
+    participation = [t for t in listing if 'Participation B' in t['title']]
+    cached = [{'thread': {'id': t['id'], 'number': t['number']}, 'stale': True} for t in participation]
+    state = {
+        'last_synced_at': '2025-11-20T00:00:00+00:00',
+        'threads': {str(t['id']): thread_watermark(t) for t in participation},
+    }
+
+    # One reply on an existing thread and one brand-new thread
+    listing[2]['reply_count'] = 1
+    client.api.threads.insert(0, {
+        'id': 1049, 'number': 50, 'title': 'Participation B: new',
+        'updated_at': '2025-11-29T00:00:00+00:00', 'reply_count': 0,
+    })
+
+    enable_cache = config.ENABLE_CACHE
+    config.ENABLE_CACHE = False
+    try:
+        merged = sync_participation_posts(client, cached, state)
+    finally:
+        config.ENABLE_CACHE = enable_cache
+
+    assert session.calls == 2
+    assert merged[0]['thread']['number'] == 50
+    refreshed = [p for p in merged if 'stale' not in p]
+    assert sorted(p['thread']['number'] for p in refreshed) == [3, 50]
+    assert len(merged) == len(cached) + 1
+    print(f"✓ Incremental sync re-fetched {session.calls} of {len(merged)} threads")
+
+
+class FakeListingSession:
+    """Serves Ed's search and category listings over a fixed course listing."""
+
+    def __init__(self, threads, search=True, category_filter=True, fail_after=None, failure=None):
+        self.threads = threads
+        self.search = search
+        self.category_filter = category_filter
+        self.fail_after = fail_after  # Pages served before `failure` takes over
+        self.failure = failure  # Status code to return or exception to raise
+        self.calls = 0
+
+    def get(self, url, params=None, **kwargs):
+        self.calls += 1
+        params = params or {}
+        if self.fail_after is not None and self.calls > self.fail_after:
+            if isinstance(self.failure, Exception):
+                raise self.failure
+            return FakeResponse(self.failure)
+        if url.endswith('/threads/search'):
+            if not self.search:
+                return FakeResponse(404)
+            words = params['query'].lower().split()
+            matches = [t for t in self.threads if all(w in t['title'].lower() for w in words)]
+        else:
+            matches = self.threads
+            if self.category_filter and 'category' in params:
+                matches = [t for t in matches if t.get('category') == params['category']]
+        page = matches[params['offset']:params['offset'] + params['limit']]
+        return FakeResponse(200, {'threads': page})
+
+
+def make_course(count, every=10):
+    """A course listing, newest first, where every `every`th thread is participation B."""
+    return [
+        {
+            'id': 5000 + i,
+            'number': i + 1,
+            'title': f'Special Participation B: post {i}' if i % every == 0 else f'Question {i} about participation',
+            'category': 'Special Participation B' if i % every == 0 else 'General',
+            'created_at': f'2025-{12 - i // 300:02d}-01T00:00:00+00:00',
+            'updated_at': '2025-12-01T00:00:00+00:00',
+            'reply_count': 0,
+        }
+        for i in range(count)
+    ]
+
+
+def test_discovery_pushes_filter_to_server():
+    """Search and category discovery fetch pages in proportion to matches, not course size."""
+    course = make_course(900)
+    expected = [t['number'] for t in course if 'Participation B' in t['title']]
+    original = config.ED_DISCOVERY, config.PARTICIPATION_B_CATEGORY
+    try:
+        config.ED_DISCOVERY, config.PARTICIPATION_B_CATEGORY = 'auto', ''
+        client = make_client(FakeListingSession(course), threads=course)
+        threads, method = client.discover_participation_threads()
+        assert method == 'search'
+        assert sorted(t['number'] for t in threads) == expected
+        assert client.api.list_calls == 0
+        search_pages = client.pages_fetched
+
+        config.PARTICIPATION_B_CATEGORY = 'Special Participation B'
+        client = make_client(FakeListingSession(course), threads=course)
+        threads, method = client.discover_participation_threads()
+        assert method == 'category'
+        assert sorted(t['number'] for t in threads) == expected
+        assert client.pages_fetched == 1
+
+        config.ED_DISCOVERY = 'crawl'
+        client = make_client(FakeListingSession(course), threads=course)
+        threads, method = client.discover_participation_threads()
+        assert sorted(t['number'] for t in threads) == expected
+        print(f"✓ Found {len(expected)} threads in {search_pages} search / 1 category pages "
+              f"vs {client.pages_fetched} crawl pages")
+    finally:
+        config.ED_DISCOVERY, config.PARTICIPATION_B_CATEGORY = original
+
+
+def test_discovery_falls_back_to_crawl():
+    """Unsupported or ignored server-side filters fall back to the full crawl."""
+    course = make_course(90)
+    expected = [t['number'] for t in course if 'Participation B' in t['title']]
+    original = config.ED_DISCOVERY, config.PARTICIPATION_B_CATEGORY
+    try:
+        config.ED_DISCOVERY, config.PARTICIPATION_B_CATEGORY = 'auto', ''
+        client = make_client(FakeListingSession(course, search=False), threads=course)
+        threads, method = client.discover_participation_threads()
+        assert method == 'crawl' and sorted(t['number'] for t in threads) == expected
+
+        config.PARTICIPATION_B_CATEGORY = 'Special Participation B'
+        client = make_client(FakeListingSession(course, category_filter=False), threads=course)
+        threads, method = client.discover_participation_threads()
+        assert method == 'crawl' and sorted(t['number'] for t in threads) == expected
+        print("✓ Missing search endpoint and ignored category filter both fall back to crawling")
+    finally:
+        config.ED_DISCOVERY, config.PARTICIPATION_B_CATEGORY = original
+
+
+def test_discovery_falls_back_on_listing_errors():
+    """Server errors and connection failures partway through a filtered listing fall back to crawling."""
+    course = make_course(900)
+    expected = [t['number'] for t in course if 'Participation B' in t['title']]
+    original = config.ED_DISCOVERY, config.PARTICIPATION_B_CATEGORY
+    try:
+        config.ED_DISCOVERY, config.PARTICIPATION_B_CATEGORY = 'auto', ''
+        for failure in (500, requests.ConnectionError('connection reset')):
+            session = FakeListingSession(course, fail_after=1, failure=failure)
+            client = make_client(session, threads=course)
+            threads, method = client.discover_participation_threads()
+            assert method == 'crawl', (failure, method)
+            numbers = [t['number'] for t in threads]
+            assert sorted(numbers) == expected and len(set(numbers)) == len(numbers)
+        print("✓ HTTP 500 and connection errors fall back to crawling, without duplicates")
+    finally:
+        config.ED_DISCOVERY, config.PARTICIPATION_B_CATEGORY = original
+
+
+def test_crawl_stops_at_creation_cutoff():
+    """A newest-first crawl stops once a page is older than the assignment."""
+    course = make_course(900)
+    client = make_client(FakeSession(), threads=course)
+
+    threads = client.fetch_all_threads(created_since='2025-11-01T00:00:00+00:00')
+
+    assert len(threads) == 600
+    assert client.api.list_calls == 21
+    print(f"✓ Crawl stopped after {client.api.list_calls} of 30 pages")
+
+
+class SlowListingAPI(FakeAPI):
+    """FakeAPI whose listing pages take a while and record when they were requested."""
+
+    def __init__(self, session, threads, delay):
+        super().__init__(session, threads)
+        self.delay = delay
+        self.page_times = []
+
+    def list_threads(self, course_id, limit=30, offset=0, sort='new'):
+        self.page_times.append(time.monotonic())
+        time.sleep(self.delay)
+        return super().list_threads(course_id, limit=limit, offset=offset, sort=sort)
+
+
+class TimedSession(FakeSession):
+    """FakeSession that records when each detail request starts."""
+
+    def __init__(self, delay):
+        super().__init__(delay=delay)
+        self.start_times = []
+
+    def get(self, url, **kwargs):
+        with self._lock:
+            self.start_times.append(time.monotonic())
+        return super().get(url, **kwargs)
+
+
+def test_listing_and_details_are_pipelined():
+    """Detail requests start while later listing pages are still being fetched."""
+    listing = make_listing(120)
+    session = TimedSession(delay=0.01)
+    client = make_client(session, threads=listing)
+    client.api = SlowListingAPI(session, listing, delay=0.05)
+
+    original = fetch_posts.EdClient, config.ENABLE_CACHE, config.ED_DISCOVERY
+    fetch_posts.EdClient = lambda max_workers=None: client
+    config.ENABLE_CACHE, config.ED_DISCOVERY = False, 'crawl'
+    try:
+        details = fetch_posts.fetch_all_participation_posts(use_cache=False)
+    finally:
+        fetch_posts.EdClient, config.ENABLE_CACHE, config.ED_DISCOVERY = original
+
+    expected = [t['number'] for t in listing if 'Participation B' in t['title']]
+    assert [d['thread']['number'] for d in details] == expected
+    assert len(client.api.page_times) == 5  # Four full pages, then an empty one
+    assert min(session.start_times) < client.api.page_times[-1], "Details waited for the whole listing"
+    overlapped = sum(start < client.api.page_times[-1] for start in session.start_times)
+    print(f"✓ {overlapped} of {len(details)} detail requests started before the last listing page")
+
+
+class ConditionalHandler(BaseHTTPRequestHandler):
+    """Serves a JSON thread with an ETag; /flaky fails with 503 before succeeding."""
+
+    body = b'{"thread": {"id": 1, "number": 1, "title": "Participation B"}, "users": []}'
+    etag = '"v1"'
+    requests_seen = []
+    flaky_failures = 0
+
+    def do_GET(self):
+        ConditionalHandler.requests_seen.append((self.path, self.headers.get('If-None-Match')))
+        if self.path == '/flaky' and ConditionalHandler.flaky_failures > 0:
+            ConditionalHandler.flaky_failures -= 1
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if self.headers.get('If-None-Match') == self.etag:
+            self.send_response(304)
+            self.send_header('ETag', self.etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('ETag', self.etag)
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_conditional_requests_and_retries():
+    """Unchanged resources are revalidated with 304s; 503s are retried."""
+    import shutil
+    from http_transport import HttpCache, configure_session
+    from utils import download_file
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ConditionalHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    cache_dir = config.CACHE_DIR / 'test_http'
+    ConditionalHandler.requests_seen = []
+    try:
+        session = configure_session(requests.Session(), pool_size=2, retries=2, backoff=0.01)
+        cache = HttpCache(cache_dir)
+
+        first = cache.get(session, f"{base}/thread", timeout=5)
+        second = cache.get(session, f"{base}/thread", timeout=5)
+        assert first.json() == second.json()
+        assert getattr(second, 'from_cache', False)
+        assert ConditionalHandler.requests_seen[-1] == ('/thread', '"v1"')
+        assert cache.stats['not_modified'] == 1 and cache.stats['fetched'] == 1
+        print(f"✓ Second fetch revalidated: {cache.summary()}")
+
+        ConditionalHandler.etag = '"v2"'
+        third = cache.get(session, f"{base}/thread", timeout=5)
+        assert third.status_code == 200 and not getattr(third, 'from_cache', False)
+        print("✓ Changed resource re-downloaded")
+
+        ConditionalHandler.flaky_failures = 2
+        response = session.get(f"{base}/flaky", timeout=5)
+        assert response.status_code == 200
+        assert [p for p, _ in ConditionalHandler.requests_seen].count('/flaky') == 3
+        print("✓ 503 responses retried with backoff")
+
+        target = cache_dir / 'files' / 'thread.json'
+        assert download_file(f"{base}/file", target, http_cache=cache)
+        assert download_file(f"{base}/file", target, http_cache=cache)
+        assert ConditionalHandler.requests_seen[-1] == ('/file', '"v2"')
+        assert target.read_bytes() == ConditionalHandler.body
+        print("✓ Existing download revalidated instead of re-fetched")
+    finally:
+        server.shutdown()
+        server.server_close()
+        ConditionalHandler.etag = '"v1"'
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Serves attachment bytes by path and honours 'Range: bytes=N-'."""
+
+    files = {}
+    requests_seen = []
+    wrong_range = False
+
+    def do_GET(self):
+        RangeHandler.requests_seen.append((self.path, self.headers.get('Range')))
+        body = self.files[self.path]
+        start = 0
+        if self.headers.get('Range'):
+            start = 0 if self.wrong_range else int(self.headers['Range'].split('=')[1].rstrip('-'))
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{len(body) - 1}/{len(body)}')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(body) - start))
+        self.end_headers()
+        self.wfile.write(body[start:])
+
+    def log_message(self, *args):
+        pass
+
+
+def make_attachment_files():
+    """A PDF and a PNG, real documents when PyMuPDF and Pillow are installed."""
+    import io
+    import attachments
+
+    slides = bytes(range(256)) * 400
+    if attachments.pymupdf is not None:
+        document = attachments.pymupdf.open()
+        for number in range(3):
+            document.new_page(width=612, height=792).insert_text((72, 72), f"Slide {number + 1}")
+        slides = document.tobytes()
+        document.close()
+
+    plot = b'\x89PNG' + b'0' * 5000
+    if attachments.Image is not None:
+        buffer = io.BytesIO()
+        attachments.Image.new('RGB', (1200, 800), (30, 90, 160)).save(buffer, format='PNG')
+        plot = buffer.getvalue()
+    return slides, plot
+
+
+def test_attachment_mirror_resumes_and_dedupes():
+    """Attachments download concurrently, resume partial files, dedupe and skip on rerun."""
+    import shutil
+    import attachments
+    from attachments import AttachmentMirror, mirror_attachments
+    from utils import download_file
+
+    slides, plot = make_attachment_files()
+    RangeHandler.files = {'/slides.pdf': slides, '/copy.pdf': slides, '/plot.png': plot}
+    RangeHandler.requests_seen = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), RangeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    root = config.CACHE_DIR / 'test_attachments'
+    directory = root / 'attachments'
+    manifest = root / 'manifest.json'
+
+    def make_posts():
+        return [
+            {'attachments': [
+                {'type': 'pdf', 'filename': 'slides.pdf', 'local_path': '', 'ed_url': f"{base}/slides.pdf"},
+                {'type': 'image', 'filename': '../plot.png', 'local_path': '', 'ed_url': f"{base}/plot.png"},
+            ]},
+            {'attachments': [
+                {'type': 'pdf', 'filename': 'slides (1).pdf', 'local_path': '', 'ed_url': f"{base}/copy.pdf"},
+            ]},
+        ]
+
+    try:
+        # An earlier run was interrupted halfway through slides.pdf
+        half = len(slides) // 2
+        partial = AttachmentMirror(directory, manifest).download_path(f"{base}/slides.pdf", 'slides.pdf')
+        partial.parent.mkdir(parents=True)
+        partial.with_name(partial.name + '.part').write_bytes(slides[:half])
+
+        posts = make_posts()
+        stats = mirror_attachments(posts, directory=directory, workers=3, manifest_path=manifest)
+        assert (stats['downloaded'], stats['deduplicated'], stats['failed']) == (2, 1, 0), stats
+        assert ('/slides.pdf', f'bytes={half}-') in RangeHandler.requests_seen
+        print("✓ Partial download resumed with a Range request")
+
+        pdf, png, copy = [att for post in posts for att in post['attachments']]
+        assert pdf['local_path'] == copy['local_path'], "Identical files should share one copy"
+        assert pdf['local_path'] == f"attachments/{pdf['sha256'][:2]}/{pdf['sha256']}.pdf"
+        assert (root / pdf['local_path']).read_bytes() == slides
+        assert pdf['size'] == len(slides) and png['size'] == len(plot)
+        assert png['local_path'].endswith('.png')
+        stored = [p for p in directory.rglob('*') if p.is_file() and '.preview.' not in p.name]
+        assert len(stored) == 2
+        assert not list(root.rglob('*.part'))
+        print(f"✓ 3 attachments stored by SHA-256 as {len(stored)} files")
+
+        if attachments.Image is not None:
+            assert (png['width'], png['height']) == (1200, 800)
+            assert (png['preview_width'], png['preview_height']) == (320, 213)
+            assert (root / png['preview_path']).stat().st_size < len(plot)
+            print(f"✓ Image thumbnail {png['preview_width']}x{png['preview_height']}")
+        if attachments.pymupdf is not None:
+            assert pdf['pages'] == 3 and max(pdf['preview_width'], pdf['preview_height']) == 320
+            assert (root / pdf['preview_path']).is_file()
+            print(f"✓ PDF first-page preview {pdf['preview_width']}x{pdf['preview_height']}")
+
+        # A 206 for a different range than requested restarts the download
+        RangeHandler.wrong_range = True
+        RangeHandler.requests_seen = []
+        target = root / 'restart' / 'slides.pdf'
+        target.parent.mkdir()
+        target.with_name('slides.pdf.part').write_bytes(b'stale partial')
+        assert download_file(f"{base}/slides.pdf", target)
+        assert target.read_bytes() == slides
+        assert RangeHandler.requests_seen == [('/slides.pdf', 'bytes=13-'), ('/slides.pdf', None)]
+        RangeHandler.wrong_range = False
+        print("✓ Mismatched partial response discarded and downloaded again")
+
+        RangeHandler.requests_seen = []
+        rerun = make_posts()
+        stats = mirror_attachments(rerun, directory=directory, workers=3, manifest_path=manifest)
+        assert stats['present'] == 3 and stats['downloaded'] == 0 and stats['previews'] == 0
+        assert RangeHandler.requests_seen == []
+        assert [att for post in rerun for att in post['attachments']] == [pdf, png, copy]
+        print("✓ Rerun reused stored files and previews without any requests")
+    finally:
+        server.shutdown()
+        server.server_close()
+        RangeHandler.wrong_range = False
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    """Run all tests."""
+    print("=" * 60)
+    print("Ed Client Test Suite")
+    print("=" * 60)
+
+    test_rate_limiter_paces_requests()
+    test_concurrent_details_keep_order()
+    test_concurrent_details_report_failures()
+    test_updated_since_stops_at_stale_page()
+    test_incremental_sync_refetches_changed_threads()
+    test_discovery_pushes_filter_to_server()
+    test_discovery_falls_back_to_crawl()
+    test_discovery_falls_back_on_listing_errors()
+    test_crawl_stops_at_creation_cutoff()
+    test_listing_and_details_are_pipelined()
+    test_conditional_requests_and_retries()
+    test_attachment_mirror_resumes_and_dedupes()
+
+    print("\n✓ All Ed client tests passed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,9 +7,16 @@ without requiring real Ed API calls or actual OpenAI/Anthropic API calls.
 """
 
 import json
+import random
+import threading
+import time
 from typing import Dict, Any
-from ai_analysis import AIAnalyzer
-from generate_insights import generate_insights_from_posts
+import numpy as np
+import ai_analysis
+import generate_insights
+from ai_analysis import AIAnalyzer, AdaptiveConcurrencyLimiter
+from generate_insights import generate_insights_from_posts, top_k_similar
+from utils import load_json
 
 
 # Sample posts for testing
@@ -287,13 +294,8 @@ def test_ai_analysis_structure():
     return True
 
 
-def test_insights_generation():
-    """Test insights generation from multiple posts."""
-    print("\n" + "=" * 70)
-    print("TEST 2: Cross-Post Insights Generation")
-    print("=" * 70)
-
-    # Add mock analysis to sample posts
+def analyzed_sample_posts():
+    """SAMPLE_POSTS with mock analysis results merged in."""
     posts_with_analysis = []
 
     for post in SAMPLE_POSTS:
@@ -373,6 +375,17 @@ def test_insights_generation():
 
         posts_with_analysis.append({**post, **analysis})
 
+    return posts_with_analysis
+
+
+def test_insights_generation():
+    """Test insights generation from multiple posts."""
+    print("\n" + "=" * 70)
+    print("TEST 2: Cross-Post Insights Generation")
+    print("=" * 70)
+
+    posts_with_analysis = analyzed_sample_posts()
+
     # Generate insights
     insights = generate_insights_from_posts(posts_with_analysis)
 
@@ -398,6 +411,462 @@ def test_insights_generation():
     return True
 
 
+class ThrottledError(Exception):
+    """Stand-in for a provider SDK 429 error."""
+    status_code = 429
+
+
+class FakeAnalyzer(AIAnalyzer):
+    """AIAnalyzer that answers locally and throttles the first request."""
+
+    max_seen_in_flight = 0
+    throttled = False
+    calls = 0
+
+    def __init__(self, provider=None, model=None, concurrency=None):
+        self.provider = 'google'
+        self.model = 'fake-model'
+        self.limiter = AdaptiveConcurrencyLimiter(concurrency or 4)
+        self.cache_stats = {'hits': 0, 'misses': 0, 'tokens_saved': 0, 'seconds_saved': 0.0}
+        self._stats_lock = threading.Lock()
+        self._lock = threading.Lock()
+
+    def _call_google(self, prompt):
+        with self._lock:
+            FakeAnalyzer.calls += 1
+            FakeAnalyzer.max_seen_in_flight = max(FakeAnalyzer.max_seen_in_flight, self.limiter.in_flight)
+            if not FakeAnalyzer.throttled:
+                FakeAnalyzer.throttled = True
+                raise ThrottledError("Too many requests")
+        time.sleep(random.uniform(0.001, 0.01))
+        title = prompt.split('Title: ', 1)[1].split('\n', 1)[0]
+        response = json.dumps({
+            'summary': title,
+            'task_types': [],
+            'homework_coverage': [],
+            'problems_attempted': [],
+            'insights': {},
+            'code_quality': {},
+            'tags': [title],
+            'highlight_score': 5,
+        })
+        return response, 100
+
+
+def test_concurrent_batch_analysis():
+    """Test that batch analysis runs concurrently, adapts to throttling, and keeps order."""
+    print("\n" + "=" * 70)
+    print("TEST 3: Concurrent Batch Analysis")
+    print("=" * 70)
+
+    posts = [{'post_id': f'post_{i}', 'title': f'Post {i}', 'content_markdown': ''} for i in range(20)]
+
+    original = ai_analysis.AIAnalyzer, ai_analysis.ENABLE_CACHE
+    ai_analysis.AIAnalyzer, ai_analysis.ENABLE_CACHE = FakeAnalyzer, False
+    try:
+        analyzed = ai_analysis.analyze_posts_batch(posts, verbose=False, concurrency=4)
+    finally:
+        ai_analysis.AIAnalyzer, ai_analysis.ENABLE_CACHE = original
+
+    assert [p['post_id'] for p in analyzed] == [p['post_id'] for p in posts]
+    assert all(p['summary'] == p['title'] for p in analyzed), "Analysis merged into wrong post"
+    assert 1 < FakeAnalyzer.max_seen_in_flight <= 4
+    print(f"✓ {len(analyzed)} posts analyzed in order, max {FakeAnalyzer.max_seen_in_flight} in flight")
+
+    limiter = AdaptiveConcurrencyLimiter(8)
+    limiter.record_throttle(0)
+    assert limiter.limit == 4
+    for _ in range(4):
+        limiter.record_success()
+    assert limiter.limit == 5
+    print("✓ Concurrency halves on throttling and recovers on success")
+    return True
+
+
+def test_analysis_cache():
+    """Test that repeated prompts are served from the analysis cache."""
+    print("\n" + "=" * 70)
+    print("TEST 4: Analysis Cache")
+    print("=" * 70)
+    import shutil
+    import tempfile
+    from pathlib import Path
+
+    cache_dir = Path(tempfile.mkdtemp())
+    original_dir = ai_analysis.ANALYSIS_CACHE_DIR
+    ai_analysis.ANALYSIS_CACHE_DIR = cache_dir
+    FakeAnalyzer.throttled = True  # No simulated 429s here
+    try:
+        posts = [{'post_id': f'post_{i}', 'title': f'Post {i}', 'content_markdown': ''} for i in range(3)]
+        analyzer = FakeAnalyzer()
+        first = [analyzer.analyze_post(p) for p in posts]
+        calls = FakeAnalyzer.calls
+
+        # Editing one post re-queries only that post's prompt
+        posts[1] = {**posts[1], 'content_markdown': 'edited'}
+        rerun = FakeAnalyzer()
+        second = [rerun.analyze_post(p) for p in posts]
+
+        assert FakeAnalyzer.calls == calls + 1
+        assert second == first
+        assert rerun.cache_stats['hits'] == 2 and rerun.cache_stats['misses'] == 1
+        assert rerun.cache_stats['tokens_saved'] == 200
+        print(f"✓ Rerun served {rerun.cache_stats['hits']} of {len(posts)} posts from cache")
+    finally:
+        ai_analysis.ANALYSIS_CACHE_DIR = original_dir
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    return True
+
+
+class InterruptingAnalyzer(FakeAnalyzer):
+    """FakeAnalyzer that dies (like a killed process) after a set number of calls."""
+
+    interrupt_after = None
+    attempts = 0
+
+    def _call_google(self, prompt):
+        with self._lock:
+            InterruptingAnalyzer.attempts += 1
+            interrupted = (InterruptingAnalyzer.interrupt_after is not None and
+                           FakeAnalyzer.calls >= InterruptingAnalyzer.interrupt_after)
+        if interrupted:
+            time.sleep(0.05)  # Like a real request, so the batch has time to react
+            raise KeyboardInterrupt
+        return super()._call_google(prompt)
+
+
+def test_analysis_checkpoint_resume():
+    """Test that an interrupted batch resumes without re-analyzing finished posts."""
+    print("\n" + "=" * 70)
+    print("TEST 5: Analysis Checkpoint Resume")
+    print("=" * 70)
+    import shutil
+    import tempfile
+    from pathlib import Path
+
+    work_dir = Path(tempfile.mkdtemp())
+    checkpoint_path = work_dir / 'analysis_checkpoint.json'
+    posts = [{'post_id': f'post_{i}', 'title': f'Post {i}', 'content_markdown': ''} for i in range(12)]
+
+    original = ai_analysis.AIAnalyzer, ai_analysis.ENABLE_CACHE
+    original_cache_dir = ai_analysis.ANALYSIS_CACHE_DIR
+    ai_analysis.AIAnalyzer, ai_analysis.ENABLE_CACHE = InterruptingAnalyzer, False
+    FakeAnalyzer.throttled = True  # No simulated 429s here
+    try:
+        start_calls = FakeAnalyzer.calls
+        InterruptingAnalyzer.attempts = 0
+        InterruptingAnalyzer.interrupt_after = start_calls + 7
+        try:
+            ai_analysis.analyze_posts_batch(posts, verbose=False, concurrency=1,
+                                            checkpoint_path=checkpoint_path, checkpoint_every=2)
+            raise AssertionError("Batch should have been interrupted")
+        except KeyboardInterrupt:
+            pass
+
+        # The interrupted call, plus at most one the worker picked up before cancellation
+        assert InterruptingAnalyzer.attempts <= 9, "Queued analyses kept running after the interrupt"
+        saved = load_json(checkpoint_path)
+        assert len(saved) == 7, f"Expected 7 checkpointed analyses, got {len(saved)}"
+        print(f"✓ Interrupted run checkpointed {len(saved)} of {len(posts)} analyses")
+
+        InterruptingAnalyzer.interrupt_after = None
+        resume_calls = FakeAnalyzer.calls
+        analyzed = ai_analysis.analyze_posts_batch(posts, verbose=False, concurrency=2,
+                                                   checkpoint_path=checkpoint_path, checkpoint_every=2)
+
+        assert FakeAnalyzer.calls - resume_calls == len(posts) - 7, "Checkpointed posts were re-analyzed"
+        assert [p['post_id'] for p in analyzed] == [p['post_id'] for p in posts]
+        assert all(p['summary'] == p['title'] for p in analyzed)
+        assert not checkpoint_path.exists(), "Checkpoint should be removed after a complete run"
+        print(f"✓ Resumed run analyzed only the remaining {len(posts) - 7} posts")
+
+        # With the response cache on, the cache is what a rerun resumes from
+        ai_analysis.ENABLE_CACHE = True
+        ai_analysis.ANALYSIS_CACHE_DIR = work_dir / 'analysis'
+        ai_analysis.analyze_posts_batch(posts[:3], verbose=False, concurrency=1,
+                                        checkpoint_path=checkpoint_path, checkpoint_every=1)
+        assert not checkpoint_path.exists(), "Checkpoint duplicated the response cache"
+        print("✓ No checkpoint is written while the response cache is enabled")
+    finally:
+        ai_analysis.AIAnalyzer, ai_analysis.ENABLE_CACHE = original
+        ai_analysis.ANALYSIS_CACHE_DIR = original_cache_dir
+        InterruptingAnalyzer.interrupt_after = None
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return True
+
+
+class FakeEmbeddingsClient:
+    """OpenAI client stand-in whose embeddings come back out of order."""
+
+    def __init__(self, vectors: Dict[str, list]):
+        self.vectors = vectors
+        self.batches = []
+        self.embeddings = self
+
+    def create(self, model, input):
+        self.batches.append(len(input))
+        data = [
+            type('Embedding', (), {'index': i, 'embedding': self.vectors[text.split()[0]]})()
+            for i, text in enumerate(input)
+        ]
+        return type('Response', (), {'data': data[::-1]})()
+
+
+def test_post_similarities():
+    """Test batched embeddings, the embedding store and vectorized top-k similarity."""
+    print("\n" + "=" * 70)
+    print("TEST 6: Post Similarities")
+    print("=" * 70)
+
+    rng = np.random.default_rng(0)
+    matrix = rng.normal(size=(60, 8))
+    normalized = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+    for i, row in enumerate(top_k_similar(matrix, 5)):
+        sims = normalized @ normalized[i]
+        sims[i] = -np.inf
+        assert list(row) == list(np.argsort(-sims)[:5])
+    assert top_k_similar(matrix[:3], 5).shape == (3, 2)
+    print("✓ Vectorized top-k matches brute-force cosine ranking")
+
+    import shutil
+    import tempfile
+    from pathlib import Path
+
+    # More posts than the old 50-post cap, spread over several batches
+    vectors = {f'p{i}': list(rng.normal(size=4)) for i in range(121)}
+    posts = [{'post_id': f'post_{i}', 'title': f'p{i}', 'summary': ''} for i in range(120)]
+
+    original = generate_insights.EMBEDDING_BATCH_SIZE, generate_insights.EMBEDDINGS_DIR
+    generate_insights.EMBEDDING_BATCH_SIZE = 50
+    generate_insights.EMBEDDINGS_DIR = Path(tempfile.mkdtemp())
+    try:
+        generator = generate_insights.InsightsGenerator(posts)
+        generator.openai_client = FakeEmbeddingsClient(vectors)
+        similarities = generator.compute_post_similarities()
+
+        assert generator.openai_client.batches == [50, 50, 20]
+        assert len(similarities) == 120
+        expected = top_k_similar(np.array([vectors[f'p{i}'] for i in range(120)]), 5)
+        assert similarities['post_7'] == [f'post_{j}' for j in expected[7]]
+        print(f"✓ {len(similarities)} posts embedded in {len(generator.openai_client.batches)} requests")
+
+        # A rerun embeds only the edited post, but re-ranks the whole corpus
+        posts[7] = {**posts[7], 'title': 'p120'}
+        rerun = generate_insights.InsightsGenerator(posts)
+        rerun.openai_client = FakeEmbeddingsClient(vectors)
+        updated = rerun.compute_post_similarities()
+
+        assert rerun.openai_client.batches == [1]
+        vectors['p7'] = vectors['p120']
+        expected = top_k_similar(np.array([vectors[f'p{i}'] for i in range(120)]), 5)
+        assert all(updated[f'post_{i}'] == [f'post_{j}' for j in expected[i]] for i in range(120))
+        print("✓ Rerun reused stored embeddings for unchanged posts")
+    finally:
+        shutil.rmtree(generate_insights.EMBEDDINGS_DIR, ignore_errors=True)
+        generate_insights.EMBEDDING_BATCH_SIZE, generate_insights.EMBEDDINGS_DIR = original
+    return True
+
+
+def test_local_embedding_backend():
+    """Test that similarities work offline with the local TF-IDF backend."""
+    print("\n" + "=" * 70)
+    print("TEST 7: Local Embedding Backend")
+    print("=" * 70)
+
+    topics = {
+        'adam': ('Adam optimizer bias correction', ['optimizer-implementation']),
+        'cnn': ('CNN convolution layer dimensions', ['neural-network-architecture']),
+        'aug': ('Random crop and flip augmentation', ['data-augmentation']),
+    }
+    posts = [
+        {
+            'post_id': f'{topic}_{i}',
+            'title': f'{title} attempt {i}',
+            'summary': f'Model {i} on {title.lower()}',
+            'tags': [topic],
+            'task_types': task_types,
+        }
+        for topic, (title, task_types) in topics.items()
+        for i in range(3)
+    ]
+
+    assert isinstance(generate_insights.get_embedding_backend(None), generate_insights.LocalEmbeddingBackend)
+
+    class IncompleteBackend(generate_insights.EmbeddingBackend):
+        name = 'incomplete'
+
+    try:
+        IncompleteBackend()
+        raise AssertionError("A backend without embed_posts should not construct")
+    except TypeError:
+        pass
+
+    generator = generate_insights.InsightsGenerator(posts)
+    generator.openai_client = None
+    similarities = generator.compute_post_similarities()
+
+    assert len(similarities) == len(posts)
+    for post_id, related in similarities.items():
+        topic = post_id.split('_')[0]
+        assert {r.split('_')[0] for r in related[:2]} == {topic}, f"{post_id}: {related}"
+    print(f"✓ Offline similarities group {len(posts)} posts by topic")
+
+    # Corpora larger than one block use the randomized SVD; it should find
+    # the same top directions as the exact Gram eigendecomposition
+    backend = generate_insights.LocalEmbeddingBackend(dimensions=3)
+    exact, _ = backend.embed_posts(posts)
+    backend.BATCH_ROWS = 2
+    randomized, _ = backend.embed_posts(posts)
+    assert np.allclose(exact @ exact.T, randomized @ randomized.T, atol=1e-6)
+    print("✓ Randomized SVD over row blocks matches the exact embedding")
+    return True
+
+
+def test_ann_index():
+    """Test the IVF index against exact top-k and its persistence."""
+    print("\n" + "=" * 70)
+    print("TEST 8: ANN Index")
+    print("=" * 70)
+    import shutil
+    import tempfile
+    from pathlib import Path
+    from ann_index import IVFIndex
+
+    rng = np.random.default_rng(1)
+    centers = rng.normal(size=(10, 16))
+    embeddings = centers[rng.integers(10, size=400)] + rng.normal(scale=0.5, size=(400, 16))
+    exact = top_k_similar(embeddings, 5)
+
+    index = IVFIndex.train(embeddings, nlist=20)
+    assert (index.neighbors(embeddings, 5, nprobe=20) == exact).all(), "Probing every cluster must be exact"
+    approximate = index.neighbors(embeddings, 5, nprobe=3)
+    recall = np.mean([len(set(a) & set(e)) / 5 for a, e in zip(approximate.tolist(), exact.tolist())])
+    assert recall > 0.9, f"Recall too low: {recall:.3f}"
+    print(f"✓ nprobe=3 of 20 clusters: recall@5 = {recall:.3f}")
+
+    directory = Path(tempfile.mkdtemp())
+    original = generate_insights.ANN_MIN_POSTS
+    generate_insights.ANN_MIN_POSTS = 100
+    try:
+        index_path = directory / 'ann.npz'
+        generate_insights.approximate_top_k_similar(embeddings, 5, index_path)
+        trained = IVFIndex.load(index_path)
+        assert trained is not None and trained.trained_on == 400
+        assert not trained.needs_retraining(500, 16) and trained.needs_retraining(1000, 16)
+
+        posts = [{'post_id': f'post_{i}', 'title': f'p{i}', 'summary': ''} for i in range(120)]
+        generator = generate_insights.InsightsGenerator(posts)
+        generator.openai_client = None
+        similarities = generator.compute_post_similarities()
+        assert len(similarities) == 120 and all(len(r) <= 5 for r in similarities.values())
+        print("✓ Index persists and is used above ANN_MIN_POSTS")
+    finally:
+        generate_insights.ANN_MIN_POSTS = original
+        shutil.rmtree(directory, ignore_errors=True)
+    return True
+
+
+class CountingList(list):
+    """List that counts how many times it is iterated."""
+
+    iterations = 0
+
+    def __iter__(self):
+        self.iterations += 1
+        return super().__iter__()
+
+
+def test_single_pass_insights():
+    """Test that every insight section is built from one scan of the posts."""
+    print("\n" + "=" * 70)
+    print("TEST 9: Single-Pass Insights")
+    print("=" * 70)
+
+    posts = CountingList(analyzed_sample_posts())
+    generator = generate_insights.InsightsGenerator(posts)
+    insights = generator.generate_all_insights()
+
+    assert posts.iterations == 1, f"Posts scanned {posts.iterations} times"
+    assert insights['comparative_analysis']['total_posts'] == len(posts)
+    assert sum(p['submission_count'] for p in insights['llm_profiles']) == len(posts)
+    print(f"✓ {len(insights)} insight sections from a single scan of {len(posts)} posts")
+
+    # The LLM x task matrix agrees with the per-task difficulty scores
+    matrix = insights['llm_task_matrix']
+    assert matrix['ChatGPT'] == {'neural-network-architecture': 50.0, 'optimizer-implementation': 50.0}
+    assert 'data-augmentation' in matrix['Gemini']
+    for task, difficulty in insights['task_difficulty'].items():
+        rates = [row[task] for row in matrix.values() if task in row]
+        if len(rates) == 1:
+            assert difficulty == round(100 - rates[0], 1)
+    print(f"✓ LLM x task matrix covers {len(matrix)} LLMs")
+    return True
+
+
+def test_incremental_insights():
+    """Test that delta-updated insights match a full recompute."""
+    print("\n" + "=" * 70)
+    print("TEST 10: Incremental Insights")
+    print("=" * 70)
+    import copy
+    import shutil
+    import tempfile
+    from pathlib import Path
+    from insights_state import InsightsState
+
+    posts = analyzed_sample_posts()
+    directory = Path(tempfile.mkdtemp())
+    path = directory / 'insights_state.json'
+    try:
+        state = InsightsState()
+        assert state.sync(posts)['added'] == len(posts)
+        state.save(path)
+        assert InsightsState.load(path).to_insights() == generate_insights_from_posts(posts)
+
+        # Add a post, update one and remove another
+        new_post = copy.deepcopy(posts[0])
+        new_post['post_id'] = 'post_new'
+        new_post['insights']['one_shot_success_rate'] = 90
+        updated = copy.deepcopy(posts[1])
+        updated['highlight_score'] = 3
+        updated['insights']['weaknesses'] = ['Verbose', 'Slow']
+        changed = [new_post, updated, posts[0]]
+
+        state = InsightsState.load(path)
+        delta = state.sync(changed)
+        assert delta == {'added': 1, 'updated': 1, 'removed': 1, 'unchanged': 1}, delta
+        assert state.to_insights() == generate_insights_from_posts(changed)
+        print(f"✓ Delta {delta} matches a full recompute")
+
+        state.sync([])
+        assert len(state) == 0 and state.llms == {} and state.tasks == {}
+        print("✓ Removing every post empties all aggregates")
+
+        # Missing, malformed or boolean metrics are skipped, not counted as zero
+        edge_cases = posts + [
+            {'post_id': 'bare'},
+            {'post_id': 'odd', 'llm_info': {'primary_llm': 'ChatGPT'}, 'highlight_score': True,
+             'code_quality': {'correctness_rating': None},
+             'insights': {'one_shot_success_rate': 'n/a', 'strengths': ['Fast', 'Fast']},
+             'task_types': ['optimizer-implementation']},
+        ]
+        state = InsightsState()
+        state.sync(edge_cases)
+        by_llm = state.to_insights()['comparative_analysis']['by_llm']
+        assert by_llm['ChatGPT'] == {
+            'post_count': 2, 'avg_highlight_score': 8.0,
+            'avg_code_correctness': 8.0, 'avg_success_rate': 50.0,
+        }, by_llm['ChatGPT']
+        assert by_llm['Unknown'] == {
+            'post_count': 1, 'avg_highlight_score': 0.0,
+            'avg_code_correctness': 5.0, 'avg_success_rate': None,
+        }, by_llm['Unknown']
+        print(f"✓ Malformed metrics skipped across {len(edge_cases)} posts")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return True
+
+
 def main():
     """Run all Phase 3 tests."""
     print("\n" + "=" * 70)
@@ -411,6 +880,30 @@ def main():
         # Test 2: Insights generation
         test_insights_generation()
 
+        # Test 3: Concurrent analysis
+        test_concurrent_batch_analysis()
+
+        # Test 4: Analysis cache
+        test_analysis_cache()
+
+        # Test 5: Analysis checkpoint resume
+        test_analysis_checkpoint_resume()
+
+        # Test 6: Post similarities
+        test_post_similarities()
+
+        # Test 7: Local embedding backend
+        test_local_embedding_backend()
+
+        # Test 8: ANN index
+        test_ann_index()
+
+        # Test 9: Single-pass insights
+        test_single_pass_insights()
+
+        # Test 10: Incremental insights
+        test_incremental_insights()
+
         print("\n" + "=" * 70)
         print("✅ ALL TESTS PASSED")
         print("=" * 70)
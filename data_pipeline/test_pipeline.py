@@ -100,6 +100,25 @@ def test_extraction(structured_post):
     return enriched
 
 
+def test_single_pass_extraction():
+    """Test that single-pass extraction matches the per-field extractors."""
+    print("\n=== Testing Single-Pass Extraction ===")
+    from extract_content import (
+        extract_html_content, html_to_markdown, extract_code_snippets,
+        extract_links, extract_author_links,
+    )
+
+    html = create_mock_post()['document']['content']
+    extracted = extract_html_content(html)
+
+    assert extracted['markdown'] == html_to_markdown(html)
+    assert extracted['code_snippets'] == extract_code_snippets(html)
+    assert sorted(extracted['links']) == sorted(extract_links(html))
+    assert extracted['author_links'] == extract_author_links(html)
+    print(f"✓ One parse produced {len(extracted['code_snippets'])} snippets, "
+          f"{len(extracted['links'])} links and matching markdown")
+
+
 def test_save_load():
     """Test caching functionality."""
     print("\n=== Testing Cache Save/Load ===")
@@ -121,6 +140,231 @@ def test_save_load():
     test_file.unlink()
 
 
+def test_stage_cache():
+    """Test that cached stages only reprocess changed items."""
+    print("\n=== Testing Stage Cache ===")
+    import shutil
+    import build_dataset
+
+    stage_dir = config.CACHE_DIR / 'test_stages'
+    original_dir = build_dataset.STAGE_CACHE_DIR
+    build_dataset.STAGE_CACHE_DIR = stage_dir
+    processed = []
+
+    def process(items):
+        processed.extend(item['id'] for item in items)
+        return [{'id': item['id'], 'double': item['value'] * 2} for item in items]
+
+    try:
+        items = [{'id': i, 'value': i} for i in range(5)]
+        first = build_dataset.run_cached_stage('enrich', items, process)
+        assert processed == [0, 1, 2, 3, 4]
+
+        items[3]['value'] = 30
+        processed.clear()
+        second = build_dataset.run_cached_stage('enrich', items, process)
+        assert processed == [3], f"Expected only item 3 reprocessed, got {processed}"
+        assert second[3]['double'] == 60
+        assert second[:3] == first[:3]
+        print("✓ Only the changed item was reprocessed")
+    finally:
+        build_dataset.STAGE_CACHE_DIR = original_dir
+        shutil.rmtree(stage_dir, ignore_errors=True)
+
+
+def test_publish_outputs():
+    """Test that published artifacts are slim and never contain raw Ed data."""
+    print("\n=== Testing Published Outputs ===")
+    import shutil
+    from build_dataset import write_post_outputs, republish_posts, LISTING_FIELDS
+
+    enriched_post = enrich_post(structure_post_data(create_mock_post()))
+
+    output_dir = config.CACHE_DIR / 'test_output'
+    try:
+        outputs = write_post_outputs([enriched_post], output_dir)
+        from utils import load_json
+        index = load_json(outputs['index'])
+        shard = load_json(outputs['shards'] / f"{enriched_post['post_id']}.json")
+
+        assert len(index) == 1
+        assert set(LISTING_FIELDS) <= set(index[0])
+        assert 'content_markdown' not in index[0]
+        assert index[0]['code_snippet_count'] == len(enriched_post['code_snippets'])
+        for record in (index[0], shard, load_json(outputs['posts'])[0]):
+            assert 'raw_ed_data' not in record
+        print(f"✓ Index entry has {len(index[0])} fields, detail shard has {len(shard)}")
+
+        # Renaming an author republishes every artifact from posts.json
+        def rename(post):
+            post['author']['name'] = 'Ada Lovelace'
+            return True
+
+        republished = republish_posts(rename, output_dir)
+        shard = load_json(outputs['shards'] / f"{enriched_post['post_id']}.json")
+        assert load_json(outputs['index'])[0]['author']['name'] == 'Ada Lovelace'
+        assert shard['author']['name'] == 'Ada Lovelace' and 'raw_ed_data' not in shard
+        assert 'ada' in load_json(republished['search_index'])['terms']
+        assert republish_posts(lambda post: False, output_dir) is None
+        print("✓ Renamed author republished to the index, shards and search index")
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def test_search_index():
+    """Test that the prebuilt search index tokenizes and weights fields."""
+    print("\n=== Testing Search Index ===")
+    from search_index import build_search_index, tokenize, SEARCH_FIELDS
+
+    assert tokenize("The Adam-Optimizer, naïve GPT-4o!") == ['adam', 'optimizer', 'naive', 'gpt', '4o']
+
+    posts = [
+        {'post_id': 'a', 'title': 'Adam optimizer', 'tags': ['adam', 'adam']},
+        {'post_id': 'b', 'summary': 'Transformers', 'author': {'name': 'Ada'}},
+    ]
+    index = build_search_index(posts)
+    fields = [field['name'] for field in index['fields']]
+
+    assert index['docs'] == ['a', 'b']
+    assert fields == [path for path, _ in SEARCH_FIELDS]
+    assert index['terms']['adam'] == [0, fields.index('title'), 1, 0, fields.index('tags'), 2]
+    assert index['terms']['ada'] == [1, fields.index('author.name'), 1]
+    assert list(index['terms']) == sorted(index['terms'])
+    print(f"✓ Indexed {len(index['terms'])} terms over {len(fields)} fields")
+
+
+def test_streaming_json():
+    """Test the streaming array writer and line-delimited JSON helpers."""
+    print("\n=== Testing Streaming JSON ===")
+    import shutil
+    from utils import save_json, write_json_array, write_jsonl, iter_jsonl
+
+    test_dir = config.CACHE_DIR / 'test_streaming'
+    records = [{'post_id': 'a', 'title': 'Ünïcode\nlines', 'tags': []}, {'nested': {'x': [1, {}]}}, []]
+    try:
+        for indent in (2, None):
+            save_json(test_dir / 'whole.json', records, indent=indent)
+            count = write_json_array(test_dir / 'streamed.json', iter(records), indent=indent)
+            assert count == len(records)
+            assert (test_dir / 'whole.json').read_bytes() == (test_dir / 'streamed.json').read_bytes()
+        write_json_array(test_dir / 'empty.json', iter([]))
+        assert (test_dir / 'empty.json').read_text() == '[]'
+        print("✓ Streamed arrays are byte-identical to json.dump")
+
+        path = test_dir / 'records.jsonl'
+        assert write_jsonl(path, iter(records)) == len(records)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('{"interrupted": ')
+        assert list(iter_jsonl(path)) == records
+        print("✓ JSONL write and lazy iteration (truncated tail skipped)")
+    finally:
+        shutil.rmtree(test_dir, ignore_errors=True)
+
+
+def test_atomic_writes():
+    """Test that failed writes leave the previous file intact and corrupt caches are misses."""
+    print("\n=== Testing Atomic Writes ===")
+    import shutil
+    from utils import save_json, load_json, write_json_array, load_from_cache, get_cache_path
+
+    test_dir = config.CACHE_DIR / 'test_atomic'
+    path = test_dir / 'data.json'
+    try:
+        save_json(path, {'version': 1})
+
+        def failing_records():
+            yield {'version': 2}
+            raise RuntimeError("interrupted")
+
+        try:
+            write_json_array(path, failing_records())
+            raise AssertionError("Write should have failed")
+        except RuntimeError:
+            pass
+        assert load_json(path) == {'version': 1}, "Interrupted write clobbered the file"
+        assert [p.name for p in test_dir.iterdir()] == ['data.json'], "Temp file left behind"
+        print("✓ Interrupted write left the previous file and no temp files")
+
+        get_cache_path('torn', test_dir).write_text('{"analysis": {"summ')
+        assert load_from_cache('torn', test_dir) is None
+        print("✓ Corrupt cache entry treated as a miss")
+    finally:
+        shutil.rmtree(test_dir, ignore_errors=True)
+
+
+def test_json_backends():
+    """Test that orjson (when installed) and the stdlib fallback write the same JSON."""
+    print("\n=== Testing JSON Backends ===")
+    import numpy as np
+    import utils
+
+    data = {'post_id': 'a', 'title': 'Ünïcode "quoted"\n', 'score': 7.5, 'tags': [], 'nested': {'ok': True, 'none': None}}
+    installed = utils.orjson
+    try:
+        outputs = {}
+        for backend in ('orjson', 'json'):
+            if backend == 'orjson' and installed is None:
+                continue
+            utils.orjson = installed if backend == 'orjson' else None
+            assert utils.json_backend() == backend
+            numeric = {'v': np.float32(0.1), 'n': np.int64(3), 'rows': np.arange(3)}
+            outputs[backend] = (utils.dumps_json(data, indent=2), utils.dumps_json(data), utils.dumps_json(numeric))
+            assert utils.loads_json(outputs[backend][0]) == data
+            assert utils.loads_json(outputs[backend][1].decode('utf-8')) == data
+            assert utils.loads_json(outputs[backend][2])['rows'] == [0, 1, 2]
+        assert outputs['json'][0] == json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+        assert len(set(outputs.values())) == 1, "Backends disagree on output bytes"
+        print(f"✓ Backends produce identical output ({', '.join(outputs)})")
+    finally:
+        utils.orjson = installed
+
+
+def test_compressed_json():
+    """Test compressed caches, transparent loading and precompressed outputs."""
+    print("\n=== Testing Compressed JSON ===")
+    import gzip
+    import shutil
+    import utils
+
+    test_dir = config.CACHE_DIR / 'test_compressed'
+    path = test_dir / 'cache.json'
+    records = [{'post_id': str(i), 'title': f'Post {i} ✓', 'tags': ['a'] * i} for i in range(50)]
+    original = config.CACHE_COMPRESSION, utils.zstandard
+    try:
+        codecs = [('gzip', '.gz'), ('none', '')]
+        if utils.zstandard is not None:
+            codecs.insert(0, ('zstd', '.zst'))
+        for codec, suffix in codecs:
+            config.CACHE_COMPRESSION = codec
+            written = utils.save_cache_json(path, records)
+            assert written.name == 'cache.json' + suffix
+            assert [p.name for p in test_dir.iterdir()] == [written.name], "Stale variant left behind"
+            assert utils.load_json(path) == records
+
+            jsonl = utils.cache_file(test_dir / 'records.jsonl')
+            utils.write_jsonl(jsonl, records)
+            assert list(utils.iter_jsonl(test_dir / 'records.jsonl')) == records
+            jsonl.unlink()
+        print(f"✓ Caches round-trip with {', '.join(codec for codec, _ in codecs)}")
+
+        config.CACHE_COMPRESSION, utils.zstandard = 'auto', None
+        assert utils.cache_compression() == 'gzip'
+        print("✓ 'auto' falls back to gzip without zstandard")
+        utils.zstandard = original[1]
+
+        published = test_dir / 'posts.json'
+        utils.save_json(published, records)
+        siblings = utils.write_precompressed(published)
+        assert gzip.decompress((test_dir / 'posts.json.gz').read_bytes()) == published.read_bytes()
+        if utils.brotli is not None:
+            assert utils.brotli.decompress((test_dir / 'posts.json.br').read_bytes()) == published.read_bytes()
+        assert utils.load_json(published) == records
+        print(f"✓ Precompressed {', '.join(p.suffix for p in siblings)} siblings match the published file")
+    finally:
+        config.CACHE_COMPRESSION, utils.zstandard = original
+        shutil.rmtree(test_dir, ignore_errors=True)
+
+
 def main():
     """Run all tests."""
     print("=" * 60)
@@ -135,8 +379,17 @@ def main():
         # Test extraction
         enriched = test_extraction(structured)
         
+        test_single_pass_extraction()
+        test_publish_outputs()
+        test_search_index()
+        test_streaming_json()
+        test_atomic_writes()
+        test_json_backends()
+        test_compressed_json()
+        
         # Test caching
         test_save_load()
+        test_stage_cache()
         
         print("\n" + "=" * 60)
         print("✓ All tests passed!")
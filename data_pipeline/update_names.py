@@ -4,11 +4,10 @@ Quick script to update author names from cached raw data.
 No need to re-fetch from Ed API.
 """
 
-import json
-from pathlib import Path
 from fetch_posts import structure_post_data
-from utils import load_cache, save_cache, write_json
-from config import OUTPUT_DIR, CACHE_DIR
+from build_dataset import republish_posts
+from utils import load_cache, save_cache_records, iter_cache_records, find_json
+from config import CACHE_DIR
 
 
 def update_author_names():
@@ -21,7 +20,7 @@ def update_author_names():
     # Load raw threads (which contains users array)
     raw_cache = CACHE_DIR / 'raw_threads.json'
 
-    if not raw_cache.exists():
+    if not find_json(raw_cache):
         print(f"\n✗ Error: {raw_cache} not found")
         print("Run fetch_posts.py first to fetch data from Ed")
         return
@@ -44,18 +43,18 @@ def update_author_names():
             print(f"  ✓ Found name: {author_name}")
 
     # Save updated structured posts
-    save_cache('structured_posts.json', structured_posts)
-    print(f"\n✓ Updated {CACHE_DIR / 'structured_posts.json'}")
+    save_cache_records('structured_posts.jsonl', structured_posts)
+    print(f"\n✓ Updated {CACHE_DIR / 'structured_posts.jsonl'}")
+
+    # Create a mapping of post_id to author name
+    name_map = {p['post_id']: p['author']['name'] for p in structured_posts}
 
     # Now update the analyzed posts if they exist
-    analyzed_cache = CACHE_DIR / 'analyzed_posts.json'
+    analyzed_cache = CACHE_DIR / 'analyzed_posts.jsonl'
 
-    if analyzed_cache.exists():
+    if find_json(analyzed_cache):
         print(f"\nUpdating analyzed posts...")
-        analyzed_posts = load_cache('analyzed_posts.json')
-
-        # Create a mapping of post_id to author name
-        name_map = {p['post_id']: p['author']['name'] for p in structured_posts}
+        analyzed_posts = list(iter_cache_records('analyzed_posts.jsonl'))
 
         # Update names in analyzed posts
         for post in analyzed_posts:
@@ -63,14 +62,20 @@ def update_author_names():
             if post_id in name_map:
                 post['author']['name'] = name_map[post_id]
 
-        save_cache('analyzed_posts.json', analyzed_posts)
+        save_cache_records('analyzed_posts.jsonl', analyzed_posts)
         print(f"✓ Updated {analyzed_cache}")
 
-        # Update final output
-        output_file = OUTPUT_DIR / 'posts.json'
-        if output_file.exists():
-            write_json(str(output_file), analyzed_posts)
-            print(f"✓ Updated {output_file}")
+    # Update the published index, detail shards and posts.json
+    def rename_author(post):
+        new_name = name_map.get(post.get('post_id'))
+        if new_name is None or post['author']['name'] == new_name:
+            return False
+        post['author']['name'] = new_name
+        return True
+
+    outputs = republish_posts(rename_author)
+    if outputs:
+        print(f"✓ Updated {outputs['index']}, {outputs['shards']}/ and {outputs['posts']}")
 
     print("\n" + "=" * 60)
     print("SUCCESS! Author names updated.")
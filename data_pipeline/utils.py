@@ -1,23 +1,399 @@
 """Utility functions for data pipeline."""
+import gzip
+import io
 import json
 import hashlib
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
 
+try:
+    import orjson
+except ImportError:  # Optional: the stdlib encoder is used instead
+    orjson = None
 
-def save_json(filepath: Path, data: Any) -> None:
-    """Save data as JSON with pretty formatting."""
+try:
+    import zstandard
+except ImportError:  # Optional: caches fall back to gzip
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:  # Optional: published files only get a .gz sibling
+    brotli = None
+
+# Compressed file suffixes understood by load_json and iter_jsonl
+COMPRESSION_SUFFIXES = {'zstd': '.zst', 'gzip': '.gz'}
+
+# Caches favour speed; precompressed published files are written once and
+# served many times, so they use the strongest settings
+CACHE_GZIP_LEVEL = 6
+CACHE_ZSTD_LEVEL = 3
+STATIC_GZIP_LEVEL = 9
+STATIC_BROTLI_QUALITY = 11
+
+
+def _compressing_writer(raw, filepath: Path):
+    """Wrap a binary file so writes are compressed according to filepath's suffix."""
+    if filepath.suffix == '.gz':
+        # Empty name and fixed mtime keep the output reproducible
+        return gzip.GzipFile(filename='', mode='wb', fileobj=raw,
+                             compresslevel=CACHE_GZIP_LEVEL, mtime=0)
+    if filepath.suffix == '.zst':
+        if zstandard is None:
+            raise RuntimeError(f"Writing {filepath} requires the zstandard package")
+        return zstandard.ZstdCompressor(level=CACHE_ZSTD_LEVEL).stream_writer(raw, closefd=False)
+    return raw
+
+
+def open_binary(filepath: Path):
+    """
+    Open a file for binary reading, decompressing .gz and .zst files.
+
+    Args:
+        filepath: File to open
+
+    Returns:
+        Readable binary file object (supports iteration by line)
+    """
+    if filepath.suffix == '.gz':
+        return gzip.open(filepath, 'rb')
+    if filepath.suffix == '.zst':
+        if zstandard is None:
+            raise RuntimeError(f"Reading {filepath} requires the zstandard package")
+        return io.BufferedReader(zstandard.open(filepath, 'rb'))
+    return open(filepath, 'rb')
+
+
+def find_json(filepath: Path) -> Optional[Path]:
+    """
+    Locate a JSON file or its compressed variant.
+
+    Args:
+        filepath: Uncompressed path, e.g. cache/raw_threads.json
+
+    Returns:
+        filepath itself if it exists, else an existing .zst or .gz sibling, else None
+    """
+    filepath = Path(filepath)
+    if filepath.exists():
+        return filepath
+    for suffix in COMPRESSION_SUFFIXES.values():
+        candidate = filepath.with_name(filepath.name + suffix)
+        if candidate.exists():
+            return candidate
+    return None
+
+
+def remove_json(filepath: Path, keep: Optional[Path] = None) -> None:
+    """Delete a JSON file and its compressed variants, except keep."""
+    filepath = Path(filepath)
+    for suffix in ['', *COMPRESSION_SUFFIXES.values()]:
+        candidate = filepath.with_name(filepath.name + suffix)
+        if candidate != keep:
+            candidate.unlink(missing_ok=True)
+
+
+@contextmanager
+def atomic_write(filepath: Path, mode: str = 'w', compress: bool = True) -> Iterator[Any]:
+    """
+    Open a temp file next to filepath and move it into place on success.
+
+    Readers see either the old file or the complete new one, never a
+    partial write. If the block raises, the temp file is removed and the
+    original is left untouched.
+
+    Args:
+        filepath: Destination path
+        mode: 'w' for text (UTF-8) or 'wb' for binary
+        compress: Compress writes to paths ending in .gz or .zst. Pass False
+            to write already-compressed bytes.
+
+    Yields:
+        File object to write to
+    """
+    filepath = Path(filepath)
     filepath.parent.mkdir(parents=True, exist_ok=True)
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    fd, tmp_name = tempfile.mkstemp(dir=filepath.parent, prefix=f'.{filepath.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as raw:
+            stream = _compressing_writer(raw, filepath) if compress else raw
+            f = stream if 'b' in mode else io.TextIOWrapper(stream, encoding='utf-8')
+            yield f
+            if f is not stream:
+                f.flush()
+                f.detach()
+            if stream is not raw:
+                stream.close()  # Writes the compression trailer; raw stays open
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp_name, filepath)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def json_backend() -> str:
+    """Name of the JSON library in use: 'orjson' if installed, else 'json'."""
+    return 'orjson' if orjson is not None else 'json'
+
+
+def _json_default(value: Any) -> Any:
+    """Convert numpy scalars and arrays (anything with tolist()) to plain Python values."""
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps_json(data: Any, indent: Optional[int] = None) -> bytes:
+    """
+    Encode data as UTF-8 JSON.
+
+    Uses orjson when it is installed, otherwise the stdlib json module. Both
+    produce the same layout: compact (no spaces) when indent is None, or the
+    stdlib's indent=2 style. Numpy values go through the same conversion
+    with either backend, so the output doesn't depend on which is installed.
+
+    Args:
+        data: JSON-serializable data (numpy scalars and arrays are accepted)
+        indent: None for compact output, or 2 to pretty-print
+
+    Returns:
+        Encoded JSON
+    """
+    if orjson is not None and indent in (None, 2):
+        option = orjson.OPT_NON_STR_KEYS
+        if indent is not None:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, option=option, default=_json_default)
+    separators = None if indent is not None else (',', ':')
+    return json.dumps(data, indent=indent, separators=separators, ensure_ascii=False,
+                      default=_json_default).encode('utf-8')
+
+
+def loads_json(data: Union[bytes, str]) -> Any:
+    """
+    Decode JSON text.
+
+    Raises:
+        json.JSONDecodeError: If the input is not valid JSON (orjson's error is a subclass)
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def save_json(filepath: Path, data: Any, indent: Optional[int] = 2) -> None:
+    """
+    Atomically save data as JSON.
+
+    Pretty-print (the default) only files people read, such as the published
+    site data; pass indent=None for internal caches, which are smaller and
+    faster to write compact.
+    """
+    with atomic_write(filepath, 'wb') as f:
+        f.write(dumps_json(data, indent=indent))
 
 
 def load_json(filepath: Path) -> Optional[Any]:
-    """Load data from JSON file."""
-    if not filepath.exists():
+    """
+    Load data from a JSON file, or None if it does not exist.
+
+    Falls back to a compressed .zst or .gz variant of filepath, so callers
+    do not need to know whether a cache was written compressed.
+    """
+    found = find_json(filepath)
+    if found is None:
         return None
-    with open(filepath, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    with open_binary(found) as f:
+        return loads_json(f.read())
+
+
+def cache_compression() -> str:
+    """Codec for internal caches: CACHE_COMPRESSION, with 'auto' and unavailable zstd resolved."""
+    from config import CACHE_COMPRESSION
+    if CACHE_COMPRESSION in ('auto', 'zstd'):
+        return 'zstd' if zstandard is not None else 'gzip'
+    return CACHE_COMPRESSION if CACHE_COMPRESSION in COMPRESSION_SUFFIXES else 'none'
+
+
+def cache_file(filepath: Path) -> Path:
+    """Path a cache file is written to: filepath plus the cache codec's suffix."""
+    filepath = Path(filepath)
+    suffix = COMPRESSION_SUFFIXES.get(cache_compression(), '')
+    return filepath.with_name(filepath.name + suffix)
+
+
+def save_cache_json(filepath: Path, data: Any) -> Path:
+    """
+    Save an internal cache file: compact JSON, compressed per CACHE_COMPRESSION.
+
+    Variants written under a different codec are removed, so load_json always
+    finds the current data.
+
+    Args:
+        filepath: Uncompressed path, e.g. cache/raw_threads.json
+        data: JSON-serializable data
+
+    Returns:
+        Path actually written
+    """
+    target = cache_file(filepath)
+    save_json(target, data, indent=None)
+    remove_json(filepath, keep=target)
+    return target
+
+
+def write_precompressed(filepath: Path) -> List[Path]:
+    """
+    Write .gz (and, with brotli installed, .br) siblings of a published file.
+
+    Static hosts can serve these directly to clients that accept the
+    encoding. A .br left from an earlier run is removed if brotli is
+    unavailable, so no sibling ever lags behind the file.
+
+    Args:
+        filepath: Published file, e.g. public/data/posts.json
+
+    Returns:
+        Paths written
+    """
+    data = filepath.read_bytes()
+    written = []
+
+    gz_path = filepath.with_name(filepath.name + '.gz')
+    with atomic_write(gz_path, 'wb', compress=False) as f:
+        f.write(gzip.compress(data, compresslevel=STATIC_GZIP_LEVEL, mtime=0))
+    written.append(gz_path)
+
+    br_path = filepath.with_name(filepath.name + '.br')
+    if brotli is not None:
+        with atomic_write(br_path, 'wb', compress=False) as f:
+            f.write(brotli.compress(data, quality=STATIC_BROTLI_QUALITY))
+        written.append(br_path)
+    else:
+        br_path.unlink(missing_ok=True)
+
+    return written
+
+
+class JsonArrayWriter:
+    """
+    Write a JSON array one item at a time.
+
+    Produces the same bytes as save_json on the full list, without holding
+    the list (or its serialized form) in memory. The file is only moved into
+    place once the array is complete.
+
+    Usage:
+        with JsonArrayWriter(path) as writer:
+            for item in items:
+                writer.write(item)
+    """
+
+    def __init__(self, filepath: Path, indent: Optional[int] = 2):
+        self.filepath = Path(filepath)
+        self.indent = indent
+        self.count = 0
+        self._writer = None
+        self._file = None
+
+    def __enter__(self) -> 'JsonArrayWriter':
+        self._writer = atomic_write(self.filepath, 'wb')
+        self._file = self._writer.__enter__()
+        self._file.write(b'[')
+        return self
+
+    def write(self, item: Any) -> None:
+        """Append one item to the array."""
+        text = dumps_json(item, indent=self.indent)
+        if self.indent is None:
+            self._file.write(b',' + text if self.count else text)
+        else:
+            pad = b' ' * self.indent
+            self._file.write(b',\n' if self.count else b'\n')
+            self._file.write(pad + text.replace(b'\n', b'\n' + pad))
+        self.count += 1
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if exc_type is None:
+            if self.indent is not None and self.count:
+                self._file.write(b'\n')
+            self._file.write(b']')
+        return self._writer.__exit__(exc_type, exc, tb)
+
+
+def write_json_array(filepath: Path, items: Iterable[Any], indent: Optional[int] = 2) -> int:
+    """
+    Stream an iterable to a JSON array file.
+
+    Args:
+        filepath: Output path
+        items: Items to write, consumed lazily
+        indent: Indentation, or None for compact output
+
+    Returns:
+        Number of items written
+    """
+    with JsonArrayWriter(filepath, indent=indent) as writer:
+        for item in items:
+            writer.write(item)
+    return writer.count
+
+
+def write_jsonl(filepath: Path, records: Iterable[Any]) -> int:
+    """
+    Write records as line-delimited JSON, atomically replacing the file.
+
+    Args:
+        filepath: Output path
+        records: Records to write, consumed lazily
+
+    Returns:
+        Number of records written
+    """
+    count = 0
+    with atomic_write(filepath, 'wb') as f:
+        for record in records:
+            f.write(dumps_json(record))
+            f.write(b'\n')
+            count += 1
+    return count
+
+
+def iter_jsonl(filepath: Path) -> Iterator[Any]:
+    """
+    Lazily read records from a line-delimited JSON file.
+
+    A truncated final line (from a file written outside atomic_write) is skipped.
+
+    Args:
+        filepath: File to read (or its .zst/.gz variant); a missing file yields nothing
+
+    Yields:
+        One decoded record per line
+    """
+    found = find_json(filepath)
+    if found is None:
+        return
+    with open_binary(found) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield loads_json(line)
+            except json.JSONDecodeError:
+                if line.endswith(b'\n'):
+                    raise
+                return
 
 
 def get_content_hash(content: str) -> str:
@@ -33,6 +409,22 @@ def get_content_hash(content: str) -> str:
     return hashlib.md5(content.encode('utf-8')).hexdigest()
 
 
+def get_stage_cache_key(stage: str, version: str, inputs: Any) -> str:
+    """
+    Generate a content-addressed cache key for one item of a pipeline stage.
+
+    Args:
+        stage: Stage name, used as the key prefix
+        version: Stage code version; bump it to invalidate old entries
+        inputs: JSON-serializable inputs that determine the stage output
+
+    Returns:
+        Cache key of the form '<stage>_<hash>'
+    """
+    canonical = json.dumps(inputs, sort_keys=True, ensure_ascii=False, default=str)
+    return f"{stage}_{get_content_hash(f'{version}:{canonical}')}"
+
+
 def get_cache_path(cache_key: str, cache_dir: Path) -> Path:
     """
     Get the cache file path for a given key.
@@ -60,7 +452,12 @@ def load_from_cache(cache_key: str, cache_dir: Path) -> Optional[Any]:
         Cached data or None
     """
     cache_path = get_cache_path(cache_key, cache_dir)
-    return load_json(cache_path)
+    try:
+        return load_json(cache_path)
+    except json.JSONDecodeError:
+        # A corrupt entry (e.g. written by an older, non-atomic version) is a miss
+        print(f"  Warning: Ignoring corrupt cache file {cache_path}")
+        return None
 
 
 def save_to_cache(cache_key: str, data: Any, cache_dir: Path) -> None:
@@ -72,33 +469,191 @@ def save_to_cache(cache_key: str, data: Any, cache_dir: Path) -> None:
         data: Data to cache
         cache_dir: Cache directory
     """
-    cache_path = get_cache_path(cache_key, cache_dir)
-    save_json(cache_path, data)
+    save_cache_json(get_cache_path(cache_key, cache_dir), data)
+
 
+class Checkpoint:
+    """
+    Crash-safe key/value progress log for long-running stages.
+
+    Entries are buffered and written to disk (atomically, via temp file and
+    rename) every `flush_every` additions, so an interrupted run loses at
+    most that many results and can resume from the rest.
+    """
+
+    def __init__(self, filepath: Path, flush_every: int = 10):
+        """
+        Args:
+            filepath: Checkpoint file; existing entries are loaded
+            flush_every: Additions between writes to disk
+        """
+        self.filepath = Path(filepath)
+        self.flush_every = max(1, flush_every)
+        self.entries: Dict[str, Any] = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+
+        try:
+            self.entries = load_json(self.filepath) or {}
+        except json.JSONDecodeError:
+            print(f"  Warning: Ignoring corrupt checkpoint {self.filepath}")
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.entries.get(key)
+
+    def add(self, key: str, value: Any) -> None:
+        """Record a result, flushing to disk every flush_every additions."""
+        with self._lock:
+            self.entries[key] = value
+            self._pending += 1
+            if self._pending >= self.flush_every:
+                self._flush_locked()
+
+    def flush(self) -> None:
+        """Write any buffered entries to disk."""
+        with self._lock:
+            if self._pending:
+                self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        save_cache_json(self.filepath, self.entries)
+        self._pending = 0
 
-def download_file(url: str, save_path: Path) -> bool:
+    def discard(self) -> None:
+        """Delete the checkpoint once its results are safely stored elsewhere."""
+        with self._lock:
+            self.entries = {}
+            self._pending = 0
+            remove_json(self.filepath)
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """
+    Parse an ISO 8601 timestamp from the Ed API.
+
+    Args:
+        value: Timestamp string, e.g. '2025-11-20T08:10:11.123456+11:00'
+
+    Returns:
+        Timezone-aware datetime (naive values are treated as UTC), or None
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+class RateLimiter:
+    """Thread-safe token bucket for pacing requests across worker threads."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        Initialize the rate limiter.
+
+        Args:
+            rate: Tokens added per second (sustained requests per second)
+            burst: Maximum number of tokens that can accumulate
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a token is available, then consume it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                wait_time = (1 - self._tokens) / self.rate
+
+            time.sleep(wait_time)
+
+
+def download_file(url: str, save_path: Path, http_cache: Optional[Any] = None) -> bool:
     """
     Download a file from URL.
 
+    Uses the shared pooled, retrying session. The body is streamed into a
+    <name>.part file that is renamed into place once complete; if a
+    previous attempt left a .part file behind, the download resumes from
+    its end with a Range request. A server that ignores Range just sends
+    the whole file again; one that rejects the range or answers with a
+    different one gets a fresh request without Range. With an http_cache, a file that already exists
+    locally is revalidated (If-None-Match / If-Modified-Since) and left as
+    is when the server answers 304.
+
     Args:
         url: URL to download from
         save_path: Local path to save to
+        http_cache: Optional http_transport.HttpCache holding validators
 
     Returns:
-        True if successful, False otherwise
+        True if successful (downloaded or already up to date), False otherwise
     """
-    import requests
+    from http_transport import get_session
 
+    save_path = Path(save_path)
+    part_path = save_path.with_name(save_path.name + '.part')
     try:
-        save_path.parent.mkdir(parents=True, exist_ok=True)
+        offset = part_path.stat().st_size if part_path.exists() else 0
+        if offset:
+            headers = {'Range': f'bytes={offset}-'}
+        elif http_cache and save_path.exists():
+            headers = http_cache.validators(url)
+        else:
+            headers = {}
+        response = get_session().get(url, stream=True, timeout=30, headers=headers)
+
+        if response.status_code == 304:
+            if http_cache is not None:
+                http_cache.record(True, save_path.stat().st_size)
+            return True
 
-        response = requests.get(url, stream=True, timeout=30)
+        # A 416, or a 206 that doesn't continue where the partial file ends,
+        # means the partial file is unusable (e.g. the remote file changed)
+        mismatched = (response.status_code == 206 and
+                      not response.headers.get('Content-Range', '').startswith(f'bytes {offset}-'))
+        if offset and (response.status_code == 416 or mismatched):
+            response.close()
+            part_path.unlink(missing_ok=True)
+            return download_file(url, save_path, http_cache)
+        if mismatched:
+            raise RuntimeError(f"unexpected Content-Range {response.headers.get('Content-Range')!r}")
         response.raise_for_status()
 
-        with open(save_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
+        resumed = response.status_code == 206
+        save_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(part_path, 'ab' if resumed else 'wb') as f:
+            for chunk in response.iter_content(chunk_size=65536):
                 f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(part_path, save_path)
 
+        if http_cache:
+            http_cache.record(False)
+            http_cache.store(url, response)
         return True
     except Exception as e:
         print(f"Error downloading {url}: {e}")
@@ -109,8 +664,7 @@ def download_file(url: str, save_path: Path) -> bool:
 def save_cache(filename: str, data: Any) -> None:
     """Save data to cache directory."""
     from config import CACHE_DIR
-    cache_path = CACHE_DIR / filename
-    save_json(cache_path, data)
+    save_cache_json(CACHE_DIR / filename, data)
 
 
 def load_cache(filename: str) -> Optional[Any]:
@@ -120,6 +674,21 @@ def load_cache(filename: str) -> Optional[Any]:
     return load_json(cache_path)
 
 
-def write_json(filepath: str, data: Any) -> None:
+def save_cache_records(filename: str, records: Iterable[Any]) -> int:
+    """Save records to a line-delimited JSON file in the cache directory."""
+    from config import CACHE_DIR
+    target = cache_file(CACHE_DIR / filename)
+    count = write_jsonl(target, records)
+    remove_json(CACHE_DIR / filename, keep=target)
+    return count
+
+
+def iter_cache_records(filename: str) -> Iterator[Any]:
+    """Lazily iterate records from a line-delimited JSON cache file."""
+    from config import CACHE_DIR
+    return iter_jsonl(CACHE_DIR / filename)
+
+
+def write_json(filepath: str, data: Any, indent: Optional[int] = 2) -> None:
     """Write data to JSON file (string path version)."""
-    save_json(Path(filepath), data)
+    save_json(Path(filepath), data, indent=indent)
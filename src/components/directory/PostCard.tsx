@@ -1,10 +1,10 @@
 import { Link } from 'react-router-dom';
 import { ExternalLink, Sparkles } from 'lucide-react';
-import type { Post } from '../../lib/types';
+import type { PostSummary } from '../../lib/types';
 import { getAuthorDisplayName, getEdUrl, resolveLLMFromPost } from '../../lib/utils';
 
 interface PostCardProps {
-  post: Post;
+  post: PostSummary;
 }
 
 export function PostCard({ post }: PostCardProps) {
@@ -113,7 +113,7 @@ export function PostCard({ post }: PostCardProps) {
         </div>
         <div className="text-center p-3 bg-white rounded-xl border border-slate-100 shadow-sm">
           <div className="font-bold text-lg text-[#4a6cf7]">
-            {post.code_snippets.length}
+            {post.code_snippet_count}
           </div>
           <div className="text-slate-600 font-medium">Code</div>
         </div>
@@ -2,20 +2,21 @@
  * Data fetching hooks using React Query
  */
 import { useQuery } from '@tanstack/react-query';
-import type { Post, Insights, LLMProfile } from '../lib/types';
+import type { Post, PostSummary, Insights, LLMProfile } from '../lib/types';
+import type { SearchIndex } from '../lib/searchIndex';
 
 /**
- * Fetch all posts from the data pipeline output
+ * Fetch the compact listing of all posts from the data pipeline output
  */
 export function usePostsData() {
   return useQuery({
     queryKey: ['posts'],
     queryFn: async () => {
-      const response = await fetch('/data/posts.json');
+      const response = await fetch('/data/posts_index.json');
       if (!response.ok) {
         throw new Error('Failed to fetch posts');
       }
-      return response.json() as Promise<Post[]>;
+      return response.json() as Promise<PostSummary[]>;
     },
     staleTime: Infinity, // Static data from pipeline, never refetch
     gcTime: Infinity, // Keep in cache indefinitely
@@ -23,17 +24,42 @@ export function usePostsData() {
 }
 
 /**
- * Fetch a single post by ID
+ * Fetch a single post's full record from its detail shard
  */
 export function usePost(postId: string | undefined) {
-  const { data: posts, ...queryState } = usePostsData();
-
-  const post = posts?.find(p => p.post_id === postId);
+  return useQuery({
+    queryKey: ['post', postId],
+    queryFn: async () => {
+      const response = await fetch(`/data/posts/${postId}.json`);
+      if (!response.ok) {
+        throw new Error('Failed to fetch post');
+      }
+      return response.json() as Promise<Post>;
+    },
+    enabled: !!postId,
+    staleTime: Infinity,
+    gcTime: Infinity,
+  });
+}
 
-  return {
-    data: post,
-    ...queryState,
-  };
+/**
+ * Fetch the prebuilt search index once `enabled` (e.g. when a search starts)
+ */
+export function useSearchIndex(enabled = true) {
+  return useQuery({
+    queryKey: ['search-index'],
+    queryFn: async () => {
+      const response = await fetch('/data/search_index.json');
+      if (!response.ok) {
+        throw new Error('Failed to fetch search index');
+      }
+      return response.json() as Promise<SearchIndex>;
+    },
+    enabled,
+    staleTime: Infinity,
+    gcTime: Infinity,
+    retry: false,
+  });
 }
 
 /**
@@ -1,9 +1,11 @@
 /**
- * Search and filtering hooks using Fuse.js
+ * Search and filtering hooks
  */
 import { useMemo } from 'react';
 import Fuse from 'fuse.js';
-import type { Post } from '../lib/types';
+import type { PostSummary } from '../lib/types';
+import { getSortedTerms, searchIndex, tokenize } from '../lib/searchIndex';
+import { useSearchIndex } from './usePostsData';
 import { resolveLLMFromPost, resolveAssistantFromPost } from '../lib/utils';
 
 export interface SearchMatch {
@@ -12,56 +14,84 @@ export interface SearchMatch {
   indices?: readonly [number, number][];
 }
 
-export interface PostWithMatches extends Post {
+export interface PostWithMatches extends PostSummary {
   _matches?: readonly SearchMatch[];
   _score?: number;
 }
 
+const FUSE_KEYS = [
+  { name: 'title', weight: 2.5 },
+  { name: 'summary', weight: 2 },
+  { name: 'author.name', weight: 1.5 },
+  { name: 'llm_info.primary_llm', weight: 1.5 },
+  { name: 'tags', weight: 1 },
+  { name: 'task_types', weight: 0.8 },
+  { name: 'insights.strengths', weight: 0.6 },
+  { name: 'insights.weaknesses', weight: 0.6 },
+];
+
 /**
- * Full-text search using Fuse.js
+ * Full-text search using the prebuilt search index, falling back to an
+ * in-browser Fuse.js index while search_index.json is loading, if it is
+ * unavailable, or for queries the index cannot answer. The index is only
+ * fetched once there is a query.
  */
-export function useSearchPosts(posts: Post[], query: string): PostWithMatches[] {
+export function useSearchPosts(posts: PostSummary[], query: string): PostWithMatches[] {
+  const hasQuery = query.trim().length > 0;
+  const { data: index } = useSearchIndex(hasQuery);
+
+  const sortedTerms = useMemo(() => (index ? getSortedTerms(index) : []), [index]);
+
+  // Stopwords and one-character words are not indexed, so a query made only
+  // of them has nothing to look up
+  const canUseIndex = !!index && tokenize(query).length > 0;
+
+  // Only built when the prebuilt index can't serve the query
   const fuse = useMemo(
-    () => new Fuse(posts, {
-      keys: [
-        { name: 'title', weight: 2.5 },
-        { name: 'summary', weight: 2 },
-        { name: 'author.name', weight: 1.5 },
-        { name: 'llm_info.primary_llm', weight: 1.5 },
-        { name: 'tags', weight: 1 },
-        { name: 'task_types', weight: 0.8 },
-        { name: 'insights.strengths', weight: 0.6 },
-        { name: 'insights.weaknesses', weight: 0.6 },
-        { name: 'content_markdown', weight: 0.3 },
-      ],
-      threshold: 0.4,
-      includeScore: true,
-      includeMatches: true,
-      minMatchCharLength: 2,
-      ignoreLocation: true,
-    }),
-    [posts]
+    () => !canUseIndex && hasQuery
+      ? new Fuse(posts, {
+          keys: FUSE_KEYS,
+          threshold: 0.4,
+          includeScore: true,
+          includeMatches: true,
+          minMatchCharLength: 2,
+          ignoreLocation: true,
+        })
+      : null,
+    [posts, canUseIndex, hasQuery]
   );
 
   return useMemo(() => {
-    if (!query.trim()) {
+    if (!hasQuery) {
       return posts;
     }
 
-    const results = fuse.search(query);
+    if (index && canUseIndex) {
+      const hits = searchIndex(index, sortedTerms, query);
+      const byId = new Map(posts.map(post => [post.post_id, post]));
+      const bestScore = hits.length > 0 ? hits[0].score : 1;
+
+      return hits.flatMap(hit => {
+        const post = byId.get(hit.postId);
+        // Scores follow Fuse's convention: 0 is a perfect match
+        return post ? [{ ...post, _score: 1 - hit.score / bestScore }] : [];
+      });
+    }
 
-    return results.map(result => ({
-      ...result.item,
-      _matches: result.matches,
-      _score: result.score,
-    }));
-  }, [posts, query, fuse]);
+    return fuse
+      ? fuse.search(query).map(result => ({
+          ...result.item,
+          _matches: result.matches,
+          _score: result.score,
+        }))
+      : posts;
+  }, [posts, query, hasQuery, index, canUseIndex, sortedTerms, fuse]);
 }
 
 /**
  * Get unique values for filter options
  */
-export function useFilterOptions(posts: Post[]) {
+export function useFilterOptions(posts: PostSummary[]) {
   const EXCLUDED_TASKS = new Set([
     'backpropagation',
     'loss-function',
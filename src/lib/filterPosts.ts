@@ -1,7 +1,7 @@
 /**
  * Post filtering and sorting utilities
  */
-import type { Post, FilterState } from './types';
+import type { PostSummary, FilterState } from './types';
 import { resolveLLMFromPost, resolveAssistantFromPost } from './utils';
 
 export type SortOption =
@@ -27,7 +27,7 @@ function normalizeHomework(hw: string): string {
 /**
  * Filter posts based on filter state
  */
-export function filterPosts(posts: Post[], filters: FilterState): Post[] {
+export function filterPosts<T extends PostSummary>(posts: T[], filters: FilterState): T[] {
   return posts.filter(post => {
     const primaryLLM = resolveLLMFromPost(post);
     const assistant = resolveAssistantFromPost(post);
@@ -116,12 +116,12 @@ export function filterPosts(posts: Post[], filters: FilterState): Post[] {
 /**
  * Sort posts based on sort option
  */
-export function sortPosts(posts: Post[], sortBy: SortOption, hasSearchQuery: boolean = false): Post[] {
+export function sortPosts<T extends PostSummary>(posts: T[], sortBy: SortOption, hasSearchQuery: boolean = false): T[] {
   const sorted = [...posts];
 
   switch (sortBy) {
     case 'relevance':
-      // If there's a search query, keep relevance order from Fuse.js
+      // If there's a search query, keep relevance order from search
       // Otherwise fall back to highlight score
       if (!hasSearchQuery) {
         sorted.sort((a, b) => (b.highlight_score || 0) - (a.highlight_score || 0));
@@ -155,12 +155,12 @@ export function sortPosts(posts: Post[], sortBy: SortOption, hasSearchQuery: boo
 /**
  * Get posts that are related to a given post
  */
-export function getRelatedPosts(post: Post, allPosts: Post[], limit: number = 5): Post[] {
+export function getRelatedPosts(post: PostSummary, allPosts: PostSummary[], limit: number = 5): PostSummary[] {
   // If the post has pre-computed related posts, use those
   if (post.related_posts && post.related_posts.length > 0) {
     return post.related_posts
       .map(postId => allPosts.find(p => p.post_id === postId))
-      .filter((p): p is Post => p !== undefined)
+      .filter((p): p is PostSummary => p !== undefined)
       .slice(0, limit);
   }
 
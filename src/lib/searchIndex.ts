@@ -0,0 +1,137 @@
+/**
+ * Query the prebuilt inverted index emitted by the data pipeline
+ * (data_pipeline/search_index.py). The tokenizer must match the Python one.
+ */
+
+export interface SearchIndexField {
+  name: string;
+  weight: number;
+}
+
+export interface SearchIndex {
+  version: number;
+  fields: SearchIndexField[];
+  docs: string[];
+  /** Flat [doc, field, termFrequency, ...] triples per term */
+  terms: Record<string, number[]>;
+}
+
+export interface SearchHit {
+  postId: string;
+  score: number;
+}
+
+const MIN_TOKEN_LENGTH = 2;
+
+const STOPWORDS = new Set([
+  'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'for', 'from', 'has',
+  'have', 'in', 'is', 'it', 'its', 'of', 'on', 'or', 'that', 'the', 'this', 'to',
+  'was', 'were', 'will', 'with',
+]);
+
+// Term frequency saturation, as in BM25
+const TF_SATURATION = 1.2;
+
+// Prefix matches rank below exact matches so partial words still find posts
+const PREFIX_MATCH_PENALTY = 0.5;
+
+/**
+ * Split text into normalized search tokens
+ */
+export function tokenize(text: string): string[] {
+  const normalized = text
+    .normalize('NFKD')
+    .replace(/[^\x00-\x7f]/g, '')
+    .toLowerCase();
+  return (normalized.match(/[a-z0-9]+/g) || []).filter(
+    token => token.length >= MIN_TOKEN_LENGTH && !STOPWORDS.has(token)
+  );
+}
+
+/**
+ * Sorted term list used for prefix lookups
+ */
+export function getSortedTerms(index: SearchIndex): string[] {
+  return Object.keys(index.terms).sort();
+}
+
+/**
+ * Find the indexed terms matching a query token, exactly or by prefix
+ */
+function matchTerms(sortedTerms: string[], token: string): string[] {
+  let lo = 0;
+  let hi = sortedTerms.length;
+  while (lo < hi) {
+    const mid = (lo + hi) >> 1;
+    if (sortedTerms[mid] < token) lo = mid + 1;
+    else hi = mid;
+  }
+
+  const matches: string[] = [];
+  for (let i = lo; i < sortedTerms.length && sortedTerms[i].startsWith(token); i++) {
+    matches.push(sortedTerms[i]);
+  }
+  return matches;
+}
+
+/**
+ * Rank posts against a query. Every query token must match a post for it
+ * to be returned. Hits are ordered best first.
+ */
+export function searchIndex(index: SearchIndex, sortedTerms: string[], query: string): SearchHit[] {
+  const tokens = Array.from(new Set(tokenize(query)));
+  if (tokens.length === 0) {
+    return [];
+  }
+
+  const docCount = index.docs.length;
+  let totals: Map<number, number> | null = null;
+
+  for (const token of tokens) {
+    // Best score per doc for this token across its matching terms
+    const tokenScores = new Map<number, number>();
+
+    for (const term of matchTerms(sortedTerms, token)) {
+      const postings = index.terms[term];
+      const termScores = new Map<number, number>();
+      for (let i = 0; i < postings.length; i += 3) {
+        const doc = postings[i];
+        const weight = index.fields[postings[i + 1]].weight;
+        const tf = postings[i + 2];
+        termScores.set(doc, (termScores.get(doc) || 0) + weight * (tf / (tf + TF_SATURATION)));
+      }
+
+      const df = termScores.size;
+      const idf = Math.log(1 + (docCount - df + 0.5) / (df + 0.5));
+      const penalty = term === token ? 1 : PREFIX_MATCH_PENALTY;
+
+      termScores.forEach((score, doc) => {
+        const weighted = score * idf * penalty;
+        if (weighted > (tokenScores.get(doc) || 0)) {
+          tokenScores.set(doc, weighted);
+        }
+      });
+    }
+
+    if (totals === null) {
+      totals = tokenScores;
+    } else {
+      const next = new Map<number, number>();
+      totals.forEach((score, doc) => {
+        const tokenScore = tokenScores.get(doc);
+        if (tokenScore !== undefined) {
+          next.set(doc, score + tokenScore);
+        }
+      });
+      totals = next;
+    }
+
+    if (totals.size === 0) {
+      return [];
+    }
+  }
+
+  return Array.from(totals!.entries())
+    .sort((a, b) => b[1] - a[1])
+    .map(([doc, score]) => ({ postId: index.docs[doc], score }));
+}
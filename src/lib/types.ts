@@ -29,6 +29,15 @@ export interface Attachment {
   filename: string;
   local_path: string;
   ed_url?: string;
+  // Set once mirrored into the content-addressed attachment store
+  sha256?: string;
+  size?: number;
+  width?: number;
+  height?: number;
+  pages?: number;
+  preview_path?: string;
+  preview_width?: number;
+  preview_height?: number;
 }
 
 export interface LLMBehaviorInsights {
@@ -51,31 +60,43 @@ export interface CodeQualityAssessment {
   notes: string[];
 }
 
-export interface Post {
+/**
+ * Compact post entry from posts_index.json, used by the directory listing
+ */
+export interface PostSummary {
   post_id: string;
   ed_thread_id: string;
   title: string;
   author: Author;
   date: string;
   llm_info: LLMInfo;
-  content_raw_html: string;
-  content_markdown: string;
   summary: string;
+  task_types: string[];
+  homework_coverage: string[];
+  tags: string[];
+  highlight_score: number;
+  insights: Pick<LLMBehaviorInsights, 'strengths' | 'weaknesses' | 'one_shot_success_rate'>;
+  code_quality: Pick<CodeQualityAssessment, 'correctness_rating' | 'code_style_rating' | 'pythonic_rating'>;
+  code_snippet_count: number;
+
+  // Computed fields
+  related_posts?: string[]; // post_ids
+}
+
+/**
+ * Full post record from a posts/<post_id>.json detail shard
+ */
+export interface Post extends PostSummary {
+  content_raw_html?: string; // Only kept when markdown conversion is empty
+  content_markdown: string;
   code_snippets: CodeSnippet[];
   attachments: Attachment[];
   external_links: string[];
   
   // AI-generated analysis
-  task_types: string[];
-  homework_coverage: string[];
   problems_attempted: string[];
   insights: LLMBehaviorInsights;
   code_quality: CodeQualityAssessment;
-  tags: string[];
-  highlight_score: number;
-  
-  // Computed fields
-  related_posts?: string[]; // post_ids
 }
 
 export interface LLMProfile {
@@ -99,6 +120,7 @@ export interface Insights {
   llm_profiles: LLMProfile[];
   task_difficulty: Record<string, number>;
   nuggets: InsightNugget[];
+  llm_task_matrix?: Record<string, Record<string, number>>; // LLM -> task -> mean one-shot success rate
 }
 
 export interface FilterState {
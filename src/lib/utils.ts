@@ -2,7 +2,7 @@
  * Utility functions for the application
  */
 
-import type { Post } from './types';
+import type { Attachment, PostSummary } from './types';
 
 /** Course ID for CS182 on Ed */
 const ED_COURSE_ID = 84647;
@@ -46,7 +46,7 @@ export function canonicalizeAssistant(name: string): string {
   return 'Other';
 }
 
-export function resolveAssistantFromPost(post: Post): string {
+export function resolveAssistantFromPost(post: PostSummary): string {
   const fromField = canonicalizeAssistant(post.llm_info.assistant_tool || '');
   if (fromField !== 'Other') return fromField;
 
@@ -70,7 +70,7 @@ export function resolveAssistantFromPost(post: Post): string {
 /**
  * Resolve the display LLM for a post, falling back to tags if primary_llm is unknown.
  */
-export function resolveLLMFromPost(post: Post): string {
+export function resolveLLMFromPost(post: PostSummary): string {
   const primary = canonicalizeLLMName(post.llm_info.primary_llm || '');
   if (primary !== 'Other') return primary;
 
@@ -86,14 +86,14 @@ export function resolveLLMFromPost(post: Post): string {
 /**
  * Generate the Ed discussion URL for a post
  */
-export function getEdUrl(post: Post | { ed_thread_id: string }): string {
+export function getEdUrl(post: PostSummary | { ed_thread_id: string }): string {
   return `https://edstem.org/us/courses/${ED_COURSE_ID}/discussion/${post.ed_thread_id}`;
 }
 
 /**
  * Get a displayable author name; fall back to a short ID if missing/unknown.
  */
-export function getAuthorDisplayName(post: Post): string {
+export function getAuthorDisplayName(post: PostSummary): string {
   const name = post.author.name?.trim() ?? '';
   if (name && name.toLowerCase() !== 'unknown') {
     return name;
@@ -125,3 +125,24 @@ export function formatDate(dateString: string): string {
     day: 'numeric'
   });
 }
+
+/**
+ * Describe an attachment's type, byte size and dimensions, e.g. "image · 1200×800 · 48 KB"
+ */
+export function formatAttachmentDetails(attachment: Attachment): string {
+  const parts = [attachment.type];
+  if (attachment.width && attachment.height) {
+    parts.push(`${attachment.width}×${attachment.height}`);
+  }
+  if (attachment.pages) {
+    parts.push(`${attachment.pages} page${attachment.pages === 1 ? '' : 's'}`);
+  }
+  if (attachment.size !== undefined) {
+    parts.push(
+      attachment.size >= 1024 * 1024
+        ? `${(attachment.size / (1024 * 1024)).toFixed(1)} MB`
+        : `${Math.max(1, Math.round(attachment.size / 1024))} KB`
+    );
+  }
+  return parts.join(' · ');
+}
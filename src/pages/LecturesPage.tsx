@@ -3,10 +3,10 @@ import { Link } from 'react-router-dom';
 import { usePostsData } from '../hooks/usePostsData';
 import { lectureSchedule } from '../lib/lectureData';
 import { ChevronLeft, ChevronRight } from 'lucide-react';
-import type { Post } from '../lib/types';
+import type { PostSummary } from '../lib/types';
 
 interface ResourcesPaginationProps {
-  posts: Post[];
+  posts: PostSummary[];
   homeworkKey: string;
 }
 
@@ -91,9 +91,9 @@ export function LecturesPage() {
 
   // Group posts by homework
   const postsByHomework = useMemo(() => {
-    if (!posts) return new Map<string, Post[]>();
+    if (!posts) return new Map<string, PostSummary[]>();
 
-    const grouped = new Map<string, Post[]>();
+    const grouped = new Map<string, PostSummary[]>();
 
     posts.forEach(post => {
       post.homework_coverage.forEach((hw: string) => {
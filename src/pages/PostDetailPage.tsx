@@ -2,7 +2,7 @@ import { useState } from 'react';
 import { useParams, Link } from 'react-router-dom';
 import { usePost, usePostsData } from '../hooks/usePostsData';
 import { getRelatedPosts } from '../lib/filterPosts';
-import { getAuthorDisplayName, getEdUrl, resolveLLMFromPost } from '../lib/utils';
+import { formatAttachmentDetails, getAuthorDisplayName, getEdUrl, resolveLLMFromPost } from '../lib/utils';
 
 type TabType = 'overview' | 'analysis' | 'code' | 'attachments';
 
@@ -443,17 +443,31 @@ export function PostDetailPage() {
                     key={idx}
                     className="flex items-center justify-between p-4 bg-gray-50 dark:bg-gray-700/50 rounded-lg"
                   >
-                    <div>
-                      <div className="font-medium text-gray-900 dark:text-white">
-                        {attachment.filename}
-                      </div>
-                      <div className="text-sm text-gray-500 dark:text-gray-400">
-                        {attachment.type}
+                    <div className="flex items-center gap-4">
+                      {attachment.preview_path && (
+                        <img
+                          src={`/${attachment.preview_path}`}
+                          alt={`Preview of ${attachment.filename}`}
+                          width={attachment.preview_width}
+                          height={attachment.preview_height}
+                          loading="lazy"
+                          decoding="async"
+                          className="max-h-24 w-auto rounded border border-gray-200 dark:border-gray-600"
+                        />
+                      )}
+                      <div>
+                        <div className="font-medium text-gray-900 dark:text-white">
+                          {attachment.filename}
+                        </div>
+                        <div className="text-sm text-gray-500 dark:text-gray-400">
+                          {formatAttachmentDetails(attachment)}
+                        </div>
                       </div>
                     </div>
-                    {attachment.ed_url && (
+                    {(attachment.local_path || attachment.ed_url) && (
                       <a
-                        href={attachment.ed_url}
+                        href={attachment.local_path ? `/${attachment.local_path}` : attachment.ed_url}
+                        download={attachment.local_path ? attachment.filename : undefined}
                         target="_blank"
                         rel="noopener noreferrer"
                         className="px-4 py-2 bg-[#0b254b] hover:bg-[#0a1f3d] text-white rounded-lg text-sm transition-colors"